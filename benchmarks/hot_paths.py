@@ -0,0 +1,322 @@
+"""Micro-benchmarks for the pure-Python hot paths of the CLI.
+
+Measures the throughput and peak memory of parsing memory and time values, time arithmetic, converting submit configs
+to and from dictionaries, creating job scripts (also for large sweeps) and filtering synthetic histories of 1k, 10k
+and 100k entries (in memory and from a JSON Lines file). The results are compared with the baselines in
+`baselines.json` and the benchmark fails if a case got slower or uses more memory than the tolerance allows.
+
+The baselines are saved with a fingerprint of the machine. On another machine (or Python version), absolute numbers
+are not comparable, so the throughput of each case is compared relative to the throughput of the `memory.parse` case
+instead, and the peak memory is not compared. Save the baselines on the machine that you compare on for exact results.
+
+Usage:
+    python benchmarks/hot_paths.py [--tolerance 0.3] [--repeat 5] [--sizes 1000 10000 100000] [--filter history]
+    python benchmarks/hot_paths.py --save-baseline
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PACKAGE_ROOT))
+
+from dtu_hpc_cli.config import SubmitConfig  # noqa: E402
+from dtu_hpc_cli.history import HistoryConfig  # noqa: E402
+from dtu_hpc_cli.history import compile_filters  # noqa: E402
+from dtu_hpc_cli.history_store import JSONLinesHistoryStore  # noqa: E402
+from dtu_hpc_cli.submit import create_job_script  # noqa: E402
+from dtu_hpc_cli.types import Memory  # noqa: E402
+from dtu_hpc_cli.types import Time  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines.json"
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+# Case whose throughput scales the baselines on other machines.
+REFERENCE_CASE = "memory.parse"
+
+# Peak memory of small cases varies by a few allocations, so allow this much on top of the tolerance.
+MEMORY_SLACK_KB = 64.0
+
+MEMORY_VALUES = ["5GB", "512mb", "16GB", "2048MB", "1tb", "100KB"]
+TIME_VALUES = ["1d", "4h", "30m", "1d2h30m", "2d23h59m", "12h15m"]
+
+
+@dataclasses.dataclass
+class Case:
+    name: str
+    # Returns the function to benchmark and the number of operations that it performs. Setup is not measured.
+    setup: Callable[[], tuple[Callable[[], object], int]]
+
+
+@dataclasses.dataclass
+class Result:
+    ops_per_second: float
+    peak_memory_kb: float
+
+
+def create_submit_config(rng: random.Random, index: int, sweep_size: int = 0) -> SubmitConfig:
+    values = SubmitConfig.defaults()
+    values.update(
+        branch=rng.choice(["main", "feature/data", "experiment"]),
+        commands=[f"python train.py --seed {index}", "python evaluate.py"],
+        cores=rng.choice([1, 4, 8, 16]),
+        error="logs",
+        gpus=rng.choice([None, 1, 2]),
+        memory=rng.choice(MEMORY_VALUES),
+        name=f"{rng.choice(['train', 'evaluate', 'sweep'])}-{index}",
+        output="logs",
+        preamble=["module load python3/3.11.9"],
+        queue=rng.choice(["hpc", "gpuv100", "gpua100"]),
+        walltime=rng.choice(TIME_VALUES),
+    )
+    if sweep_size > 0:
+        values["sweep"] = [{"lr": str(10**-i), "seed": str(i)} for i in range(sweep_size)]
+    return SubmitConfig.from_dict(values)
+
+
+def create_history(size: int) -> list[dict]:
+    rng = random.Random(size)
+    entries = []
+    for index in range(size):
+        # Some entries are small sweeps, like in a real history.
+        sweep_size = 4 if index % 10 == 0 else 0
+        config = create_submit_config(rng, index, sweep_size)
+        entries.append({"config": config.to_dict(), "job_ids": [str(20_000_000 + index)], "timestamp": index})
+    return entries
+
+
+def create_history_config() -> HistoryConfig:
+    values = {field.name: None for field in dataclasses.fields(HistoryConfig)}
+    values.update(
+        limit=sys.maxsize,
+        branch_contains="feature",
+        memory_above=Memory.parse("1GB"),
+        walltime_below=Time.parse("2d"),
+    )
+    return HistoryConfig(**values)
+
+
+def memory_parse_case() -> tuple[Callable[[], object], int]:
+    values = MEMORY_VALUES * 2_000
+    return lambda: [Memory.parse(value) for value in values], len(values)
+
+
+def time_parse_case() -> tuple[Callable[[], object], int]:
+    values = TIME_VALUES * 2_000
+    return lambda: [Time.parse(value) for value in values], len(values)
+
+
+def time_add_case() -> tuple[Callable[[], object], int]:
+    times = [Time.parse(value) for value in TIME_VALUES * 2_000]
+    pairs = list(zip(times, reversed(times), strict=True))
+    return lambda: [a + b for a, b in pairs], len(pairs)
+
+
+def time_sub_case() -> tuple[Callable[[], object], int]:
+    times = [Time.parse(value) for value in TIME_VALUES * 2_000]
+    pairs = list(zip(times, reversed(times), strict=True))
+    return lambda: [a - b for a, b in pairs], len(pairs)
+
+
+def to_dict_case(sweep_size: int, count: int) -> Callable[[], tuple[Callable[[], object], int]]:
+    def setup():
+        rng = random.Random(0)
+        configs = [create_submit_config(rng, index, sweep_size) for index in range(count)]
+        return lambda: [config.to_dict() for config in configs], count
+
+    return setup
+
+
+def from_dict_case(sweep_size: int, count: int) -> Callable[[], tuple[Callable[[], object], int]]:
+    def setup():
+        rng = random.Random(0)
+        values = [create_submit_config(rng, index, sweep_size).to_dict() for index in range(count)]
+        return lambda: [SubmitConfig.from_dict(value) for value in values], count
+
+    return setup
+
+
+def job_script_case(sweep_size: int, count: int) -> Callable[[], tuple[Callable[[], object], int]]:
+    def setup():
+        rng = random.Random(0)
+        configs = [create_submit_config(rng, index, sweep_size) for index in range(count)]
+        return lambda: [create_job_script(config) for config in configs], count
+
+    return setup
+
+
+def history_filter_case(size: int) -> Callable[[], tuple[Callable[[], object], int]]:
+    def setup():
+        entries = create_history(size)
+        config = create_history_config()
+
+        def run():
+            matches = compile_filters(config)
+            return [entry for entry in entries if matches(entry["config"])]
+
+        return run, size
+
+    return setup
+
+
+def history_scan_case(size: int, directory: Path) -> Callable[[], tuple[Callable[[], object], int]]:
+    def setup():
+        path = directory / f"history_{size}.jsonl"
+        if not path.exists():
+            JSONLinesHistoryStore(path).extend(create_history(size))
+        store = JSONLinesHistoryStore(path)
+        config = create_history_config()
+
+        def run():
+            matches = compile_filters(config)
+            return [entry for entry in store.iterate_newest_first() if matches(entry["config"])]
+
+        return run, size
+
+    return setup
+
+
+def create_cases(sizes: list[int], directory: Path) -> list[Case]:
+    cases = [
+        Case("memory.parse", memory_parse_case),
+        Case("time.parse", time_parse_case),
+        Case("time.add", time_add_case),
+        Case("time.sub", time_sub_case),
+        Case("submit_config.to_dict", to_dict_case(sweep_size=0, count=10_000)),
+        Case("submit_config.from_dict", from_dict_case(sweep_size=0, count=10_000)),
+        Case("submit_config.to_dict[sweep=1000]", to_dict_case(sweep_size=1_000, count=100)),
+        Case("submit_config.from_dict[sweep=1000]", from_dict_case(sweep_size=1_000, count=100)),
+        Case("create_job_script", job_script_case(sweep_size=0, count=10_000)),
+        Case("create_job_script[sweep=1000]", job_script_case(sweep_size=1_000, count=100)),
+        Case("create_job_script[sweep=10000]", job_script_case(sweep_size=10_000, count=10)),
+    ]
+    for size in sizes:
+        cases.append(Case(f"history.filter[{size}]", history_filter_case(size)))
+        cases.append(Case(f"history.scan[{size}]", history_scan_case(size, directory)))
+    return cases
+
+
+def measure(case: Case, repeat: int) -> Result:
+    """Return the throughput of the fastest run and the peak memory allocated during a separate run.
+
+    Memory is traced in a separate run since tracing slows down allocations."""
+    run, operations = case.setup()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(ops_per_second=operations / min(timings), peak_memory_kb=peak / 1024)
+
+
+def compare(result: Result, baseline: dict | None, tolerance: float, scale: float | None = None) -> str | None:
+    """Return a description of the regression or None if the result is within the tolerance of the baseline.
+
+    With a scale (on another machine), the baseline throughput is scaled and the peak memory is not compared."""
+    if baseline is None:
+        return None
+    expected = baseline["ops_per_second"] * (1.0 if scale is None else scale)
+    if result.ops_per_second < expected * (1 - tolerance):
+        return f"slower than baseline ({expected:,.0f} ops/s)"
+    if scale is None and result.peak_memory_kb > baseline["peak_memory_kb"] * (1 + tolerance) + MEMORY_SLACK_KB:
+        return f"more memory than baseline ({baseline['peak_memory_kb']:,.1f} KB)"
+    return None
+
+
+def get_fingerprint() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "cpus": str(os.cpu_count()),
+    }
+
+
+def load_baselines() -> tuple[dict | None, dict]:
+    """Return the fingerprint of the machine that the baselines were saved on and the baselines."""
+    if not BASELINE_PATH.exists():
+        return None, {}
+    data = json.loads(BASELINE_PATH.read_text())
+    return data.get("fingerprint"), data["cases"]
+
+
+def save_baselines(results: dict[str, Result]):
+    # Keep the baselines of cases that were not run (e.g. when using --filter).
+    _, cases = load_baselines()
+    for name, result in results.items():
+        cases[name] = {key: round(value, 1) for key, value in dataclasses.asdict(result).items()}
+    data = {"fingerprint": get_fingerprint(), "cases": dict(sorted(cases.items()))}
+    BASELINE_PATH.write_text(json.dumps(data, indent=4) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed relative regression.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Sizes of the histories.")
+    parser.add_argument("--filter", default=None, help="Only run cases whose name contains this string.")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Save the results to {BASELINE_PATH.name}.")
+    args = parser.parse_args()
+
+    fingerprint, baselines = load_baselines()
+    relative = not args.save_baseline and len(baselines) > 0 and fingerprint != get_fingerprint()
+    if relative and REFERENCE_CASE not in baselines:
+        print(f"The baselines were saved on another machine and have no '{REFERENCE_CASE}' case to compare with.")
+        sys.exit(1)
+    if relative:
+        print(f"The baselines were saved on another machine. Comparing throughput relative to '{REFERENCE_CASE}'.")
+
+    results = {}
+    failed = []
+    scale = None
+    with tempfile.TemporaryDirectory() as directory:
+        cases = create_cases(args.sizes, Path(directory))
+        if relative:
+            # The reference case runs first (even when filtered out), since it scales the other baselines.
+            cases.sort(key=lambda case: case.name != REFERENCE_CASE)
+        for case in cases:
+            is_reference = relative and case.name == REFERENCE_CASE
+            if args.filter is not None and args.filter not in case.name and not is_reference:
+                continue
+            result = measure(case, args.repeat)
+            results[case.name] = result
+            if is_reference:
+                scale = result.ops_per_second / baselines[REFERENCE_CASE]["ops_per_second"]
+                print(f"{case.name:<38} {result.ops_per_second:>14,.0f} ops/s  reference ({scale:.2f}x baseline)")
+                continue
+            regression = None
+            if not args.save_baseline:
+                regression = compare(result, baselines.get(case.name), args.tolerance, scale)
+            status = "ok" if regression is None else regression
+            print(f"{case.name:<38} {result.ops_per_second:>14,.0f} ops/s {result.peak_memory_kb:>12,.1f} KB  {status}")
+            if regression is not None:
+                failed.append(case.name)
+
+    if args.save_baseline:
+        save_baselines(results)
+        print(f"Saved baselines to '{BASELINE_PATH}'.")
+    elif len(failed) > 0:
+        print(f"Regressions of more than {args.tolerance:.0%} in: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Startup-time regression benchmark for the `dtu` entry point.
+
+Runs a few cheap commands in fresh interpreters inside a temporary project and checks that the time spent on top of
+importing typer (which every command pays regardless of what the CLI does) stays within a budget.
+
+Usage:
+    python benchmarks/startup.py [--budget-ms 100] [--repeat 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+
+BASELINE = ["-c", "import typer"]
+
+COMMANDS = {
+    "--version": ["-c", "from dtu_hpc_cli import cli; cli()", "--version"],
+    "--help": ["-c", "from dtu_hpc_cli import cli; cli()", "--help"],
+    "history": ["-c", "from dtu_hpc_cli import cli; cli()", "history"],
+}
+
+
+def measure(arguments: list[str], cwd: Path, env: dict, repeat: int) -> float:
+    """Return the median wall time in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], cwd=cwd, env=env, check=True, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def create_project(root: Path):
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+    (root / ".dtu_hpc.json").write_text(json.dumps({"ssh": {"user": "user", "identityfile": "/dev/null"}}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="Allowed overhead on top of importing typer.")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": str(PACKAGE_ROOT)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        create_project(root)
+
+        baseline = measure(BASELINE, root, env, args.repeat)
+        print(f"{'import typer':<12} {baseline:8.1f} ms (baseline)")
+
+        failed = []
+        for name, arguments in COMMANDS.items():
+            duration = measure(arguments, root, env, args.repeat)
+            overhead = duration - baseline
+            status = "ok" if overhead <= args.budget_ms else "OVER BUDGET"
+            print(f"{name:<12} {duration:8.1f} ms (+{overhead:.1f} ms) {status}")
+            if overhead > args.budget_ms:
+                failed.append(name)
+
+    if len(failed) > 0:
+        print(f"Startup budget of {args.budget_ms:.0f} ms exceeded for: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,19 @@
+from pathlib import Path
 from typing import List
 
 import typer
 from typing_extensions import Annotated
 
-from dtu_hpc_cli.config import SubmitConfig
 from dtu_hpc_cli.config import cli_config
 from dtu_hpc_cli.constants import CONFIG_FILENAME
-from dtu_hpc_cli.get_command import execute_get_command
-from dtu_hpc_cli.history import HistoryConfig
-from dtu_hpc_cli.history import execute_history
-from dtu_hpc_cli.install import execute_install
-from dtu_hpc_cli.jobs import JobsConfig
-from dtu_hpc_cli.jobs import JobsStats
-from dtu_hpc_cli.jobs import execute_jobs
-from dtu_hpc_cli.queues import execute_queues
-from dtu_hpc_cli.remove import RemoveConfig
-from dtu_hpc_cli.remove import execute_remove
-from dtu_hpc_cli.resubmit import ResubmitConfig
-from dtu_hpc_cli.resubmit import execute_resubmit
-from dtu_hpc_cli.run import execute_run
-from dtu_hpc_cli.start_time import StartTimeConfig
-from dtu_hpc_cli.start_time import execute_start_time
-from dtu_hpc_cli.stats import StatsConfig
-from dtu_hpc_cli.stats import execute_stats
-from dtu_hpc_cli.submit import execute_submit
-from dtu_hpc_cli.sync import execute_sync
+from dtu_hpc_cli.types import JobsStats
 from dtu_hpc_cli.types import Memory
+from dtu_hpc_cli.types import OutputFormat
 from dtu_hpc_cli.types import Time
 
+# NB. The command modules are imported inside the commands. This keeps startup fast since each command only
+# imports what it needs (e.g., fabric is only imported by commands that connect to the HPC).
+
 __version__ = "1.2.0"
 
 cli = typer.Typer(pretty_exceptions_show_locals=False)
@@ -40,13 +26,66 @@ def version_callback(value: bool):
 
 
 @cli.callback()
-def main(version: Annotated[bool, typer.Option("--version", callback=version_callback)] = False):
-    pass
+def main(
+    version: Annotated[bool, typer.Option("--version", callback=version_callback)] = False,
+    refresh_environment: Annotated[
+        bool, typer.Option(help="Capture the remote login environment again (when cache_environment is enabled).")
+    ] = False,
+    profile: Annotated[
+        bool, typer.Option(help="Print how long each phase of the command took (e.g. config, SSH, sync) when it exits.")
+    ] = False,
+    profile_stats: Annotated[
+        Path, typer.Option(help="Also profile the command with cProfile and save the stats to this file.")
+    ] = None,
+):
+    if profile or profile_stats is not None:
+        from dtu_hpc_cli.profiling import start_profiling
+
+        start_profiling(profile_stats)
+
+    if refresh_environment:
+        from dtu_hpc_cli.client.environment import clear_environment_cache
+
+        clear_environment_cache()
+
+
+@cli.command()
+def fetch(
+    job_ids: Annotated[List[str], typer.Argument(help="IDs of the jobs to fetch.")] = None,
+    name: Annotated[str, typer.Option(help="Fetch all jobs in the history with this name.")] = None,
+    branch: Annotated[str, typer.Option(help="Fetch all jobs in the history submitted from this branch.")] = None,
+    result: Annotated[
+        List[str],
+        typer.Option(
+            help="Glob of result files relative to the remote path. {name} and {job_id} are replaced for each job. "
+            + "Adds to the results in the fetch config."
+        ),
+    ] = None,
+    logs: Annotated[bool, typer.Option(help="Fetch the output and error logs of the jobs.")] = True,
+    destination: Annotated[Path, typer.Option(help="Local directory. Defaults to the project root.")] = None,
+    concurrency: Annotated[int, typer.Option(help="Maximum number of files to download at the same time.")] = 8,
+):
+    """Download the logs and results of jobs from the history."""
+    from dtu_hpc_cli.fetch import FetchCommandConfig
+    from dtu_hpc_cli.fetch import execute_fetch
+
+    config = FetchCommandConfig(
+        job_ids=job_ids,
+        name=name,
+        branch=branch,
+        results=cli_config.fetch.results + (result or []),
+        logs=logs,
+        destination=cli_config.project_root if destination is None else destination,
+        concurrency=concurrency,
+    )
+    execute_fetch(config)
 
 
 @cli.command()
 def get_command(job_id: str):
     """Get the command used to submit a previous job."""
+    from dtu_hpc_cli.get_command import execute_get_command
+
     execute_get_command(job_id)
 
 
@@ -103,6 +142,7 @@ def history(
     start_after: bool = False,
     start_after_contains: str | None = None,
     start_after_is: str | None = None,
+    sweep: Annotated[bool, typer.Option(help="Show the arguments of each job in a sweep.")] = False,
     sync: bool = False,
     walltime: bool = True,
     walltime_above: Annotated[Time, typer.Option(parser=Time.parse)] = None,
@@ -110,6 +150,9 @@ def history(
     walltime_is: Annotated[Time, typer.Option(parser=Time.parse)] = None,
 ):
     """Show the history of submitted jobs."""
+    from dtu_hpc_cli.history import HistoryConfig
+    from dtu_hpc_cli.history import execute_history
+
     config = HistoryConfig(
         branch=branch,
         branch_contains=branch_contains,
@@ -162,6 +205,7 @@ def history(
         start_after=start_after,
         start_after_contains=start_after_contains,
         start_after_is=start_after_is,
+        sweep=sweep,
         sync=sync,
         walltime=walltime,
         walltime_above=walltime_above,
@@ -172,9 +216,15 @@ def history(
 
 
 @cli.command()
-def install():
+def install(
+    force: Annotated[
+        bool, typer.Option(help="Install even if the install inputs have not changed since the last install.")
+    ] = False,
+):
     """Run the install script in the remote directory on the HPC."""
-    execute_install()
+    from dtu_hpc_cli.install import execute_install
+
+    execute_install(force=force)
 
 
 @cli.command()
@@ -182,25 +232,89 @@ def jobs(
     node: str | None = None,
     queue: str | None = None,
     stats: Annotated[JobsStats, typer.Option()] = None,
+    watch: Annotated[bool, typer.Option(help="Keep polling the jobs and show changes as they happen.")] = False,
+    interval: Annotated[float, typer.Option(help="Seconds between polls when using --watch.")] = 10.0,
+    max_interval: Annotated[
+        float, typer.Option(help="Polls happen less frequently while nothing changes, but at least this often.")
+    ] = 60.0,
+    output_format: Annotated[OutputFormat, typer.Option("--format", help="Output format.")] = OutputFormat.text,
 ):
     """List running and pending jobs."""
-    list_config = JobsConfig(node=node, queue=queue, stats=stats)
+    from dtu_hpc_cli.jobs import JobsConfig
+    from dtu_hpc_cli.jobs import execute_jobs
+
+    list_config = JobsConfig(
+        node=node,
+        queue=queue,
+        stats=stats,
+        watch=watch,
+        interval=interval,
+        max_interval=max_interval,
+        output_format=output_format,
+    )
     execute_jobs(list_config)
 
 
 @cli.command()
-def queues(queue: Annotated[str, typer.Argument()] = None):
+def logs(
+    job_id: str,
+    error: Annotated[bool, typer.Option(help="Show the error log instead of the output log.")] = False,
+    follow: Annotated[bool, typer.Option("--follow", "-f", help="Keep showing output as it is written.")] = False,
+    index: Annotated[int, typer.Option(help="Index of the job to show if the job is a sweep.")] = None,
+    interval: Annotated[float, typer.Option(help="Seconds between checks for new output when following.")] = 2.0,
+):
+    """Show the output or error log of a job from the history."""
+    from dtu_hpc_cli.logs import LogsConfig
+    from dtu_hpc_cli.logs import execute_logs
+
+    config = LogsConfig(job_id=job_id, error=error, follow=follow, index=index, interval=interval)
+    execute_logs(config)
+
+
+@cli.command()
+def perf(
+    days: Annotated[float, typer.Option(help="Only include measurements from the last number of days.")] = 30,
+    host: Annotated[str, typer.Option(help="Only include measurements for this login host.")] = None,
+    daily: Annotated[bool, typer.Option(help="Show the percentiles of each day to see trends.")] = False,
+    output_format: Annotated[OutputFormat, typer.Option("--format", help="Output format.")] = OutputFormat.text,
+):
+    """Show percentiles of the recorded latencies (SSH connect, round trips, sync and submit) per login host."""
+    from dtu_hpc_cli.perf import PerfConfig
+    from dtu_hpc_cli.perf import execute_perf
+
+    config = PerfConfig(days=days, host=host, daily=daily, output_format=output_format)
+    execute_perf(config)
+
+
+@cli.command()
+def queues(
+    queue: Annotated[str, typer.Argument()] = None,
+    output_format: Annotated[OutputFormat, typer.Option("--format", help="Output format.")] = OutputFormat.text,
+):
     """List available queues."""
-    execute_queues(queue)
+    from dtu_hpc_cli.queues import execute_queues
+
+    execute_queues(queue, output_format)
 
 
 @cli.command()
 def remove(job_ids: List[str], from_history: bool = False):
     """Remove jobs from the queue."""
+    from dtu_hpc_cli.remove import RemoveConfig
+    from dtu_hpc_cli.remove import execute_remove
+
     config = RemoveConfig(from_history=from_history, job_ids=job_ids)
     execute_remove(config)
 
 
+SWEEP_HELP = (
+    "Submit a job array with all combinations of the given values, e.g. --sweep lr=0.1,0.01. "
+    + "The values are available as environment variables in the commands, e.g. $lr."
+)
+
+SWEEP_FILE_HELP = "JSON file with a list of argument sets or a dictionary of values to sweep over."
+
+
 @cli.command()
 def resubmit(
     job_id: str,
@@ -219,10 +333,16 @@ def resubmit(
     queue: str = None,
     split_every: Annotated[Time, typer.Option(parser=Time.parse)] = None,
     start_after: str = None,
+    sweep: Annotated[List[str], typer.Option(help=SWEEP_HELP)] = None,
+    sweep_file: Annotated[Path, typer.Option(help=SWEEP_FILE_HELP)] = None,
     sync: bool = True,
     walltime: Annotated[Time, typer.Option(parser=Time.parse)] = None,
 ):
     """Resubmit a job. Optionally with new parameters."""
+    from dtu_hpc_cli.resubmit import ResubmitConfig
+    from dtu_hpc_cli.resubmit import execute_resubmit
+    from dtu_hpc_cli.sweep import create_sweep
+
     config = ResubmitConfig(
         job_id=job_id,
         branch=branch,
@@ -240,24 +360,42 @@ def resubmit(
         queue=queue,
         split_every=split_every,
         start_after=start_after,
+        sweep=create_sweep(sweep, sweep_file),
         sync=sync,
         walltime=walltime,
     )
     execute_resubmit(config)
 
 
-@cli.command(context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
-def run(ctx: typer.Context):
+# Options are only parsed before the command, so e.g. the --quiet in `dtu run pip install --quiet numpy` is passed on.
+@cli.command(
+    context_settings={"allow_extra_args": True, "ignore_unknown_options": True, "allow_interspersed_args": False}
+)
+def run(
+    ctx: typer.Context,
+    quiet: Annotated[bool, typer.Option(help="Do not show the output of the command.")] = False,
+    tee: Annotated[Path, typer.Option(help="Write the output of the command to this file.")] = None,
+):
     """Run a command on the HPC.
 
-    Uses the configured remote path as the working directory."""
-    execute_run(ctx.args)
+    Uses the configured remote path as the working directory. Options must come before the command."""
+    from dtu_hpc_cli.run import execute_run
+
+    execute_run(ctx.args, quiet=quiet, tee=tee)
 
 
 @cli.command()
-def start_time(job_ids: Annotated[List[str], typer.Argument()] = None, queue: str = None, user: str = None):
+def start_time(
+    job_ids: Annotated[List[str], typer.Argument()] = None,
+    queue: str = None,
+    user: str = None,
+    output_format: Annotated[OutputFormat, typer.Option("--format", help="Output format.")] = OutputFormat.text,
+):
     """Show the start time of pending jobs."""
-    config = StartTimeConfig(job_ids=job_ids, queue=queue, user=user)
+    from dtu_hpc_cli.start_time import StartTimeConfig
+    from dtu_hpc_cli.start_time import execute_start_time
+
+    config = StartTimeConfig(job_ids=job_ids, queue=queue, user=user, output_format=output_format)
     execute_start_time(config)
 
 
@@ -270,8 +408,12 @@ def stats(
     memory: bool = False,
     node: str | None = None,
     reserved: bool = False,
+    output_format: Annotated[OutputFormat, typer.Option("--format", help="Output format.")] = OutputFormat.text,
 ):
     """Show statistics for the queue(s)."""
+    from dtu_hpc_cli.stats import StatsConfig
+    from dtu_hpc_cli.stats import execute_stats
+
     config = StatsConfig(
         cpu=cpu,
         gpu=gpu,
@@ -280,19 +422,27 @@ def stats(
         node=node,
         reserved=reserved,
         queue=queue,
+        output_format=output_format,
     )
     execute_stats(config)
 
 
 class SubmitDefault:
+    """Default value for a submit option. The config is only loaded when the default is needed."""
+
     def __init__(self, key: str):
-        self.value = cli_config.submit.get(key)
+        self.key = key
 
     def __call__(self):
-        return self.value
+        return cli_config.resolve_submit_default(self.key)
 
     def __str__(self):
-        return str(self.value)
+        # The help shows the built-in default, such that --help does not load the config.
+        from dtu_hpc_cli.config import ACTIVE_BRANCH_KEY
+        from dtu_hpc_cli.config import SubmitConfig
+
+        value = SubmitConfig.defaults()[self.key]
+        return "active branch" if value == ACTIVE_BRANCH_KEY else str(value)
 
 
 @cli.command()
@@ -314,8 +464,16 @@ def submit(
     start_after: Annotated[str, typer.Option(default_factory=SubmitDefault("start_after"))],
     sync: Annotated[bool, typer.Option(default_factory=SubmitDefault("sync"))],
     walltime: Annotated[Time, typer.Option(parser=Time.parse, default_factory=SubmitDefault("walltime"))],
+    sweep: Annotated[List[str], typer.Option(help=SWEEP_HELP)] = None,
+    sweep_file: Annotated[Path, typer.Option(help=SWEEP_FILE_HELP)] = None,
 ):
-    """Submit a job to the queue."""
+    """Submit a job to the queue.
+
+    The defaults of the options can be changed in the submit section of the config."""
+    from dtu_hpc_cli.config import SubmitConfig
+    from dtu_hpc_cli.submit import execute_submit
+    from dtu_hpc_cli.sweep import create_sweep
+
     submit_config = SubmitConfig(
         commands=commands,
         branch=branch,
@@ -332,6 +490,7 @@ def submit(
         queue=queue,
         split_every=split_every,
         start_after=start_after,
+        sweep=create_sweep(sweep, sweep_file),
         sync=sync,
         walltime=walltime,
     )
@@ -339,10 +498,20 @@ def submit(
 
 
 @cli.command()
-def sync():
+def sync(
+    full: Annotated[
+        bool,
+        typer.Option(
+            help="Sync everything instead of only the files that changed locally since the last sync. "
+            + "Files changed on the HPC are otherwise only restored by the hourly full sync."
+        ),
+    ] = False,
+):
     """Sync the local directory with the remote directory on the HPC."""
+    from dtu_hpc_cli.sync import execute_sync
+
     cli_config.check_ssh(msg=f"Sync requires a SSH configuration in '{CONFIG_FILENAME}'.")
-    execute_sync()
+    execute_sync(full=full)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,64 @@
 import subprocess
+from typing import TYPE_CHECKING
+
+import typer
 
 from dtu_hpc_cli.client.base import Client
 from dtu_hpc_cli.client.local import LocalClient
-from dtu_hpc_cli.client.ssh import SSHClient
+from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.profiling import profiled
+
+if TYPE_CHECKING:
+    # asyncio is slow to import, so the async clients are only imported when used.
+    from dtu_hpc_cli.client.async_base import AsyncClient
 
 
+@profiled("client creation")
 def get_client() -> Client:
+    if is_on_hpc():
+        return LocalClient()
+
+    if cli_config.ssh is not None and cli_config.ssh.broker:
+        from dtu_hpc_cli.client.broker import BrokerClient
+        from dtu_hpc_cli.client.broker import BrokerUnavailableError
+
+        try:
+            return BrokerClient(cli_config.ssh)
+        except BrokerUnavailableError as e:
+            # Fall back to a direct connection, which will also show the actual error if we cannot connect.
+            typer.echo(f"{e} Connecting without the SSH broker.", err=True)
+
+    # Imported here since fabric is slow to import and only needed when connecting to the HPC.
+    from dtu_hpc_cli.client.ssh import SSHClient
+
+    return SSHClient()
+
+
+@profiled("client creation")
+def get_async_client() -> "AsyncClient":
+    if is_on_hpc():
+        from dtu_hpc_cli.client.async_local import AsyncLocalClient
+
+        return AsyncLocalClient()
+
+    if cli_config.ssh is not None and cli_config.ssh.broker:
+        from dtu_hpc_cli.client.async_broker import AsyncBrokerClient
+        from dtu_hpc_cli.client.broker import BrokerUnavailableError
+
+        try:
+            return AsyncBrokerClient(cli_config.ssh)
+        except BrokerUnavailableError as e:
+            typer.echo(f"{e} Connecting without the SSH broker.", err=True)
+
+    from dtu_hpc_cli.client.async_ssh import AsyncSSHClient
+
+    return AsyncSSHClient()
+
+
+def is_on_hpc() -> bool:
     # We assume that only HPC has access to the bstat command and use this to determine if we are on the HPC.
     try:
         subprocess.check_output("bstat", shell=True, stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return LocalClient()
+        return True
     except subprocess.CalledProcessError:
-        return SSHClient()
+        return False
@@ -0,0 +1,56 @@
+import abc
+import asyncio
+
+import typer
+
+# Maximum number of commands that run_many runs at the same time.
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncClient(abc.ABC):
+    """Asynchronous counterpart to Client that allows remote work to overlap."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @abc.abstractmethod
+    async def run(self, command: str, cwd: str | None = None, hide: bool = False) -> tuple[int, str]:
+        pass
+
+    async def run_many(
+        self,
+        commands: list[str],
+        cwd: str | None = None,
+        hide: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> list[tuple[int, str]]:
+        """Run the commands concurrently and return their results in the same order as the commands.
+
+        The output of each command is echoed when it finishes, so outputs of different commands are not interleaved."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(command: str) -> tuple[int, str]:
+            async with semaphore:
+                returncode, output = await self.run(command, cwd=cwd, hide=True)
+            if not hide:
+                typer.echo(output, nl=False)
+            return returncode, output
+
+        return await asyncio.gather(*(run_one(command) for command in commands))
+
+    @abc.abstractmethod
+    async def close(self):
+        pass
+
+    @abc.abstractmethod
+    async def get(self, remote_path: str, local_path: str, offset: int = 0):
+        """Download the file. With an offset, only the bytes from the offset are downloaded and appended to the local
+        file, which resumes a partial download."""
+        pass
+
+    @abc.abstractmethod
+    async def put(self, local_path: str, remote_path: str):
+        pass
@@ -0,0 +1,49 @@
+import asyncio
+from collections.abc import Callable
+
+from dtu_hpc_cli.client.async_base import AsyncClient
+from dtu_hpc_cli.client.broker import BrokerClient
+from dtu_hpc_cli.config import SSHConfig
+from dtu_hpc_cli.profiling import profiled
+
+
+class AsyncBrokerClient(AsyncClient):
+    """Runs every command and transfer through the SSH broker, such that no new SSH connection is needed.
+
+    Each operation runs in a worker thread on its own connection to the broker, which runs it on its own channel of the
+    shared SSH connection. Connections to the broker are reused by later operations."""
+
+    def __init__(self, ssh: SSHConfig):
+        super().__init__()
+        self.ssh = ssh
+        # Connect right away, such that an unavailable broker is detected before any work starts.
+        self.idle = [BrokerClient(ssh)]
+
+    async def close(self):
+        for client in self.idle:
+            client.close()
+        self.idle = []
+
+    @profiled("AsyncClient.run")
+    async def run(self, command: str, cwd: str | None = None, hide: bool = False) -> tuple[int, str]:
+        return await self.call(lambda client: client.run(command, cwd=cwd, hide=hide))
+
+    @profiled("AsyncClient.get")
+    async def get(self, remote_path: str, local_path: str, offset: int = 0):
+        await self.call(lambda client: client.get(remote_path, local_path, offset))
+
+    @profiled("AsyncClient.put")
+    async def put(self, local_path: str, remote_path: str):
+        await self.call(lambda client: client.put(local_path, remote_path))
+
+    async def call(self, function: Callable[[BrokerClient], object]):
+        # The pool is only used from the event loop, so it needs no lock.
+        client = self.idle.pop() if len(self.idle) > 0 else BrokerClient(self.ssh)
+        try:
+            result = await asyncio.to_thread(function, client)
+        except BaseException:
+            # The connection may be in the middle of a message, so it cannot be reused.
+            client.close()
+            raise
+        self.idle.append(client)
+        return result
@@ -0,0 +1,42 @@
+import asyncio
+import shutil
+
+from dtu_hpc_cli.client.async_base import AsyncClient
+from dtu_hpc_cli.client.capture import OutputCapture
+from dtu_hpc_cli.client.local import CHUNK_SIZE
+from dtu_hpc_cli.profiling import profiled
+
+
+class AsyncLocalClient(AsyncClient):
+    async def close(self):
+        pass
+
+    @profiled("AsyncClient.run")
+    async def run(self, command: str, cwd: str | None = None, hide: bool = False) -> tuple[int, str]:
+        # Ignore the cwd parameter since we assume that the user is running the command from the correct directory.
+        process = await asyncio.create_subprocess_shell(
+            command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            stdin=asyncio.subprocess.DEVNULL,
+        )
+        with OutputCapture(hide=hide) as capture:
+            # Read whatever is available instead of waiting for whole lines.
+            while data := await process.stdout.read(CHUNK_SIZE):
+                capture.write(data)
+            returncode = await process.wait()
+        return returncode, capture.getvalue()
+
+    @profiled("AsyncClient.get")
+    async def get(self, remote_path: str, local_path: str, offset: int = 0):
+        await asyncio.to_thread(copy_from, remote_path, local_path, offset)
+
+    @profiled("AsyncClient.put")
+    async def put(self, local_path: str, remote_path: str):
+        await asyncio.to_thread(shutil.copyfile, local_path, remote_path)
+
+
+def copy_from(source: str, destination: str, offset: int):
+    with open(source, "rb") as source_file, open(destination, "ab" if offset > 0 else "wb") as destination_file:
+        source_file.seek(offset)
+        shutil.copyfileobj(source_file, destination_file)
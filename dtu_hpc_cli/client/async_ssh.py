@@ -0,0 +1,101 @@
+import asyncio
+import shutil
+
+import fabric
+import paramiko
+
+from dtu_hpc_cli.client.async_base import AsyncClient
+from dtu_hpc_cli.client.capture import OutputCapture
+from dtu_hpc_cli.client.environment import CAPTURE_COMMAND
+from dtu_hpc_cli.client.environment import load_environment
+from dtu_hpc_cli.client.environment import parse_environment
+from dtu_hpc_cli.client.ssh import run_on_channel
+from dtu_hpc_cli.client.ssh import stream_channel
+from dtu_hpc_cli.client.ssh import to_sftp_path
+from dtu_hpc_cli.client.ssh import wrap_command
+from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.constants import CONFIG_FILENAME
+from dtu_hpc_cli.metrics import Metric
+from dtu_hpc_cli.metrics import timed
+from dtu_hpc_cli.profiling import phase
+from dtu_hpc_cli.profiling import profiled
+
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+
+class AsyncSSHClient(AsyncClient):
+    """Runs every command and transfer on its own channel of a single SSH connection.
+
+    paramiko is blocking, so each operation runs in a worker thread while the channels share the connection."""
+
+    def __init__(self):
+        super().__init__()
+
+        cli_config.check_ssh(msg=f"Please provide a SSH configuration in '{CONFIG_FILENAME}'.")
+
+        self.client = fabric.Connection(
+            host=cli_config.ssh.hostname,
+            user=cli_config.ssh.user,
+            connect_kwargs={"key_filename": cli_config.ssh.identityfile},
+        )
+        with phase("SSH connect"), timed(Metric.ssh_connect, cli_config.ssh.hostname):
+            self.client.open()
+
+        self.snapshot = None
+        if cli_config.ssh.cache_environment:
+            self.snapshot = load_environment(cli_config.ssh, self.capture_environment, self.save_snapshot)
+
+    async def close(self):
+        self.client.close()
+
+    @profiled("AsyncClient.run")
+    async def run(self, command: str, cwd: str | None = None, hide: bool = False) -> tuple[int, str]:
+        command = wrap_command(command, self.snapshot)
+        if cwd is not None:
+            command = f"cd {cwd} && {command}"
+
+        # Only the tail of the output is kept in memory, as in SSHClient.run.
+        with OutputCapture(hide=hide) as capture, timed(Metric.round_trip, cli_config.ssh.hostname):
+            returncode = await asyncio.to_thread(stream_channel, self.client.transport, command, capture.write)
+        return returncode, capture.getvalue()
+
+    @profiled("AsyncClient.get")
+    async def get(self, remote_path: str, local_path: str, offset: int = 0):
+        if offset > 0:
+            await asyncio.to_thread(self.resume, remote_path, local_path, offset)
+        else:
+            await asyncio.to_thread(self.transfer, "get", remote_path, local_path)
+
+    @profiled("AsyncClient.put")
+    async def put(self, local_path: str, remote_path: str):
+        await asyncio.to_thread(self.transfer, "put", local_path, remote_path)
+
+    def transfer(self, direction: str, source: str, destination: str):
+        # A separate SFTP session per transfer, such that concurrent transfers do not wait for each other.
+        with paramiko.SFTPClient.from_transport(self.client.transport) as sftp:
+            if direction == "get":
+                sftp.get(to_sftp_path(source), destination)
+            else:
+                sftp.put(source, to_sftp_path(destination))
+
+    def resume(self, source: str, destination: str, offset: int):
+        with (
+            paramiko.SFTPClient.from_transport(self.client.transport) as sftp,
+            sftp.open(to_sftp_path(source), "rb") as source_file,
+            open(destination, "ab") as destination_file,
+        ):
+            source_file.seek(offset)
+            # Request the remaining chunks in parallel like SFTPClient.get does.
+            source_file.prefetch()
+            shutil.copyfileobj(source_file, destination_file, TRANSFER_CHUNK_SIZE)
+
+    def save_snapshot(self, path: str, contents: str):
+        with paramiko.SFTPClient.from_transport(self.client.transport) as sftp, sftp.file(path, "w") as f:
+            f.write(contents)
+
+    def capture_environment(self) -> dict[str, str] | None:
+        outputs = []
+        returncode = run_on_channel(self.client.transport, CAPTURE_COMMAND, outputs.append)
+        if returncode != 0:
+            return None
+        return parse_environment("".join(outputs))
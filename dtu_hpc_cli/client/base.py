@@ -1,4 +1,5 @@
 import abc
+from pathlib import Path
 
 
 class Client(abc.ABC):
@@ -12,13 +13,32 @@ class Client(abc.ABC):
         self.close()
 
     @abc.abstractmethod
-    def run(self, command: str, cwd: str | None = None) -> tuple[int, str]:
+    def run(
+        self,
+        command: str,
+        cwd: str | None = None,
+        hide: bool = False,
+        tee: Path | None = None,
+        interactive: bool = False,
+    ) -> tuple[int, str]:
+        """Run the command and return its return code and output.
+
+        Only the last part of the output is returned when the output is long (see OutputCapture). Use tee to also
+        write the full output to a file. Set interactive to True to pass the local input to the command, otherwise the
+        command sees the end of its input right away."""
         pass
 
     @abc.abstractmethod
     def close(self):
         pass
 
+    @abc.abstractmethod
+    def read(self, path: str, offset: int = 0, size: int = -1) -> bytes:
+        """Read up to size bytes (everything if negative) from the file starting at offset.
+
+        Raises FileNotFoundError if the file does not exist."""
+        pass
+
     @abc.abstractmethod
     def remove(self, path: str):
         pass
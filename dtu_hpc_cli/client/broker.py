@@ -0,0 +1,234 @@
+"""Client for the SSH connection broker.
+
+The broker is a background process that keeps a single authenticated SSH connection to the HPC open and listens on
+a Unix socket (see `dtu_hpc_cli.client.broker_server`). Commands sent to the broker are executed on a new channel of
+the shared connection, which saves the TCP handshake, key exchange and authentication on every invocation of the CLI.
+
+Messages are JSON objects separated by newlines.
+"""
+
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dtu_hpc_cli.client.base import Client
+from dtu_hpc_cli.client.capture import OutputCapture
+from dtu_hpc_cli.client.environment import load_environment
+from dtu_hpc_cli.client.input import InputForwarder
+from dtu_hpc_cli.config import SSHConfig
+from dtu_hpc_cli.error import error_and_exit
+from dtu_hpc_cli.metrics import Metric
+from dtu_hpc_cli.metrics import timed
+from dtu_hpc_cli.profiling import profiled
+
+# Seconds to wait for a newly started broker to accept connections.
+START_TIMEOUT = 30
+
+# Files are transferred through the broker in messages of at most this many bytes.
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+
+class BrokerUnavailableError(Exception):
+    pass
+
+
+class BrokerClient(Client):
+    def __init__(self, ssh: SSHConfig):
+        super().__init__()
+        self.connection = None
+        self.stream = None
+        self.hostname = ssh.hostname
+
+        path = get_socket_path(ssh)
+        try:
+            self.connection = connect(path)
+        except OSError:
+            process = start_broker(ssh, path)
+            self.connection = wait_for_broker(process, path)
+        self.stream = self.connection.makefile("rwb")
+
+        self.snapshot = None
+        if ssh.cache_environment:
+            self.snapshot = load_environment(ssh, self.capture_environment, self.save)
+
+    def close(self):
+        if self.connection is not None:
+            self.stream.close()
+            self.connection.close()
+            self.connection = None
+
+    @profiled("Client.run")
+    def run(
+        self,
+        command: str,
+        cwd: str | None = None,
+        hide: bool = False,
+        tee: Path | None = None,
+        interactive: bool = False,
+    ) -> tuple[int, str]:
+        self.send(
+            {
+                "action": "run",
+                "command": command,
+                "cwd": cwd,
+                "snapshot": self.snapshot,
+                "interactive": interactive,
+            }
+        )
+        # The broker reads input until the end message, which the forwarder always sends when the command is done.
+        forwarder = InputForwarder(self.send_input, self.send_eof) if interactive else contextlib.nullcontext()
+        with OutputCapture(hide=hide, tee=tee) as capture, forwarder, timed(Metric.round_trip, self.hostname):
+            while True:
+                message = self.receive()
+                if "output" not in message:
+                    break
+                capture.write(message["output"].encode())
+        return message["returncode"], capture.getvalue()
+
+    @profiled("Client.read")
+    def read(self, path: str, offset: int = 0, size: int = -1) -> bytes:
+        self.send({"action": "read", "path": path, "offset": offset, "size": size})
+        message = self.receive()
+        if message.get("missing", False):
+            raise FileNotFoundError(path)
+        return base64.b64decode(message["data"])
+
+    @profiled("Client.remove")
+    def remove(self, path: str):
+        self.send({"action": "remove", "path": path})
+        self.receive()
+
+    @profiled("Client.save")
+    def save(self, path: str, contents: str):
+        self.send({"action": "save", "path": path, "contents": contents})
+        self.receive()
+
+    def get(self, remote_path: str, local_path: str, offset: int = 0):
+        """Download the file in chunks. With an offset, the bytes from the offset are appended to the local file."""
+        self.send({"action": "get", "path": remote_path, "offset": offset})
+        with open(local_path, "ab" if offset > 0 else "wb") as f:
+            while "data" in (message := self.receive()):
+                f.write(base64.b64decode(message["data"]))
+
+    def put(self, local_path: str, remote_path: str):
+        """Upload the file in chunks. The broker writes the chunks until the end message."""
+        self.send({"action": "put", "path": remote_path})
+        with open(local_path, "rb") as f:
+            while data := f.read(TRANSFER_CHUNK_SIZE):
+                self.send({"data": base64.b64encode(data).decode()})
+        self.send_eof()
+        self.receive()
+
+    def capture_environment(self) -> dict[str, str] | None:
+        self.send({"action": "environment"})
+        return self.receive()["environment"]
+
+    def send_input(self, data: bytes):
+        self.send({"input": base64.b64encode(data).decode()})
+
+    def send_eof(self):
+        self.send({"eof": True})
+
+    def send(self, message: dict):
+        self.stream.write(json.dumps(message).encode() + b"\n")
+        self.stream.flush()
+
+    def receive(self) -> dict:
+        line = self.stream.readline()
+        if len(line) == 0:
+            error_and_exit("Lost connection to the SSH broker.")
+        message = json.loads(line)
+        if "error" in message:
+            error_and_exit(message["error"])
+        return message
+
+
+def get_socket_path(ssh: SSHConfig) -> Path:
+    """Each SSH configuration gets its own broker in a directory that only the current user can access."""
+    directory = get_broker_directory()
+    key = hashlib.sha256(f"{ssh.user}@{ssh.hostname}:{ssh.identityfile}".encode()).hexdigest()[:16]
+    return directory / f"{key}.sock"
+
+
+def get_broker_directory() -> Path:
+    """Return a directory for the sockets that only the current user can access.
+
+    The runtime directory is private to the user. In the shared temporary directory, another user may have created the
+    directory first to take over the socket, so a directory that we do not own or that others can access is refused."""
+    runtime_directory = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_directory:
+        directory = Path(runtime_directory) / "dtu-hpc-cli"
+    else:
+        directory = Path(tempfile.gettempdir()) / f"dtu-hpc-cli-{os.getuid()}"
+    directory.mkdir(mode=0o700, exist_ok=True)
+
+    info = directory.lstat()
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) != 0o700:
+        raise BrokerUnavailableError(
+            f"Refusing to use '{directory}' for the SSH broker, since it is not a directory that only you can access."
+        )
+    return directory
+
+
+def connect(path: Path) -> socket.socket:
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(str(path))
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+def start_broker(ssh: SSHConfig, path: Path) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "dtu_hpc_cli.client.broker_server",
+        "--hostname",
+        ssh.hostname,
+        "--user",
+        ssh.user,
+        "--identityfile",
+        ssh.identityfile,
+        "--socket",
+        str(path),
+        "--timeout",
+        str(ssh.broker_timeout),
+    ]
+    log_path = path.with_suffix(".log")
+    with open(log_path, "ab") as log:
+        # The broker runs in its own session, so it survives when this process exits.
+        return subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+
+
+def wait_for_broker(process: subprocess.Popen, path: Path) -> socket.socket:
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            return connect(path)
+        except OSError:
+            pass
+        if process.poll() is not None:
+            # Another broker may have won the race of binding the socket.
+            try:
+                return connect(path)
+            except OSError as e:
+                raise BrokerUnavailableError(f"SSH broker exited with code {process.returncode}.") from e
+        time.sleep(0.05)
+    raise BrokerUnavailableError("Timed out while waiting for the SSH broker to start.")
@@ -0,0 +1,262 @@
+"""Background process that shares a single SSH connection to the HPC between invocations of the CLI.
+
+It is started automatically by `BrokerClient` and exits when it has been idle for the configured timeout or when the
+connection to the HPC is lost.
+"""
+
+import argparse
+import base64
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import fabric
+import paramiko
+
+from dtu_hpc_cli.client.broker import TRANSFER_CHUNK_SIZE
+from dtu_hpc_cli.client.environment import CAPTURE_COMMAND
+from dtu_hpc_cli.client.environment import parse_environment
+from dtu_hpc_cli.client.ssh import InputForwarding
+from dtu_hpc_cli.client.ssh import read_file
+from dtu_hpc_cli.client.ssh import run_on_channel
+from dtu_hpc_cli.client.ssh import to_sftp_path
+from dtu_hpc_cli.client.ssh import wrap_command
+from dtu_hpc_cli.metrics import Metric
+from dtu_hpc_cli.metrics import set_command
+from dtu_hpc_cli.metrics import timed
+
+KEEPALIVE_INTERVAL = 30
+
+
+class Broker:
+    def __init__(self, hostname: str, user: str, identityfile: str, socket_path: Path, timeout: int):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+        self.connection = fabric.Connection(host=hostname, user=user, connect_kwargs={"key_filename": identityfile})
+        with timed(Metric.ssh_connect, hostname):
+            self.connection.open()
+        self.connection.transport.set_keepalive(KEEPALIVE_INTERVAL)
+
+        self.lock = threading.Lock()
+        self.active = 0
+        self.last_activity = time.monotonic()
+
+        self.sftp = None
+        self.sftp_lock = threading.Lock()
+
+    def serve(self):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.bind(server)
+        except OSError:
+            # Another broker is already serving this socket.
+            server.close()
+            self.connection.close()
+            return
+
+        server.listen()
+        server.settimeout(1)
+        try:
+            while self.connection.is_connected and not self.is_idle():
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    continue
+                thread = threading.Thread(target=self.handle, args=(connection,), daemon=True)
+                thread.start()
+        finally:
+            server.close()
+            with contextlib.suppress(FileNotFoundError):
+                self.socket_path.unlink()
+            self.connection.close()
+
+    def bind(self, server: socket.socket):
+        if self.socket_path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.socket_path))
+            except OSError:
+                # Stale socket from a broker that did not shut down cleanly.
+                self.socket_path.unlink()
+            else:
+                probe.close()
+                raise OSError(f"Socket '{self.socket_path}' is in use.")
+        server.bind(str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+
+    def is_idle(self) -> bool:
+        with self.lock:
+            return self.active == 0 and time.monotonic() - self.last_activity > self.timeout
+
+    def handle(self, connection: socket.socket):
+        with self.lock:
+            self.active += 1
+        try:
+            with connection, connection.makefile("rwb") as stream:
+                for line in stream:
+                    request = json.loads(line)
+                    if "action" not in request:
+                        # Input for an interactive command that failed before its input was read.
+                        continue
+                    try:
+                        self.dispatch(stream, request)
+                    except Exception as e:
+                        # Errors are reported to the client instead of crashing the broker.
+                        send(stream, {"error": f"SSH broker failed to {request.get('action')}: {e}"})
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.last_activity = time.monotonic()
+
+    def dispatch(self, stream, request: dict):
+        match request["action"]:
+            case "run":
+                self.run(
+                    stream,
+                    request["command"],
+                    request.get("cwd"),
+                    request.get("snapshot"),
+                    request.get("interactive", False),
+                )
+            case "environment":
+                self.capture_environment(stream)
+            case "read":
+                try:
+                    with self.sftp_lock:
+                        data = read_file(self.get_sftp(), request["path"], request["offset"], request["size"])
+                except FileNotFoundError:
+                    send(stream, {"missing": True})
+                else:
+                    send(stream, {"data": base64.b64encode(data).decode()})
+            case "get":
+                self.get(stream, request["path"], request["offset"])
+            case "put":
+                self.put(stream, request["path"])
+            case "remove":
+                with self.sftp_lock:
+                    self.get_sftp().remove(request["path"])
+                send(stream, {"ok": True})
+            case "save":
+                with self.sftp_lock, self.get_sftp().file(request["path"], "w") as f:
+                    f.write(request["contents"])
+                send(stream, {"ok": True})
+            case action:
+                send(stream, {"error": f"Unknown action for SSH broker: {action}"})
+
+    def run(self, stream, command: str, cwd: str | None, snapshot: str | None, interactive: bool):
+        command = wrap_command(command, snapshot)
+        if cwd is not None:
+            command = f"cd {cwd} && {command}"
+        reader = None
+        forward_input = None
+        if interactive:
+            reader = InputReader(stream)
+            forward_input = reader.forward_to
+        returncode = self.execute(command, lambda output: send(stream, {"output": output}), forward_input)
+        send(stream, {"returncode": returncode})
+        if reader is not None:
+            # The client ends its input when it has received the return code. Wait for it, such that the next request
+            # is not read by the input reader.
+            reader.wait()
+
+    def capture_environment(self, stream):
+        outputs = []
+        returncode = self.execute(CAPTURE_COMMAND, outputs.append)
+        environment = parse_environment("".join(outputs)) if returncode == 0 else None
+        send(stream, {"environment": environment})
+
+    def execute(
+        self,
+        command: str,
+        on_output: Callable[[str], None],
+        forward_input: InputForwarding | None = None,
+    ) -> int:
+        return run_on_channel(self.connection.transport, command, on_output, forward_input)
+
+    def get(self, stream, path: str, offset: int):
+        # A separate SFTP session per transfer, such that concurrent transfers do not wait for each other.
+        with (
+            paramiko.SFTPClient.from_transport(self.connection.transport) as sftp,
+            sftp.open(to_sftp_path(path), "rb") as f,
+        ):
+            f.seek(offset)
+            f.prefetch()
+            while data := f.read(TRANSFER_CHUNK_SIZE):
+                send(stream, {"data": base64.b64encode(data).decode()})
+        send(stream, {"ok": True})
+
+    def put(self, stream, path: str):
+        with (
+            paramiko.SFTPClient.from_transport(self.connection.transport) as sftp,
+            sftp.open(to_sftp_path(path), "wb") as f,
+        ):
+            for line in stream:
+                message = json.loads(line)
+                if "data" not in message:
+                    break
+                f.write(base64.b64decode(message["data"]))
+        send(stream, {"ok": True})
+
+    def get_sftp(self):
+        if self.sftp is None:
+            self.sftp = self.connection.sftp()
+        return self.sftp
+
+
+class InputReader:
+    """Passes the input that a client forwards to an interactive command on to its channel."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.channel = None
+        self.thread = threading.Thread(target=self.read, daemon=True)
+
+    def forward_to(self, channel: paramiko.Channel) -> contextlib.AbstractContextManager:
+        self.channel = channel
+        self.thread.start()
+        return contextlib.nullcontext()
+
+    def read(self):
+        for line in self.stream:
+            message = json.loads(line)
+            if "input" in message:
+                # The command may have exited without reading all of its input.
+                with contextlib.suppress(OSError):
+                    self.channel.sendall(base64.b64decode(message["input"]))
+            if message.get("eof", False):
+                with contextlib.suppress(OSError):
+                    self.channel.shutdown_write()
+                return
+
+    def wait(self):
+        if self.thread.ident is not None:
+            self.thread.join()
+
+
+def send(stream, message: dict):
+    stream.write(json.dumps(message).encode() + b"\n")
+    stream.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSH connection broker for the DTU HPC CLI.")
+    parser.add_argument("--hostname", required=True)
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--identityfile", required=True)
+    parser.add_argument("--socket", required=True, type=Path)
+    parser.add_argument("--timeout", required=True, type=int)
+    args = parser.parse_args()
+
+    set_command("broker")
+    broker = Broker(args.hostname, args.user, args.identityfile, args.socket, args.timeout)
+    broker.serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Capture of command output with bounded memory.
+
+Output is handled in chunks of bytes as it arrives: it is echoed to the terminal (unless hidden), optionally written to
+a file and only the last `tail_size` bytes are kept in memory for the return value of `Client.run`.
+"""
+
+import codecs
+import sys
+from pathlib import Path
+
+# Keep this many bytes of output for the return value of Client.run.
+DEFAULT_TAIL_SIZE = 1024 * 1024
+
+
+class OutputCapture:
+    def __init__(self, hide: bool = False, tee: Path | None = None, tail_size: int = DEFAULT_TAIL_SIZE):
+        self.tail_size = tail_size
+        self.tail = bytearray()
+        self.truncated = False
+        self.decoder = None if hide else codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.file = None if tee is None else open(tee, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, data: bytes):
+        if self.decoder is not None:
+            text = self.decoder.decode(data)
+            if len(text) > 0:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+
+        if self.file is not None:
+            self.file.write(data)
+
+        self.tail += data
+        if len(self.tail) > self.tail_size:
+            # Deleting from the start of a bytearray does not copy the remaining bytes.
+            del self.tail[: len(self.tail) - self.tail_size]
+            self.truncated = True
+
+    def close(self):
+        if self.decoder is not None:
+            text = self.decoder.decode(b"", final=True)
+            if len(text) > 0:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            self.decoder = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def getvalue(self) -> str:
+        return self.tail.decode(errors="replace")
@@ -0,0 +1,135 @@
+"""Cache of the remote login environment.
+
+Commands on the HPC normally run in a login shell, which sources the user's full profile (module system, conda
+hooks, etc.) on every call. When `cache_environment` is enabled in the SSH config, we instead capture the environment
+of a login shell once, save it as a script in a directory on the HPC that only the user can read and run commands in a
+non-login shell that sources the script. The environment often contains credentials, so it is never passed on the
+command line, where other users of the login node could see it. Locally, we only cache the path of the script.
+"""
+
+import hashlib
+import json
+import re
+import shlex
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from dtu_hpc_cli.config import SSHConfig
+from dtu_hpc_cli.config import get_cache_directory
+from dtu_hpc_cli.profiling import phase
+from dtu_hpc_cli.profiling import profiled
+
+# Directory on the HPC (relative to the home directory) with the snapshot of the environment.
+REMOTE_DIRECTORY = ".cache/dtu_hpc_cli"
+
+SNAPSHOT_PREFIX = "environment-"
+
+# Older snapshots are removed when a new one is captured.
+CAPTURE_COMMAND = (
+    f"mkdir -p ~/{REMOTE_DIRECTORY} && chmod 700 ~/{REMOTE_DIRECTORY} "
+    + f"&& rm -f ~/{REMOTE_DIRECTORY}/{SNAPSHOT_PREFIX}*.sh && bash -l -c 'env -0'"
+)
+
+CACHE_PREFIX = "environment-"
+
+NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Exported shell functions (e.g. `module`) are passed in the environment as BASH_FUNC_[name]%%.
+FUNCTION_PATTERN = re.compile(r"BASH_FUNC_(.+)%%")
+
+# Variables that describe the shell itself rather than the environment set up by the profile.
+EXCLUDED_VARIABLES = {"_", "OLDPWD", "PWD", "SHLVL"}
+
+
+@profiled("environment")
+def load_environment(
+    ssh: SSHConfig,
+    capture: Callable[[], dict[str, str] | None],
+    save: Callable[[str, str], None],
+) -> str | None:
+    """Return the path of the snapshot on the HPC. A new snapshot is captured and saved if the cache is missing or
+    expired.
+
+    Returns None if the environment could not be captured, in which case commands should run in a login shell."""
+    path = get_cache_path(ssh)
+    fingerprint = get_fingerprint(ssh)
+
+    if path.exists():
+        try:
+            cache = json.loads(path.read_text())
+        except json.JSONDecodeError:
+            cache = None
+        if (
+            cache is not None
+            and cache.get("fingerprint") == fingerprint
+            and time.time() - cache.get("timestamp", 0) < ssh.environment_ttl
+            and "snapshot" in cache
+        ):
+            return cache["snapshot"]
+
+    # Capturing starts a login shell, which is what every command would cost without the cache.
+    with phase("capture (login shell)"):
+        environment = capture()
+    if environment is None:
+        return None
+
+    contents = create_snapshot(environment)
+    snapshot = get_snapshot_path(environment["HOME"], contents)
+    save(snapshot, contents)
+
+    cache = {"snapshot": snapshot, "fingerprint": fingerprint, "timestamp": time.time()}
+    path.write_text(json.dumps(cache))
+    path.chmod(0o600)
+    return snapshot
+
+
+def parse_environment(output: str) -> dict[str, str] | None:
+    """Parse the NUL-separated output of `env -0`."""
+    environment = {}
+    for entry in output.split("\0"):
+        key, separator, value = entry.partition("=")
+        # The profile may print messages before the output of env.
+        key = key.rsplit("\n", 1)[-1]
+        if separator == "" or key in EXCLUDED_VARIABLES:
+            continue
+        environment[key] = value
+    if "PATH" not in environment or "HOME" not in environment:
+        # Something went wrong in the login shell, so we do not trust the output.
+        return None
+    return environment
+
+
+def create_snapshot(environment: dict[str, str]) -> str:
+    """Create a script that restores the environment when sourced by bash."""
+    lines = []
+    for key, value in sorted(environment.items()):
+        match = FUNCTION_PATTERN.fullmatch(key)
+        if match is not None:
+            # The value is the definition without the name, e.g. "() {  echo hi\n}".
+            lines.append(f"{match.group(1)} {value}")
+            lines.append(f"export -f {match.group(1)}")
+        elif NAME_PATTERN.fullmatch(key) is not None:
+            lines.append(f"export {key}={shlex.quote(value)}")
+    # The snapshot is sourced through BASH_ENV (see wrap_command), which must not apply to scripts run by the command.
+    lines.append("unset BASH_ENV")
+    return "\n".join(lines) + "\n"
+
+
+def get_snapshot_path(home: str, contents: str) -> str:
+    """Snapshots are named by their contents, such that a snapshot is never changed while a command sources it."""
+    snapshot_hash = hashlib.sha256(contents.encode()).hexdigest()[:16]
+    return f"{home}/{REMOTE_DIRECTORY}/{SNAPSHOT_PREFIX}{snapshot_hash}.sh"
+
+
+def clear_environment_cache():
+    for path in get_cache_directory().glob(f"{CACHE_PREFIX}*.json"):
+        path.unlink(missing_ok=True)
+
+
+def get_cache_path(ssh: SSHConfig) -> Path:
+    return get_cache_directory() / f"{CACHE_PREFIX}{get_fingerprint(ssh)[:16]}.json"
+
+
+def get_fingerprint(ssh: SSHConfig) -> str:
+    return hashlib.sha256(f"{ssh.user}@{ssh.hostname}".encode()).hexdigest()
@@ -0,0 +1,77 @@
+"""Forwarding of the local input to commands that run on the HPC.
+
+Input is read in a background thread while the command runs and passed on in chunks as it arrives. Reading stops as
+soon as the command has finished, such that the forwarder does not consume input meant for e.g. a later prompt.
+"""
+
+import os
+import select
+import sys
+import threading
+from collections.abc import Callable
+
+CHUNK_SIZE = 32768
+
+# Seconds between checks of whether the command has finished while waiting for input.
+POLL_INTERVAL = 0.1
+
+
+class InputForwarder:
+    """Pass the local input to on_input until it is closed or the forwarder is stopped.
+
+    on_eof is called exactly once: when the local input is closed or when the forwarder is stopped, whichever comes
+    first. Errors from the callbacks (e.g. because the command has exited) stop the forwarding."""
+
+    def __init__(self, on_input: Callable[[bytes], None], on_eof: Callable[[], None]):
+        self.on_input = on_input
+        self.on_eof = on_eof
+        self.lock = threading.Lock()
+        self.done = False
+        self.thread = threading.Thread(target=self.forward, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def stop(self):
+        with self.lock:
+            self.finish()
+
+    def forward(self):
+        try:
+            fileno = sys.stdin.fileno()
+        except (AttributeError, OSError, ValueError):
+            # No input to forward (e.g. stdin is closed or replaced by an object without a file).
+            self.stop()
+            return
+
+        while not self.done:
+            try:
+                readable, _, _ = select.select([fileno], [], [], POLL_INTERVAL)
+                data = os.read(fileno, CHUNK_SIZE) if readable and not self.done else None
+            except OSError:
+                # E.g. select only supports sockets on Windows, so the command gets no input there.
+                data = b""
+
+            with self.lock:
+                if self.done or data is None:
+                    continue
+                if len(data) == 0:
+                    self.finish()
+                    return
+                try:
+                    self.on_input(data)
+                except OSError:
+                    self.finish()
+
+    def finish(self):
+        if self.done:
+            return
+        self.done = True
+        try:
+            self.on_eof()
+        except OSError:
+            pass
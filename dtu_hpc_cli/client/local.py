@@ -1,37 +1,54 @@
 import os
 import subprocess
-
-import typer
+from pathlib import Path
 
 from dtu_hpc_cli.client.base import Client
+from dtu_hpc_cli.client.capture import OutputCapture
+from dtu_hpc_cli.profiling import profiled
+
+CHUNK_SIZE = 65536
 
 
 class LocalClient(Client):
     def close(self):
         pass
 
-    def run(self, command: str, cwd: str | None = None) -> tuple[int, str]:
+    @profiled("Client.run")
+    def run(
+        self,
+        command: str,
+        cwd: str | None = None,
+        hide: bool = False,
+        tee: Path | None = None,
+        interactive: bool = False,
+    ) -> tuple[int, str]:
         # Ignore the cwd parameter since we assume that the user is running the command from the correct directory.
-        outputs = []
-        with subprocess.Popen(
-            command,
-            shell=True,
-            text=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            bufsize=1,
-            universal_newlines=True,
-        ) as process:
-            for line in process.stdout:
-                typer.echo(line, nl=False)
-                outputs.append(line)
-            returncode = process.wait()
-        output = "".join(outputs)
-        return returncode, output
+        with OutputCapture(hide=hide, tee=tee) as capture:
+            with subprocess.Popen(
+                command,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=None if interactive else subprocess.DEVNULL,
+                bufsize=0,
+            ) as process:
+                # Read whatever is available instead of waiting for whole lines.
+                while data := process.stdout.read(CHUNK_SIZE):
+                    capture.write(data)
+                returncode = process.wait()
+        return returncode, capture.getvalue()
+
+    @profiled("Client.read")
+    def read(self, path: str, offset: int = 0, size: int = -1) -> bytes:
+        with open(os.path.expanduser(path), "rb") as f:
+            f.seek(offset)
+            return f.read(size)
 
+    @profiled("Client.remove")
     def remove(self, path: str):
         os.remove(path)
 
+    @profiled("Client.save")
     def save(self, path: str, contents: str):
         with open(path, "w") as f:
             f.write(contents)
@@ -1,8 +1,28 @@
+import codecs
+import contextlib
+import shlex
+from collections.abc import Callable
+from pathlib import Path
+
 import fabric
+import paramiko
 
 from dtu_hpc_cli.client.base import Client
+from dtu_hpc_cli.client.capture import OutputCapture
+from dtu_hpc_cli.client.environment import CAPTURE_COMMAND
+from dtu_hpc_cli.client.environment import load_environment
+from dtu_hpc_cli.client.environment import parse_environment
+from dtu_hpc_cli.client.input import InputForwarder
 from dtu_hpc_cli.config import cli_config
 from dtu_hpc_cli.constants import CONFIG_FILENAME
+from dtu_hpc_cli.metrics import Metric
+from dtu_hpc_cli.metrics import timed
+from dtu_hpc_cli.profiling import phase
+from dtu_hpc_cli.profiling import profiled
+
+CHUNK_SIZE = 32768
+
+InputForwarding = Callable[[paramiko.Channel], contextlib.AbstractContextManager]
 
 
 class SSHClient(Client):
@@ -17,23 +37,139 @@ class SSHClient(Client):
             connect_kwargs={"key_filename": cli_config.ssh.identityfile},
         )
 
+        self.snapshot = None
+        if cli_config.ssh.cache_environment:
+            self.snapshot = load_environment(cli_config.ssh, self.capture_environment, self.save)
+
     def close(self):
         self.client.close()
 
-    def run(self, command: str, cwd: str | None = None) -> tuple[int, str]:
-        command = f'bash -l -c "{command}"'
+    @profiled("Client.run")
+    def run(
+        self,
+        command: str,
+        cwd: str | None = None,
+        hide: bool = False,
+        tee: Path | None = None,
+        interactive: bool = False,
+    ) -> tuple[int, str]:
+        command = wrap_command(command, self.snapshot)
         if cwd is not None:
-            with self.client.cd(cwd):
-                result = self.client.run(command, warn=True)
-        else:
-            result = self.client.run(command, warn=True)
-        return result.exited, result.stdout
+            command = f"cd {cwd} && {command}"
+        # Stream the output through a capture instead of letting fabric keep all of it in memory.
+        if not self.client.is_connected:
+            with phase("SSH connect"), timed(Metric.ssh_connect, cli_config.ssh.hostname):
+                self.client.open()
+        forward_input = forward_stdin if interactive else None
+        with OutputCapture(hide=hide, tee=tee) as capture, timed(Metric.round_trip, cli_config.ssh.hostname):
+            returncode = stream_channel(self.client.transport, command, capture.write, forward_input)
+        return returncode, capture.getvalue()
+
+    @profiled("Client.read")
+    def read(self, path: str, offset: int = 0, size: int = -1) -> bytes:
+        return read_file(self.client.sftp(), path, offset, size)
 
+    @profiled("Client.remove")
     def remove(self, path: str):
         sftp = self.client.sftp()
         sftp.remove(path)
 
+    @profiled("Client.save")
     def save(self, path: str, contents: str):
         sftp = self.client.sftp()
         with sftp.file(path, "w") as f:
             f.write(contents)
+
+    def capture_environment(self) -> dict[str, str] | None:
+        result = self.client.run(CAPTURE_COMMAND, hide=True, warn=True, in_stream=False)
+        if result.exited != 0:
+            return None
+        return parse_environment(result.stdout)
+
+
+def wrap_command(command: str, snapshot: str | None = None) -> str:
+    """Run the command in a login shell, such that the user's environment (e.g., modules) is available.
+
+    If the path of an environment snapshot is given, the command runs in a non-login shell with exactly that
+    environment instead, which avoids sourcing the user's profile on every call. The login shell is still used if the
+    snapshot has been removed, e.g. because a newer snapshot was captured by another project."""
+    if snapshot is None:
+        return f'bash -l -c "{command}"'
+    snapshot = shlex.quote(snapshot)
+    return (
+        f'if [ -r {snapshot} ]; then env -i BASH_ENV={snapshot} bash -c "{command}"; '
+        + f'else bash -l -c "{command}"; fi'
+    )
+
+
+def forward_stdin(channel: paramiko.Channel) -> InputForwarder:
+    return InputForwarder(channel.sendall, channel.shutdown_write)
+
+
+def read_file(sftp: paramiko.SFTPClient, path: str, offset: int, size: int) -> bytes:
+    with sftp.open(to_sftp_path(path), "rb") as f:
+        f.seek(offset)
+        return f.read(size if size >= 0 else None)
+
+
+def to_sftp_path(path: str) -> str:
+    # SFTP does not expand ~, but relative paths are relative to the home directory.
+    if path == "~":
+        return "."
+    if path.startswith("~/"):
+        return path[2:]
+    return path
+
+
+def run_on_channel(
+    transport: paramiko.Transport,
+    command: str,
+    on_output: Callable[[str], None],
+    forward_input: InputForwarding | None = None,
+) -> int:
+    """Run the command on a new channel of an open connection and return its exit code.
+
+    Many channels can be open on the same connection at once. Output is decoded and passed to on_output as it
+    arrives. forward_input is entered with the channel while the command runs to pass input to it (see forward_stdin),
+    otherwise the command sees the end of its input right away."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def on_data(data: bytes):
+        output = decoder.decode(data)
+        if len(output) > 0:
+            on_output(output)
+
+    returncode = stream_channel(transport, command, on_data, forward_input)
+    output = decoder.decode(b"", final=True)
+    if len(output) > 0:
+        on_output(output)
+    return returncode
+
+
+def stream_channel(
+    transport: paramiko.Transport,
+    command: str,
+    on_data: Callable[[bytes], None],
+    forward_input: InputForwarding | None = None,
+) -> int:
+    """Like run_on_channel, but passes the raw bytes to on_data."""
+    channel = transport.open_session()
+    try:
+        # Combine stdout and stderr like the local client does.
+        channel.set_combine_stderr(True)
+        channel.exec_command(command)
+        if forward_input is None:
+            # Commands that read their input (e.g. prompts) see its end instead of waiting forever.
+            channel.shutdown_write()
+            forwarder = contextlib.nullcontext()
+        else:
+            forwarder = forward_input(channel)
+        with forwarder:
+            while True:
+                data = channel.recv(CHUNK_SIZE)
+                if len(data) == 0:
+                    break
+                on_data(data)
+        return channel.recv_exit_status()
+    finally:
+        channel.close()
@@ -1,20 +1,38 @@
 import dataclasses
+import enum
 import json
+import os
+import threading
 from hashlib import sha256
 from pathlib import Path
 
-from git import Repo
-
 from dtu_hpc_cli.constants import CONFIG_FILENAME
 from dtu_hpc_cli.constants import HISTORY_FILENAME
 from dtu_hpc_cli.error import error_and_exit
+from dtu_hpc_cli.profiling import phase
 from dtu_hpc_cli.types import Memory
 from dtu_hpc_cli.types import Time
 
 ACTIVE_BRANCH_KEY = "[[active_branch]]"
 
+DEFAULT_BROKER_TIMEOUT = 600
+
+DEFAULT_ENVIRONMENT_TTL = 24 * 60 * 60
+
 DEFAULT_HOSTNAME = "login1.hpc.dtu.dk"
 
+# Files that determine the installed dependencies of common Python project setups.
+DEFAULT_INSTALL_INPUTS = [
+    "Pipfile.lock",
+    "environment.yml",
+    "poetry.lock",
+    "pyproject.toml",
+    "requirements*.txt",
+    "setup.cfg",
+    "setup.py",
+    "uv.lock",
+]
+
 DEFAULT_SUBMIT_BRANCH = "main"
 
 
@@ -22,6 +40,9 @@ DEFAULT_SUBMIT_BRANCH = "main"
 class InstallConfig:
     commands: list[str]
     sync: bool
+    inputs: list[str] = dataclasses.field(default_factory=lambda: list(DEFAULT_INSTALL_INPUTS))
+    per_branch: bool = False
+    skip_unchanged: bool = True
 
     @classmethod
     def load(cls, config: dict):
@@ -50,7 +71,30 @@ class InstallConfig:
         if not isinstance(sync, bool):
             error_and_exit(f"Invalid type for sync option in install config. Expected boolean but got {type(sync)}.")
 
-        return cls(commands=commands, sync=sync)
+        inputs = install.get("inputs", DEFAULT_INSTALL_INPUTS)
+        if not isinstance(inputs, list):
+            error_and_exit(f"Invalid type for inputs option in install config. Expected list but got {type(inputs)}.")
+
+        per_branch = install.get("per_branch", False)
+        if not isinstance(per_branch, bool):
+            error_and_exit(
+                f"Invalid type for per_branch option in install config. Expected boolean but got {type(per_branch)}."
+            )
+
+        skip_unchanged = install.get("skip_unchanged", True)
+        if not isinstance(skip_unchanged, bool):
+            error_and_exit(
+                "Invalid type for skip_unchanged option in install config. "
+                + f"Expected boolean but got {type(skip_unchanged)}."
+            )
+
+        return cls(
+            commands=commands,
+            sync=sync,
+            inputs=list(inputs),
+            per_branch=per_branch,
+            skip_unchanged=skip_unchanged,
+        )
 
 
 @dataclasses.dataclass
@@ -58,6 +102,10 @@ class SSHConfig:
     hostname: str
     user: str
     identityfile: str
+    broker: bool = False
+    broker_timeout: int = DEFAULT_BROKER_TIMEOUT
+    cache_environment: bool = False
+    environment_ttl: int = DEFAULT_ENVIRONMENT_TTL
 
     @classmethod
     def load(cls, config: dict):
@@ -79,7 +127,117 @@ class SSHConfig:
             error_and_exit('"identityfile" not found in SSH config')
         identityfile = ssh["identityfile"]
 
-        return cls(hostname=hostname, identityfile=identityfile, user=user)
+        broker = ssh.get("broker", False)
+        if not isinstance(broker, bool):
+            error_and_exit(f"Invalid type for broker option in SSH config. Expected boolean but got {type(broker)}.")
+
+        broker_timeout = ssh.get("broker_timeout", DEFAULT_BROKER_TIMEOUT)
+        if not isinstance(broker_timeout, int):
+            error_and_exit(
+                "Invalid type for broker_timeout option in SSH config. "
+                + f"Expected integer but got {type(broker_timeout)}."
+            )
+
+        cache_environment = ssh.get("cache_environment", False)
+        if not isinstance(cache_environment, bool):
+            error_and_exit(
+                "Invalid type for cache_environment option in SSH config. "
+                + f"Expected boolean but got {type(cache_environment)}."
+            )
+
+        environment_ttl = ssh.get("environment_ttl", DEFAULT_ENVIRONMENT_TTL)
+        if not isinstance(environment_ttl, int):
+            error_and_exit(
+                "Invalid type for environment_ttl option in SSH config. "
+                + f"Expected integer but got {type(environment_ttl)}."
+            )
+
+        return cls(
+            hostname=hostname,
+            identityfile=identityfile,
+            user=user,
+            broker=broker,
+            broker_timeout=broker_timeout,
+            cache_environment=cache_environment,
+            environment_ttl=environment_ttl,
+        )
+
+
+class SyncStrategy(enum.StrEnum):
+    rsync = "rsync"
+    git = "git"
+
+
+@dataclasses.dataclass
+class SyncConfig:
+    strategy: SyncStrategy
+    include_uncommitted: bool
+
+    @classmethod
+    def load(cls, config: dict):
+        sync = config.get("sync", {})
+
+        if not isinstance(sync, dict):
+            error_and_exit(f"Invalid type for sync option in config. Expected dictionary but got {type(sync)}.")
+
+        strategy = sync.get("strategy", SyncStrategy.rsync.value)
+        if strategy not in SyncStrategy.__members__:
+            options = ", ".join(SyncStrategy.__members__)
+            error_and_exit(f"Invalid strategy in sync config: {strategy}. Expected one of: {options}.")
+
+        include_uncommitted = sync.get("include_uncommitted", True)
+        if not isinstance(include_uncommitted, bool):
+            error_and_exit(
+                "Invalid type for include_uncommitted option in sync config. "
+                + f"Expected boolean but got {type(include_uncommitted)}."
+            )
+
+        return cls(strategy=SyncStrategy(strategy), include_uncommitted=include_uncommitted)
+
+
+@dataclasses.dataclass
+class FetchConfig:
+    results: list[str]
+
+    @classmethod
+    def load(cls, config: dict):
+        fetch = config.get("fetch", {})
+
+        if not isinstance(fetch, dict):
+            error_and_exit(f"Invalid type for fetch option in config. Expected dictionary but got {type(fetch)}.")
+
+        results = fetch.get("results", [])
+        if not isinstance(results, list) or not all(isinstance(result, str) for result in results):
+            error_and_exit(f"Invalid results option in fetch config. Expected list of strings but got {results}.")
+
+        return cls(results=results)
+
+
+@dataclasses.dataclass
+class ScriptsConfig:
+    max_age_days: int
+    max_size_mb: int
+
+    @classmethod
+    def load(cls, config: dict):
+        scripts = config.get("scripts", {})
+
+        if not isinstance(scripts, dict):
+            error_and_exit(f"Invalid type for scripts option in config. Expected dictionary but got {type(scripts)}.")
+
+        max_age_days = scripts.get("max_age_days", 30)
+        if not isinstance(max_age_days, int) or max_age_days < 0:
+            error_and_exit(
+                f"Invalid max_age_days option in scripts config. Expected non-negative integer but got {max_age_days}."
+            )
+
+        max_size_mb = scripts.get("max_size_mb", 100)
+        if not isinstance(max_size_mb, int) or max_size_mb < 0:
+            error_and_exit(
+                f"Invalid max_size_mb option in scripts config. Expected non-negative integer but got {max_size_mb}."
+            )
+
+        return cls(max_age_days=max_age_days, max_size_mb=max_size_mb)
 
 
 @dataclasses.dataclass
@@ -99,6 +257,7 @@ class SubmitConfig:
     preamble: list[str]
     split_every: Time
     start_after: str | None
+    sweep: list[dict[str, str]] | None
     sync: bool
     walltime: Time
 
@@ -120,12 +279,13 @@ class SubmitConfig:
             "preamble": [],
             "split_every": "1d",
             "start_after": None,
+            "sweep": None,
             "sync": True,
             "walltime": "1d",
         }
 
     @classmethod
-    def load(cls, config: dict, project_root: Path):
+    def load(cls, config: dict):
         if "submit" not in config:
             return cls.defaults()
 
@@ -138,14 +298,13 @@ class SubmitConfig:
         for key in submit.keys():
             if key not in cls.__annotations__:
                 error_and_exit(f"Unknown option in submit config: {key}")
+        if "sweep" in submit:
+            # A sweep belongs to a single submission, so it is only given on the command line.
+            error_and_exit("Sweeps cannot be set in the submit config. Use --sweep or --sweep-file instead.")
 
-        output = {**cls.defaults(), **submit}
-
-        if output["branch"] == ACTIVE_BRANCH_KEY:
-            with Repo(project_root) as repo:
-                output["branch"] = repo.active_branch.name
-
-        return output
+        # The active branch is resolved when the default is used (see resolve_submit_default),
+        # so loading the config does not require opening the git repository.
+        return {**cls.defaults(), **submit}
 
     def to_dict(self):
         return {
@@ -164,6 +323,7 @@ class SubmitConfig:
             "preamble": self.preamble,
             "split_every": str(self.split_every),
             "start_after": self.start_after,
+            "sweep": self.sweep,
             "sync": self.sync,
             "walltime": str(self.walltime),
         }
@@ -186,6 +346,7 @@ class SubmitConfig:
             preamble=data["preamble"],
             split_every=Time.parse(data["split_every"]),
             start_after=data["start_after"],
+            sweep=data.get("sweep"),
             sync=data.get("sync", True),
             walltime=Time.parse(data["walltime"]),
         )
@@ -193,12 +354,15 @@ class SubmitConfig:
 
 @dataclasses.dataclass
 class CLIConfig:
+    fetch: FetchConfig
     history_path: Path
     install: InstallConfig | None
     project_root: Path
     remote_path: str
+    scripts: ScriptsConfig
     ssh: SSHConfig | None
     submit: SubmitConfig | None
+    sync: SyncConfig
 
     @classmethod
     def load(cls):
@@ -218,6 +382,8 @@ class CLIConfig:
         if not isinstance(config, dict):
             error_and_exit(f"Invalid type for config. Expected dictionary but got {type(config)}.")
 
+        fetch = FetchConfig.load(config)
+
         install = InstallConfig.load(config)
 
         history_path = cls.load_history_path(config, project_root)
@@ -225,15 +391,22 @@ class CLIConfig:
         remote_path = cls.load_remote_path(config, project_root)
         ssh = SSHConfig.load(config)
 
-        submit = SubmitConfig.load(config, project_root)
+        scripts = ScriptsConfig.load(config)
+
+        submit = SubmitConfig.load(config)
+
+        sync = SyncConfig.load(config)
 
         return cls(
+            fetch=fetch,
             history_path=history_path,
             install=install,
             project_root=project_root,
             remote_path=remote_path,
+            scripts=scripts,
             ssh=ssh,
             submit=submit,
+            sync=sync,
         )
 
     @classmethod
@@ -277,5 +450,46 @@ class CLIConfig:
         if self.ssh is None:
             error_and_exit(msg)
 
+    def resolve_submit_default(self, key: str):
+        value = self.submit.get(key)
+        if key == "branch" and value == ACTIVE_BRANCH_KEY:
+            value = get_active_branch(self.project_root)
+        return value
+
+
+class LazyCLIConfig:
+    """Proxy that loads the CLI config on first attribute access.
+
+    This allows commands like `--version` and `--help` to run without locating and parsing the config."""
+
+    def __init__(self):
+        self._config = None
+        # Background threads (e.g. in submit) may access the config at the same time.
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    with phase("config load"):
+                        self._config = CLIConfig.load()
+        return getattr(self._config, name)
+
+
+def get_cache_directory() -> Path:
+    """Directory for data that the CLI can recreate when missing (e.g., cached remote environments)."""
+    base = os.environ.get("XDG_CACHE_HOME")
+    base = Path(base) if base else Path.home() / ".cache"
+    directory = base / "dtu_hpc_cli"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def get_active_branch(project_root: Path) -> str:
+    from git import Repo
+
+    with Repo(project_root) as repo:
+        return repo.active_branch.name
+
 
-cli_config = CLIConfig.load()
+cli_config = LazyCLIConfig()
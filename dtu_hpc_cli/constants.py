@@ -1,3 +1,16 @@
 CONFIG_FILENAME = ".dtu_hpc.json"
 
+# The history is stored as JSON Lines, but keeps the name of older versions such that existing ignore rules apply.
 HISTORY_FILENAME = ".dtu_hpc_history.json"
+
+# Directory in the remote path with a stamp of the last successful install (per branch if per_branch is set).
+INSTALL_STAMP_DIRECTORY = ".dtu_hpc_install"
+
+# Directory in the remote path with an environment directory per branch if per_branch is set.
+INSTALL_ENVIRONMENT_DIRECTORY = ".dtu_hpc_environments"
+
+# Directory in the remote path where job scripts are stored by their hash.
+SCRIPT_DIRECTORY = ".dtu_scripts"
+
+# Directories that the CLI creates in the remote path. They are not part of the project, so sync must not delete them.
+REMOTE_DIRECTORIES = [INSTALL_ENVIRONMENT_DIRECTORY, INSTALL_STAMP_DIRECTORY, SCRIPT_DIRECTORY]
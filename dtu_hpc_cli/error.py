@@ -1,9 +1,36 @@
+import contextlib
+import contextvars
 import sys
 
-import rich
+# Whether error_and_exit should raise a DeferredError instead of printing the error (see defer_errors).
+_deferred = contextvars.ContextVar("deferred", default=False)
+
+
+class DeferredError(SystemExit):
+    """Error from a background thread, which is reported by the thread that waits for the result."""
+
+    def __init__(self, message: str, code: int):
+        super().__init__(code)
+        self.message = message
 
 
 def error_and_exit(message: str, code: int = 1):
-    panel = rich.panel.Panel(message, border_style="red", title="Error", title_align="left")
+    if _deferred.get():
+        raise DeferredError(message, code)
+
+    import rich
+    from rich.panel import Panel
+
+    panel = Panel(message, border_style="red", title="Error", title_align="left")
     rich.print(panel)
     sys.exit(code)
+
+
+@contextlib.contextmanager
+def defer_errors():
+    """Raise errors as DeferredError instead of printing them, e.g. while the main thread shows a prompt."""
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
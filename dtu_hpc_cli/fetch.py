@@ -0,0 +1,257 @@
+import asyncio
+import dataclasses
+import json
+import os
+import re
+import shlex
+from pathlib import Path
+from pathlib import PurePosixPath
+
+import typer
+from rich.progress import BarColumn
+from rich.progress import DownloadColumn
+from rich.progress import Progress
+from rich.progress import TextColumn
+from rich.progress import TransferSpeedColumn
+
+from dtu_hpc_cli.client import get_async_client
+from dtu_hpc_cli.client import is_on_hpc
+from dtu_hpc_cli.config import SubmitConfig
+from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.constants import CONFIG_FILENAME
+from dtu_hpc_cli.error import error_and_exit
+from dtu_hpc_cli.history import find_entry
+from dtu_hpc_cli.history import get_history_store
+from dtu_hpc_cli.logs import create_log_paths
+
+# Suffix of files that are being downloaded. They are resumed by the next fetch if the download is interrupted.
+PARTIAL_SUFFIX = ".part"
+
+# Suffix of the size and modification time of the remote file that a partial file is a part of. A partial file is only
+# resumed if the remote file has not changed since.
+METADATA_SUFFIX = ".part.json"
+
+# Modification times are compared with this tolerance (in seconds), since some file systems round them.
+MTIME_TOLERANCE = 1.0
+
+# Wildcards of result globs that are left unquoted, such that the remote shell expands them.
+WILDCARD_PATTERN = re.compile(r"(\*|\?|\[!?[\w.-]+\])")
+
+# Characters that cannot be passed through the double quotes that remote commands are wrapped in (see wrap_command).
+UNSAFE_CHARACTERS = '"$`\\'
+
+
+@dataclasses.dataclass
+class FetchCommandConfig:
+    job_ids: list[str] | None
+    name: str | None
+    branch: str | None
+    results: list[str]
+    logs: bool
+    destination: Path
+    concurrency: int
+
+
+@dataclasses.dataclass
+class RemoteFile:
+    path: str
+    size: int
+    mtime: float
+
+
+def execute_fetch(config: FetchCommandConfig):
+    if is_on_hpc():
+        error_and_exit("The fetch command downloads files from the HPC and must be used on your local machine.")
+    cli_config.check_ssh(msg=f"Fetch requires a SSH configuration in '{CONFIG_FILENAME}'.")
+
+    entries = select_entries(config)
+    if len(entries) == 0:
+        typer.echo("No jobs found in history with the given filters.")
+        return
+
+    patterns = []
+    for entry in entries:
+        patterns.extend(create_patterns(entry, config))
+    patterns = list(dict.fromkeys(patterns))
+
+    fetched, skipped = asyncio.run(fetch(patterns, config))
+    typer.echo(f"Fetched {fetched} file(s) to '{config.destination}'. Skipped {skipped} file(s) that were up to date.")
+
+
+def select_entries(config: FetchCommandConfig) -> list[dict]:
+    """Select history entries by job ID or by name and/or branch."""
+    if config.job_ids is not None and len(config.job_ids) > 0:
+        entries = []
+        for job_id in config.job_ids:
+            entry = find_entry(job_id)
+            if entry is None:
+                error_and_exit(f"Job '{job_id}' not found in history.")
+            entries.append(entry)
+        return entries
+
+    if config.name is None and config.branch is None:
+        error_and_exit("Please provide job IDs or select jobs using --name and/or --branch.")
+
+    entries = []
+    for entry in get_history_store().iterate_newest_first():
+        values = entry["config"]
+        if config.name is not None and values["name"] != config.name:
+            continue
+        if config.branch is not None and values["branch"] != config.branch:
+            continue
+        entries.append(entry)
+    return entries
+
+
+def create_patterns(entry: dict, config: FetchCommandConfig) -> list[str]:
+    """Return shell patterns (relative to the remote path) that match the files to fetch for a history entry.
+
+    The log files are quoted literal paths, while result patterns are globs that may contain {name} and {job_id}."""
+    submit_config = SubmitConfig.from_dict(entry["config"])
+    job_ids = entry["job_ids"]
+
+    patterns = []
+    if config.logs:
+        indexes = [None] if submit_config.sweep is None else range(1, len(submit_config.sweep) + 1)
+        for error in (False, True):
+            for index in indexes:
+                for path in create_log_paths(submit_config, job_ids, error, index):
+                    patterns.append(quote_path(to_relative_path(path)))
+
+    for result in config.results:
+        for job_id in job_ids:
+            pattern = result.replace("{name}", submit_config.name).replace("{job_id}", job_id)
+            if ".." in PurePosixPath(pattern).parts:
+                error_and_exit(f"Result '{pattern}' must not contain '..'.")
+            if any(character in UNSAFE_CHARACTERS for character in pattern):
+                error_and_exit(f"Result '{pattern}' must not contain any of the characters {UNSAFE_CHARACTERS}.")
+            if pattern.startswith("-"):
+                # find would take it as an option.
+                pattern = f"./{pattern}"
+            patterns.append(quote_glob(pattern))
+
+    return patterns
+
+
+def quote_glob(pattern: str) -> str:
+    """Quote a glob for the shell, except for its wildcards (*, ? and [...]) and a leading ~."""
+    prefix = ""
+    if pattern == "~":
+        return pattern
+    if pattern.startswith("~/"):
+        prefix, pattern = "~/", pattern[2:]
+    parts = WILDCARD_PATTERN.split(pattern)
+    # Splitting on a group alternates between literal text and wildcards.
+    return prefix + "".join(part if index % 2 == 1 else shlex.quote(part) for index, part in enumerate(parts) if part)
+
+
+def quote_path(path: str) -> str:
+    """Quote a literal path for the shell, except for a leading ~, which must be expanded by the shell."""
+    if path == "~":
+        return path
+    if path.startswith("~/"):
+        return "~/" + shlex.quote(path[2:])
+    return shlex.quote(path)
+
+
+def to_relative_path(path: str) -> str:
+    prefix = cli_config.remote_path.rstrip("/") + "/"
+    return path[len(prefix) :] if path.startswith(prefix) else path
+
+
+async def fetch(patterns: list[str], config: FetchCommandConfig) -> tuple[int, int]:
+    async with get_async_client() as client:
+        files = await list_files(client, patterns)
+
+        downloads = []
+        for file in files:
+            local_path = get_local_path(file.path, config.destination)
+            if is_up_to_date(local_path, file):
+                continue
+            downloads.append((file, local_path))
+
+        if len(downloads) == 0:
+            return 0, len(files)
+
+        total = sum(file.size for file, _ in downloads)
+        columns = [
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            DownloadColumn(),
+            TransferSpeedColumn(),
+        ]
+        with Progress(*columns) as progress:
+            task = progress.add_task(description=f"Fetching {len(downloads)} file(s)", total=total)
+            semaphore = asyncio.Semaphore(config.concurrency)
+
+            async def download(file: RemoteFile, local_path: Path):
+                async with semaphore:
+                    await download_file(client, file, local_path)
+                progress.advance(task, file.size)
+
+            await asyncio.gather(*(download(file, local_path) for file, local_path in downloads))
+
+    return len(downloads), len(files) - len(downloads)
+
+
+async def list_files(client, patterns: list[str]) -> list[RemoteFile]:
+    """List the files matching the patterns with their size and modification time using a single command.
+
+    Directories are listed recursively."""
+    command = f"find {' '.join(patterns)} -type f -printf '%s %T@ %p\\n' 2>/dev/null"
+    # find fails if some of the patterns do not match anything, which is fine.
+    _, output = await client.run(command, cwd=cli_config.remote_path, hide=True)
+    files = {}
+    for line in output.splitlines():
+        parts = line.split(" ", 2)
+        if len(parts) != 3 or not parts[0].isdigit():
+            # The profile may print messages before the output of find.
+            continue
+        size, mtime, path = parts
+        path = path.removeprefix("./")
+        files[path] = RemoteFile(path=path, size=int(size), mtime=float(mtime))
+    return list(files.values())
+
+
+def get_local_path(remote_path: str, destination: Path) -> Path:
+    # Files outside of the remote path are placed in the destination using their full path.
+    local_path = destination / remote_path.lstrip("/")
+    if ".." in PurePosixPath(remote_path).parts or not local_path.resolve().is_relative_to(destination.resolve()):
+        error_and_exit(f"Refusing to fetch '{remote_path}' since it would be saved outside of '{destination}'.")
+    return local_path
+
+
+def is_up_to_date(local_path: Path, file: RemoteFile) -> bool:
+    if not local_path.exists():
+        return False
+    stat = local_path.stat()
+    return stat.st_size == file.size and abs(stat.st_mtime - file.mtime) <= MTIME_TOLERANCE
+
+
+async def download_file(client, file: RemoteFile, local_path: Path):
+    """Download to a partial file first, which is resumed if it exists, and keep the remote modification time."""
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = local_path.with_name(local_path.name + PARTIAL_SUFFIX)
+    metadata_path = local_path.with_name(local_path.name + METADATA_SUFFIX)
+    metadata = {"size": file.size, "mtime": file.mtime}
+
+    offset = 0
+    if partial_path.exists() and read_metadata(metadata_path) == metadata:
+        offset = partial_path.stat().st_size
+        if offset > file.size:
+            offset = 0
+    metadata_path.write_text(json.dumps(metadata))
+
+    remote_path = file.path if os.path.isabs(file.path) else f"{cli_config.remote_path}/{file.path}"
+    await client.get(remote_path, str(partial_path), offset=offset)
+
+    os.utime(partial_path, (file.mtime, file.mtime))
+    partial_path.replace(local_path)
+    metadata_path.unlink(missing_ok=True)
+
+
+def read_metadata(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
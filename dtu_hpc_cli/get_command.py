@@ -1,13 +1,18 @@
+import json
+
 import typer
 
 from dtu_hpc_cli.history import find_job
 
+SWEEP_FILENAME = "sweep.json"
+
 
 def execute_get_command(job_id: str):
     config = find_job(job_id)
 
     preamble = config.pop("preamble", [])
     submit_commands = config.pop("commands", [])
+    sweep = config.pop("sweep", None)
 
     command = ["dtu submit"]
     for key, value in config.items():
@@ -22,8 +27,13 @@ def execute_get_command(job_id: str):
         else:
             command.append(f"--{key} {value}")
 
+    if sweep is not None:
+        command.append(f"--sweep-file {SWEEP_FILENAME}")
     command.extend(f'--preamble "{c}"' for c in preamble)
     command.extend(f'"{c}"' for c in submit_commands)
     command = " \\\n    ".join(command)
 
     typer.echo(command)
+
+    if sweep is not None:
+        typer.echo(f"\nwhere '{SWEEP_FILENAME}' contains:\n{json.dumps(sweep, indent=4)}")
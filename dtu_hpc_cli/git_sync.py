@@ -0,0 +1,178 @@
+"""Sync strategy that ships commits instead of the working tree.
+
+We ask the remote repository for its branches and create a git bundle with only the objects that the remote is
+missing. The bundle (and optionally a patch with the uncommitted changes to tracked files) is transferred and applied
+on the HPC. Untracked files are not transferred.
+"""
+
+import re
+import shlex
+import subprocess
+import tempfile
+from pathlib import Path
+
+import typer
+from git import GitCommandError
+from git import Repo
+from rich.progress import Progress
+from rich.progress import SpinnerColumn
+from rich.progress import TextColumn
+
+from dtu_hpc_cli.client import Client
+from dtu_hpc_cli.client import get_client
+from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.error import error_and_exit
+
+REF_PATTERN = re.compile(r"^([0-9a-f]{40}) refs/heads/(\S+)$", re.MULTILINE)
+
+# Printed by get_remote_state when the tracked files of the remote repository differ from its HEAD.
+DIRTY_MARKER = "DTU_HPC_SYNC_DIRTY"
+
+# Directory inside the remote .git directory that the bundle and patch are transferred to.
+TRANSFER_DIRECTORY = ".git/dtu_hpc_sync"
+
+BUNDLE_FILENAME = "changes.bundle"
+
+PATCH_FILENAME = "changes.patch"
+
+
+def execute_git_sync(quiet: bool = False):
+    remote_path = cli_config.remote_path
+    with Repo(cli_config.project_root) as repo, get_client() as client:
+        if repo.head.is_detached:
+            error_and_exit("Git sync requires that a branch is checked out.")
+        branch = repo.active_branch.name
+
+        columns = [SpinnerColumn(), TextColumn("[progress.description]{task.description}")]
+        with Progress(*columns, disable=quiet) as progress:
+            task = progress.add_task(description="Comparing with remote repository", total=None)
+            progress.start()
+            remote_heads, remote_dirty = get_remote_state(client, remote_path)
+            local_heads = {head.name: head.commit.hexsha for head in repo.heads}
+            changed_heads = {name: sha for name, sha in local_heads.items() if remote_heads.get(name) != sha}
+
+            patch = None
+            if cli_config.sync.include_uncommitted:
+                patch = create_patch(repo)
+
+            # A patch from an earlier sync must be reverted when the local changes have been reverted.
+            revert_patch = cli_config.sync.include_uncommitted and remote_dirty
+            if len(changed_heads) == 0 and patch is None and not revert_patch:
+                progress.update(task, completed=True)
+                if not quiet:
+                    typer.echo("Nothing has changed since the last sync.")
+                return
+
+            with tempfile.TemporaryDirectory() as directory:
+                directory = Path(directory)
+                files = []
+
+                if len(changed_heads) > 0:
+                    progress.update(task, description=f"Bundling {len(changed_heads)} changed branch(es)")
+                    bundle_path = directory / BUNDLE_FILENAME
+                    prerequisites = find_known_commits(repo, set(remote_heads.values()))
+                    if create_bundle(repo, bundle_path, prerequisites):
+                        files.append(bundle_path)
+
+                if patch is not None:
+                    patch_path = directory / PATCH_FILENAME
+                    patch_path.write_bytes(patch)
+                    files.append(patch_path)
+
+                if len(files) > 0:
+                    progress.update(task, description="Transferring changes")
+                    transfer(files, remote_path)
+
+            progress.update(task, description="Applying changes")
+            command = create_apply_command(
+                branch,
+                changed_heads,
+                has_bundle=any(path.name == BUNDLE_FILENAME for path in files),
+                has_patch=patch is not None,
+            )
+            returncode, output = client.run(command, cwd=remote_path, hide=True)
+            if returncode != 0:
+                error_and_exit(f"Sync failed:\n{output}")
+            progress.update(task, completed=True)
+
+
+def get_remote_state(client: Client, remote_path: str) -> tuple[dict[str, str], bool]:
+    """Return the branches of the remote repository as {name: sha} and whether its tracked files have changes (e.g. an
+    applied patch). The repository is created if it does not exist."""
+    command = (
+        f"mkdir -p {remote_path} && cd {remote_path} && git init -q "
+        + "&& git for-each-ref --format='%(objectname) %(refname)' refs/heads "
+        + f"&& {{ git diff --quiet HEAD -- 2> /dev/null || echo {DIRTY_MARKER}; }}"
+    )
+    returncode, output = client.run(command, hide=True)
+    if returncode != 0:
+        error_and_exit(f"Failed to read branches of the remote repository:\n{output}")
+    # The profile may print messages before the output of git.
+    heads = {name: sha for sha, name in REF_PATTERN.findall(output)}
+    return heads, DIRTY_MARKER in output.splitlines()
+
+
+def find_known_commits(repo: Repo, shas: set[str]) -> list[str]:
+    """Return the commits that exist locally. The remote may have commits that we do not know, e.g. after a rebase."""
+    if len(shas) == 0:
+        return []
+    result = subprocess.run(
+        ["git", "cat-file", "--batch-check=%(objectname) %(objecttype)"],
+        cwd=repo.working_tree_dir,
+        input="\n".join(shas) + "\n",
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [line.split(" ")[0] for line in result.stdout.splitlines() if line.endswith(" commit")]
+
+
+def create_bundle(repo: Repo, path: Path, prerequisites: list[str]) -> bool:
+    """Bundle the objects reachable from the local branches but not from the prerequisites.
+
+    Returns False if there is nothing to bundle, i.e. if branches only moved to commits that the remote already has."""
+    try:
+        repo.git.bundle("create", str(path), "--branches", *[f"^{sha}" for sha in prerequisites])
+    except GitCommandError as e:
+        if "empty bundle" in str(e.stderr):
+            return False
+        error_and_exit(f"Failed to create git bundle:\n{e.stderr}")
+    return True
+
+
+def create_patch(repo: Repo) -> bytes | None:
+    """Return a patch with the uncommitted changes to tracked files or None if there are none."""
+    command = ["git", "diff", "--binary", "HEAD"]
+    try:
+        result = subprocess.run(command, cwd=repo.working_tree_dir, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        error_and_exit(f"Failed to create patch of uncommitted changes:\n{e.stderr.decode()}")
+    return result.stdout if len(result.stdout) > 0 else None
+
+
+def transfer(files: list[Path], remote_path: str):
+    ssh = cli_config.ssh
+    destination = f"{ssh.user}@{ssh.hostname}:{remote_path}/{TRANSFER_DIRECTORY}/"
+    command = ["rsync", "-a", "-e", f"ssh -i {ssh.identityfile}", *[str(path) for path in files], destination]
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        error_and_exit(f"Sync failed:\n{e.stderr.decode()}")
+
+
+def create_apply_command(branch: str, changed_heads: dict[str, str], has_bundle: bool, has_patch: bool) -> str:
+    """Create a single command that updates the remote branches and working tree.
+
+    The command must not use double quotes or `$`, since commands are wrapped in double quotes (see wrap_command)."""
+    commands = []
+    if has_bundle:
+        # Unbundling only stores the objects. The branches are updated below.
+        commands.append(f"git bundle unbundle {TRANSFER_DIRECTORY}/{BUNDLE_FILENAME} > /dev/null")
+    for name, sha in changed_heads.items():
+        commands.append(f"git update-ref {shlex.quote(f'refs/heads/{name}')} {sha}")
+    commands.append(f"git checkout -q -f {shlex.quote(branch)}")
+    commands.append("git reset -q --hard")
+    if has_patch:
+        commands.append(f"git apply --whitespace=nowarn {TRANSFER_DIRECTORY}/{PATCH_FILENAME}")
+    commands.append(f"rm -rf {TRANSFER_DIRECTORY}")
+    return " && ".join(commands)
@@ -1,6 +1,6 @@
 import dataclasses
-import json
 import time
+from collections.abc import Callable
 
 import typer
 from rich.console import Console
@@ -9,6 +9,11 @@ from rich.table import Table
 from dtu_hpc_cli.config import SubmitConfig
 from dtu_hpc_cli.config import cli_config
 from dtu_hpc_cli.error import error_and_exit
+from dtu_hpc_cli.history_store import HistoryStore
+from dtu_hpc_cli.history_store import open_history_store
+from dtu_hpc_cli.profiling import phase
+from dtu_hpc_cli.profiling import profiled
+from dtu_hpc_cli.sweep import format_arguments
 from dtu_hpc_cli.types import Memory
 from dtu_hpc_cli.types import Time
 
@@ -66,6 +71,7 @@ class HistoryConfig:
     start_after: bool
     start_after_contains: str | None
     start_after_is: str | None
+    sweep: bool
     sync: bool
     walltime: bool
     walltime_above: Time | None
@@ -74,40 +80,27 @@ class HistoryConfig:
 
 
 def execute_history(config: HistoryConfig):
-    history = load_history()
-    if len(history) == 0:
+    store = get_history_store()
+    if not store.exists():
         typer.echo(f"No history found in '{cli_config.history_path}'. You might not have submitted any jobs yet.")
         return
 
-    history = filter_by_string(history, "branch", config.branch_contains, config.branch_is)
-    history = filter_by_list_string(history, "commands", config.command_contains, config.command_is)
-    history = filter_by_comparable(history, "cores", config.cores_above, config.cores_below, config.cores_is)
-    history = filter_by_list_string(history, "feature", config.feature_contains, config.feature_is)
-    history = filter_by_string(history, "error", config.error_contains, config.error_is)
-    history = filter_by_comparable(history, "gpus", config.gpus_above, config.gpus_below, config.gpus_is)
-    history = filter_by_comparable(history, "hosts", config.hosts_above, config.hosts_below, config.hosts_is)
-    history = filter_by_parsable_comparable(
-        history, "memory", Memory.parse, config.memory_above, config.memory_below, config.memory_is
-    )
-    history = filter_by_string(history, "model", config.model_contains, config.model_is)
-    history = filter_by_string(history, "name", config.name_contains, config.name_is)
-    history = filter_by_string(history, "output", config.output_contains, config.output_is)
-    history = filter_by_string(history, "queue", config.queue_contains, config.queue_is)
-    history = filter_by_list_string(history, "preamble", config.preamble_contains, config.preamble_is)
-    history = filter_by_parsable_comparable(
-        history, "split_every", Time.parse, config.split_every_above, config.split_every_below, config.split_every_is
-    )
-    history = filter_by_string(history, "start_after", config.start_after_contains, config.start_after_is)
-    history = filter_by_parsable_comparable(
-        history, "walltime", Time.parse, config.walltime_above, config.walltime_below, config.walltime_is
-    )
+    matches = compile_filters(config)
+
+    # Scan from the newest entry and stop as soon as we have enough entries to show.
+    history = []
+    with phase("history scan"):
+        for entry in store.iterate_newest_first():
+            if matches(entry["config"]):
+                history.append(entry)
+                if len(history) == config.limit:
+                    break
+    history.reverse()
 
     if len(history) == 0:
         typer.echo("No history found with the given filters.")
         return
 
-    history = history[-config.limit :] if config.limit > 0 else history
-
     table = Table(title="Job submissions", show_lines=True)
     table.add_column("job ID(s)")
     if config.name:
@@ -136,6 +129,8 @@ def execute_history(config: HistoryConfig):
         table.add_column("split_every")
     if config.start_after:
         table.add_column("start_after")
+    if config.sweep:
+        table.add_column("sweep")
     if config.sync:
         table.add_column("sync")
     if config.branch:
@@ -148,6 +143,9 @@ def execute_history(config: HistoryConfig):
     for entry in history:
         values = SubmitConfig.from_dict(entry["config"])
         job_ids = entry["job_ids"]
+        if values.sweep is not None:
+            # Show that each job ID refers to a job array.
+            job_ids = [f"{job_id}[1-{len(values.sweep)}]" for job_id in job_ids]
         row = ["\n".join(job_ids)]
         if config.name:
             row.append(values.name)
@@ -179,6 +177,12 @@ def execute_history(config: HistoryConfig):
             row.append(str(values.split_every))
         if config.start_after:
             row.append(values.start_after if values.start_after is not None else "-")
+        if config.sweep:
+            row.append(
+                "\n".join(f"{index}: {format_arguments(arguments)}" for index, arguments in enumerate(values.sweep, 1))
+                if values.sweep is not None
+                else "-"
+            )
         if config.sync:
             row.append("yes" if values.sync else "no")
         if config.branch:
@@ -193,90 +197,149 @@ def execute_history(config: HistoryConfig):
     console.print(table)
 
 
-def add_to_history(submit_config: SubmitConfig, job_ids: list[str]):
-    history = load_history()
-    history.append({"config": submit_config.to_dict(), "job_ids": job_ids, "timestamp": time.time()})
-    save_history(history)
+@profiled("history append")
+def add_to_history(submit_config: SubmitConfig, job_ids: list[str], script_hash: str | None = None):
+    entry = {"config": submit_config.to_dict(), "job_ids": job_ids, "timestamp": time.time()}
+    if script_hash is not None:
+        # The job script is kept in the script store on the HPC (see script_store).
+        entry["script"] = script_hash
+    get_history_store().append(entry)
 
 
+@profiled("history load")
 def load_history() -> list[dict]:
-    path = cli_config.history_path
-    if not path.exists():
-        return []
-    return json.loads(path.read_text())
+    return get_history_store().load()
 
 
-def save_history(history: list[dict]):
-    path = cli_config.history_path
-    path.write_text(json.dumps(history))
+@profiled("history find")
+def find_entry(job_id: str) -> dict | None:
+    return get_history_store().find(job_id)
 
 
 def find_job(job_id: str) -> dict:
-    history = load_history()
-    for entry in history:
-        if job_id in entry["job_ids"]:
-            return entry["config"]
-    error_and_exit(f"Job '{job_id}' not found in history.")
-
-
-def filter_by_string(history: list[dict], key: str, contains: str | None, equals: str | None) -> list[dict]:
-    if contains is not None:
-        history = [entry for entry in history if entry["config"][key] is not None and contains in entry["config"][key]]
-    if equals is not None:
-        history = [entry for entry in history if entry["config"][key] is not None and entry["config"][key] == equals]
-    return history
-
-
-def filter_by_list_string(history: list[dict], key: str, contains: str | None, equals: str | None) -> list[dict]:
-    if contains is not None:
-        history = [
-            entry
-            for entry in history
-            if entry["config"][key] is not None and any(contains in value for value in entry["config"][key])
-        ]
-    if equals is not None:
-        history = [
-            entry
-            for entry in history
-            if entry["config"][key] is not None and any(value == equals for value in entry["config"][key])
-        ]
-    return history
-
-
-def filter_by_comparable(
-    history: list[dict],
+    entry = find_entry(job_id)
+    if entry is None:
+        error_and_exit(f"Job '{job_id}' not found in history.")
+    return entry["config"]
+
+
+def get_history_store() -> HistoryStore:
+    return open_history_store(cli_config.history_path)
+
+
+def compile_filters(config: HistoryConfig) -> Callable[[dict], bool]:
+    """Compile the filters into a single predicate over the submit config of a history entry.
+
+    Thresholds for memory and time are converted to bytes and minutes once, and each value in an entry is only
+    normalized once regardless of how many filters apply to it."""
+    predicates = [
+        compile_string_filter("branch", config.branch_contains, config.branch_is),
+        compile_list_string_filter("commands", config.command_contains, config.command_is),
+        compile_comparable_filter("cores", config.cores_above, config.cores_below, config.cores_is),
+        compile_list_string_filter("feature", config.feature_contains, config.feature_is),
+        compile_string_filter("error", config.error_contains, config.error_is),
+        compile_comparable_filter("gpus", config.gpus_above, config.gpus_below, config.gpus_is),
+        compile_comparable_filter("hosts", config.hosts_above, config.hosts_below, config.hosts_is),
+        compile_comparable_filter(
+            "memory",
+            to_bytes(config.memory_above),
+            to_bytes(config.memory_below),
+            to_bytes(config.memory_is),
+            normalize=memory_to_bytes,
+        ),
+        compile_string_filter("model", config.model_contains, config.model_is),
+        compile_string_filter("name", config.name_contains, config.name_is),
+        compile_string_filter("output", config.output_contains, config.output_is),
+        compile_string_filter("queue", config.queue_contains, config.queue_is),
+        compile_list_string_filter("preamble", config.preamble_contains, config.preamble_is),
+        compile_comparable_filter(
+            "split_every",
+            to_minutes(config.split_every_above),
+            to_minutes(config.split_every_below),
+            to_minutes(config.split_every_is),
+            normalize=time_to_minutes,
+        ),
+        compile_string_filter("start_after", config.start_after_contains, config.start_after_is),
+        compile_comparable_filter(
+            "walltime",
+            to_minutes(config.walltime_above),
+            to_minutes(config.walltime_below),
+            to_minutes(config.walltime_is),
+            normalize=time_to_minutes,
+        ),
+    ]
+    predicates = [predicate for predicate in predicates if predicate is not None]
+
+    def matches(values: dict) -> bool:
+        return all(predicate(values) for predicate in predicates)
+
+    return matches
+
+
+def compile_string_filter(key: str, contains: str | None, equals: str | None) -> Callable[[dict], bool] | None:
+    if contains is None and equals is None:
+        return None
+
+    def predicate(values: dict) -> bool:
+        value = values[key]
+        if value is None:
+            return False
+        return (contains is None or contains in value) and (equals is None or value == equals)
+
+    return predicate
+
+
+def compile_list_string_filter(key: str, contains: str | None, equals: str | None) -> Callable[[dict], bool] | None:
+    if contains is None and equals is None:
+        return None
+
+    def predicate(values: dict) -> bool:
+        value = values[key]
+        if value is None:
+            return False
+        return (contains is None or any(contains in item for item in value)) and (
+            equals is None or any(item == equals for item in value)
+        )
+
+    return predicate
+
+
+def compile_comparable_filter(
     key: str,
     above: int | None,
     below: int | None,
     equals: int | None,
-) -> list[dict]:
-    if above is not None:
-        history = [entry for entry in history if entry["config"][key] is not None and entry["config"][key] > above]
-    if below is not None:
-        history = [entry for entry in history if entry["config"][key] is not None and entry["config"][key] < below]
-    if equals is not None:
-        history = [entry for entry in history if entry["config"][key] is not None and entry["config"][key] == equals]
-    return history
-
-
-def filter_by_parsable_comparable(
-    history: list[dict],
-    key: str,
-    parser: callable,
-    above: Time | Memory | None,
-    below: Time | Memory | None,
-    equals: Time | Memory | None,
-) -> list[dict]:
-    if above is not None:
-        history = [
-            entry for entry in history if entry["config"][key] is not None and parser(entry["config"][key]) > above
-        ]
-    if below is not None:
-        history = [
-            entry for entry in history if entry["config"][key] is not None and parser(entry["config"][key]) < below
-        ]
-    if equals is not None:
-        history = [
-            entry for entry in history if entry["config"][key] is not None and parser(entry["config"][key]) == equals
-        ]
-    return history
+    normalize: Callable[[str], int] | None = None,
+) -> Callable[[dict], bool] | None:
+    if above is None and below is None and equals is None:
+        return None
+
+    def predicate(values: dict) -> bool:
+        value = values[key]
+        if value is None:
+            return False
+        if normalize is not None:
+            value = normalize(value)
+        if above is not None and value <= above:
+            return False
+        if below is not None and value >= below:
+            return False
+        return equals is None or value == equals
+
+    return predicate
+
+
+def memory_to_bytes(memory: str) -> int:
+    return Memory.parse(memory).to_bytes()
+
+
+def time_to_minutes(time: str) -> int:
+    return Time.parse(time).total_minutes()
+
+
+def to_bytes(memory: Memory | None) -> int | None:
+    return None if memory is None else memory.to_bytes()
+
+
+def to_minutes(time: Time | None) -> int | None:
+    return None if time is None else time.total_minutes()
@@ -0,0 +1,279 @@
+"""Storage backends for the history of submitted jobs.
+
+The backend is chosen based on the suffix of the history path:
+
+* `.sqlite`, `.sqlite3` and `.db` use SQLite with an index from job ID to entry.
+* Any other suffix uses JSON Lines (one entry per line), which only appends a line when a job is submitted. Job IDs
+  are looked up in an index in the cache directory, which maps each job ID to the offset of its line in the history.
+
+Older versions stored the history as a single JSON list. Such histories are migrated automatically.
+"""
+
+import abc
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+from collections.abc import Iterator
+from pathlib import Path
+
+import typer
+
+try:
+    import fcntl
+except ImportError:
+    # Windows. Concurrent writes to the history are then not coordinated between processes.
+    fcntl = None
+
+from dtu_hpc_cli.config import get_cache_directory
+from dtu_hpc_cli.error import error_and_exit
+
+SQLITE_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+LEGACY_SUFFIX = ".json"
+
+
+class HistoryStore(abc.ABC):
+    def __init__(self, path: Path):
+        self.path = path
+
+    @abc.abstractmethod
+    def append(self, entry: dict):
+        pass
+
+    @abc.abstractmethod
+    def exists(self) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def extend(self, entries: list[dict]):
+        pass
+
+    @abc.abstractmethod
+    def find(self, job_id: str) -> dict | None:
+        """Return the oldest entry that contains the job ID."""
+        pass
+
+    @abc.abstractmethod
+    def iterate_newest_first(self) -> Iterator[dict]:
+        """Iterate over the entries from newest to oldest. Entries are only decoded when they are reached."""
+        pass
+
+    @abc.abstractmethod
+    def load(self) -> list[dict]:
+        """Return all entries ordered from oldest to newest."""
+        pass
+
+
+class JSONLinesHistoryStore(HistoryStore):
+    def append(self, entry: dict):
+        self.extend([entry])
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def extend(self, entries: list[dict]):
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        # A migration replaces the file, so an append without the lock could go to the replaced file and be lost.
+        with lock_history(self.path):
+            with self.path.open("a") as f:
+                f.write(lines)
+
+    def find(self, job_id: str) -> dict | None:
+        if not self.path.exists():
+            return None
+        with self.path.open("rb") as f:
+            index = self.update_index(f)
+            offset = index["job_ids"].get(job_id)
+            if offset is None:
+                return None
+            f.seek(offset)
+            entry = json.loads(f.readline())
+        if job_id not in entry["job_ids"]:
+            # The history was changed without changing its size or inode, so the index is stale.
+            get_index_path(self.path).unlink(missing_ok=True)
+            return self.find(job_id)
+        return entry
+
+    def iterate_newest_first(self) -> Iterator[dict]:
+        if not self.path.exists():
+            return
+        with self.path.open() as f:
+            lines = f.readlines()
+        for line in reversed(lines):
+            if len(line.strip()) > 0:
+                yield json.loads(line)
+
+    def load(self) -> list[dict]:
+        if not self.path.exists():
+            return []
+        with self.path.open() as f:
+            return [json.loads(line) for line in f if len(line.strip()) > 0]
+
+    def is_legacy(self) -> bool:
+        """Histories from older versions are a single JSON list."""
+        with self.path.open() as f:
+            return f.read(1) == "["
+
+    def migrate_in_place(self) -> bool:
+        """Rewrite a legacy history as JSON Lines. Returns False if another process migrated it first."""
+        with lock_history(self.path):
+            if not self.is_legacy():
+                return False
+            entries = json.loads(self.path.read_text())
+            lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+            # Write to a temporary file and replace the history with it, so readers never see a partial history.
+            temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            temporary_path.write_text(lines)
+            temporary_path.replace(self.path)
+        return True
+
+    def update_index(self, f) -> dict:
+        """Index the lines that were appended since the last lookup and return the index.
+
+        The index is rebuilt if the history was replaced (e.g., migrated) or truncated since it was saved."""
+        index_path = get_index_path(self.path)
+        stat = os.fstat(f.fileno())
+        index = None
+        if index_path.exists():
+            try:
+                index = json.loads(index_path.read_text())
+                if index["inode"] != stat.st_ino or index["size"] > stat.st_size:
+                    index = None
+            except (json.JSONDecodeError, KeyError, TypeError):
+                index = None
+        if index is None:
+            index = {"inode": stat.st_ino, "size": 0, "job_ids": {}}
+        if index["size"] == stat.st_size:
+            return index
+
+        f.seek(index["size"])
+        offset = index["size"]
+        for line in f:
+            # A line without a newline is still being written, so we index it in a later lookup.
+            if not line.endswith(b"\n"):
+                break
+            if len(line.strip()) > 0:
+                for job_id in json.loads(line)["job_ids"]:
+                    # Keep the oldest entry of a job ID.
+                    index["job_ids"].setdefault(job_id, offset)
+            offset += len(line)
+        index["size"] = offset
+
+        temporary_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+        try:
+            temporary_path.write_text(json.dumps(index))
+            temporary_path.replace(index_path)
+        except OSError:
+            # The index is only a cache, so the lookup still works if it cannot be saved.
+            pass
+        return index
+
+
+class SQLiteHistoryStore(HistoryStore):
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self.connection = None
+
+    def append(self, entry: dict):
+        self.extend([entry])
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def extend(self, entries: list[dict]):
+        connection = self.connect()
+        with connection:
+            for entry in entries:
+                cursor = connection.execute("INSERT INTO entries (data) VALUES (?)", (json.dumps(entry),))
+                connection.executemany(
+                    "INSERT INTO job_ids (job_id, entry_id) VALUES (?, ?)",
+                    [(job_id, cursor.lastrowid) for job_id in entry["job_ids"]],
+                )
+
+    def find(self, job_id: str) -> dict | None:
+        if not self.path.exists():
+            return None
+        row = (
+            self.connect()
+            .execute(
+                "SELECT entries.data FROM job_ids JOIN entries ON entries.id = job_ids.entry_id "
+                + "WHERE job_ids.job_id = ? ORDER BY entries.id LIMIT 1",
+                (job_id,),
+            )
+            .fetchone()
+        )
+        return None if row is None else json.loads(row[0])
+
+    def iterate_newest_first(self) -> Iterator[dict]:
+        if not self.path.exists():
+            return
+        for (data,) in self.connect().execute("SELECT data FROM entries ORDER BY id DESC"):
+            yield json.loads(data)
+
+    def load(self) -> list[dict]:
+        if not self.path.exists():
+            return []
+        rows = self.connect().execute("SELECT data FROM entries ORDER BY id").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            if self.path.exists():
+                with self.path.open("rb") as f:
+                    if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+                        error_and_exit(f"History at '{self.path}' is not a SQLite database.")
+            self.connection = sqlite3.connect(self.path)
+            self.connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS job_ids (job_id TEXT NOT NULL, entry_id INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS job_ids_job_id ON job_ids (job_id);
+                """
+            )
+        return self.connection
+
+
+def open_history_store(path: Path) -> HistoryStore:
+    if path.suffix in SQLITE_SUFFIXES:
+        store = SQLiteHistoryStore(path)
+    else:
+        store = JSONLinesHistoryStore(path)
+        if store.exists() and store.is_legacy() and store.migrate_in_place():
+            typer.echo(f"Migrated history at '{path}' to the JSON Lines format.")
+
+    legacy_path = path.with_suffix(LEGACY_SUFFIX)
+    if not store.exists() and legacy_path != path and legacy_path.exists():
+        # The legacy history is only read, so it stays usable by older versions.
+        with lock_history(legacy_path):
+            if not store.exists():
+                legacy_store = JSONLinesHistoryStore(legacy_path)
+                entries = json.loads(legacy_path.read_text()) if legacy_store.is_legacy() else legacy_store.load()
+                store.extend(entries)
+                typer.echo(f"Migrated history from '{legacy_path}' to '{path}'.")
+
+    return store
+
+
+def get_state_path(path: Path, suffix: str) -> Path:
+    """Files for a history are kept in the cache directory, so they do not show up as untracked files in the project."""
+    directory = get_cache_directory() / "history"
+    directory.mkdir(exist_ok=True)
+    key = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:16]
+    return directory / f"{key}{suffix}"
+
+
+def get_index_path(path: Path) -> Path:
+    return get_state_path(path, ".index.json")
+
+
+@contextlib.contextmanager
+def lock_history(path: Path):
+    """Serialize migrations of and appends to the history between processes."""
+    with get_state_path(path, ".lock").open("a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
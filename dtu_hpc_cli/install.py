@@ -1,31 +1,152 @@
+import hashlib
+import re
+import shlex
+from pathlib import Path
+from uuid import uuid4
+
 import typer
-from git import Repo
 from rich.progress import Progress
 from rich.progress import SpinnerColumn
 from rich.progress import TextColumn
 
+from dtu_hpc_cli.client import Client
 from dtu_hpc_cli.client import get_client
+from dtu_hpc_cli.config import InstallConfig
 from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.config import get_active_branch
 from dtu_hpc_cli.constants import CONFIG_FILENAME
-from dtu_hpc_cli.sync import execute_sync
+from dtu_hpc_cli.constants import INSTALL_ENVIRONMENT_DIRECTORY
+from dtu_hpc_cli.constants import INSTALL_STAMP_DIRECTORY
+from dtu_hpc_cli.error import error_and_exit
+
+STAMP_PATTERN = re.compile(r"^[0-9a-f]{64}$", re.MULTILINE)
 
+# Line that the install script prints after each command: index, return code and milliseconds.
+RESULT_PATTERN = re.compile(r"^\[install (\d+)/\d+\] exit (\d+) after (\d+)ms$", re.MULTILINE)
 
-def execute_install():
+
+def execute_install(force: bool = False):
     install = cli_config.install
     if install is not None:
         if install.sync:
+            from dtu_hpc_cli.sync import execute_sync
+
             execute_sync()
-        with Repo(cli_config.project_root) as repo:
-            branch = repo.active_branch.name
+        branch = get_active_branch(cli_config.project_root)
+        fingerprint = get_fingerprint(install, cli_config.project_root, branch)
+        stamp_path = get_stamp_path(install, branch)
         with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}")) as progress:
             task = progress.add_task(description="Installing", total=None)
             progress.start()
             with get_client() as client:
-                for command in install.commands:
-                    command = f"git switch {branch} && {command}"
-                    progress.update(task, description=command)
-                    client.run(command, cwd=cli_config.remote_path)
+                if install.skip_unchanged and not force and read_stamp(client, stamp_path) == fingerprint:
+                    progress.update(task, completed=True)
+                    typer.echo("Install inputs have not changed since the last install. Use --force to install anyway.")
+                    return
+
+                environment = None
+                if install.per_branch:
+                    environment = f"{INSTALL_ENVIRONMENT_DIRECTORY}/{get_branch_key(branch)}"
+                script = create_install_script(install.commands, branch, environment)
+
+                # All commands run in a single shell session, such that e.g. loaded modules persist between them.
+                path = f"/tmp/{uuid4()}.sh"
+                client.save(path, script)
+                returncode, output = client.run(f"bash {path}", cwd=cli_config.remote_path, interactive=True)
+                results = parse_install_output(output)
+
+                # Only skip the next install if this one succeeded.
+                if returncode == 0:
+                    write_stamp(client, stamp_path, fingerprint)
             progress.update(task, completed=True)
+
+        for index, returncode, seconds in results:
+            status = "ok" if returncode == 0 else f"failed with return code {returncode}"
+            typer.echo(f"{seconds:8.1f}s  {status:<10}  {install.commands[index - 1]}")
+        # Only the last part of a long output is returned, so the results of the first commands may be missing.
+        if returncode != 0:
+            error_and_exit(f"Installation failed with return code {returncode}.")
         typer.echo("Finished installation.")
     else:
         typer.echo(f"There is nothing to install. Please set the install field in '{CONFIG_FILENAME}'.")
+
+
+def create_install_script(commands: list[str], branch: str, environment: str | None) -> str:
+    """Create a script that runs the commands one after another in the same shell and stops at the first failure.
+
+    The script prints each command before it runs and its return code and duration afterwards. It removes itself when
+    it finishes."""
+    script = [
+        "#!/bin/bash",
+        "trap 'rm -f \"$0\"' EXIT",
+        f"git switch {shlex.quote(branch)} || exit $?",
+    ]
+    if environment is not None:
+        script.append(f'mkdir -p {environment} && export DTU_HPC_ENVIRONMENT="$PWD/{environment}" || exit $?')
+    for index, command in enumerate(commands, start=1):
+        prefix = f"[install {index}/{len(commands)}]"
+        script.extend(
+            [
+                f"echo {shlex.quote(f'{prefix} $ {command}')}",
+                "start=$(date +%s%N)",
+                command,
+                "status=$?",
+                f'echo "{prefix} exit $status after $(( ($(date +%s%N) - start) / 1000000 ))ms"',
+                "if [ $status -ne 0 ]; then exit $status; fi",
+            ]
+        )
+    return "\n".join(script) + "\n"
+
+
+def parse_install_output(output: str) -> list[tuple[int, int, float]]:
+    """Return the index, return code and duration in seconds of each command that finished."""
+    return [
+        (int(index), int(returncode), int(milliseconds) / 1000)
+        for index, returncode, milliseconds in RESULT_PATTERN.findall(output)
+    ]
+
+
+def get_fingerprint(install: InstallConfig, project_root: Path, branch: str) -> str:
+    """Fingerprint everything that determines the result of an install: the inputs, the commands and the branch."""
+    digest = hashlib.sha256()
+    digest.update(f"branch\0{branch}\0".encode())
+    for command in install.commands:
+        digest.update(f"command\0{command}\0".encode())
+    paths = {path for pattern in install.inputs for path in project_root.glob(pattern) if path.is_file()}
+    for path in sorted(paths):
+        digest.update(f"input\0{path.relative_to(project_root)}\0".encode())
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def get_stamp_path(install: InstallConfig, branch: str) -> str:
+    # Branches share the installed environment unless per_branch is set, so there is only one stamp.
+    name = get_branch_key(branch) if install.per_branch else "shared"
+    return f"{INSTALL_STAMP_DIRECTORY}/{name}"
+
+
+def get_branch_key(branch: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", branch)
+
+
+def get_environment_path(branch: str | None) -> str | None:
+    """Return the remote path that DTU_HPC_ENVIRONMENT points to during the install of the branch (the active branch
+    if None), such that jobs and `dtu run` can use the same environment. Returns None unless per_branch is set."""
+    install = cli_config.install
+    if install is None or not install.per_branch:
+        return None
+    if branch is None:
+        branch = get_active_branch(cli_config.project_root)
+    return f"{cli_config.remote_path}/{INSTALL_ENVIRONMENT_DIRECTORY}/{get_branch_key(branch)}"
+
+
+def read_stamp(client: Client, stamp_path: str) -> str | None:
+    returncode, output = client.run(f"cat {stamp_path} 2>/dev/null || true", cwd=cli_config.remote_path, hide=True)
+    # The profile may print messages before the stamp.
+    stamps = STAMP_PATTERN.findall(output)
+    return stamps[-1] if returncode == 0 and len(stamps) > 0 else None
+
+
+def write_stamp(client: Client, stamp_path: str, fingerprint: str):
+    command = f"mkdir -p {INSTALL_STAMP_DIRECTORY} && echo {fingerprint} > {stamp_path}"
+    client.run(command, cwd=cli_config.remote_path, hide=True)
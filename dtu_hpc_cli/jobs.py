@@ -1,12 +1,25 @@
 import dataclasses
-import enum
+import time
 
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
+
+from dtu_hpc_cli.client import Client
 from dtu_hpc_cli.client import get_client
+from dtu_hpc_cli.error import error_and_exit
+from dtu_hpc_cli.output import run_and_print
+from dtu_hpc_cli.parsing import parse_jobs
+from dtu_hpc_cli.parsing import parse_table
+from dtu_hpc_cli.types import JobsStats
+from dtu_hpc_cli.types import OutputFormat
 
+# Factor to increase the polling interval with when nothing has changed.
+WATCH_BACKOFF = 1.5
 
-class JobsStats(enum.StrEnum):
-    cpu = "cpu"
-    memory = "memory"
+# Columns whose changes are shown while watching. Other columns (e.g. ELAPSED or the CPU and memory usage) change on
+# every poll while a job runs, so they are updated in the table but do not count as a change.
+STABLE_COLUMNS = ("JOBID", "USER", "QUEUE", "JOB_NAME", "NALLOC", "STAT", "START_TIME")
 
 
 @dataclasses.dataclass
@@ -14,6 +27,10 @@ class JobsConfig:
     node: str | None
     queue: str | None
     stats: JobsStats | None
+    watch: bool = False
+    interval: float = 10.0
+    max_interval: float = 60.0
+    output_format: OutputFormat = OutputFormat.text
 
 
 def execute_jobs(config: JobsConfig):
@@ -33,4 +50,109 @@ def execute_jobs(config: JobsConfig):
     command = " ".join(command)
 
     with get_client() as client:
-        client.run(command)
+        if config.watch:
+            watch_jobs(client, command, config)
+        else:
+            run_and_print(client, command, parse_jobs, config.output_format)
+
+
+def watch_jobs(client: Client, command: str, config: JobsConfig):
+    """Poll the jobs using the same connection, redraw the table and report the changes.
+
+    The polling interval grows while nothing changes and is reset when something does (see find_changes)."""
+    console = Console()
+    interval = config.interval
+    columns = []
+    previous = None
+    # The last changes stay highlighted until the next change.
+    changed_from = {}
+    highlighted = {}
+    last_change = None
+    with Live(console=console, auto_refresh=False) as live:
+        try:
+            while True:
+                returncode, output = client.run(command, hide=True)
+                if returncode != 0:
+                    error_and_exit(f"Failed to list jobs:\n{output}")
+
+                new_columns, rows = parse_table(output, first_column="JOBID", merge_column="START_TIME")
+                columns = new_columns if len(new_columns) > 0 else columns
+                current = {row["JOBID"]: row for row in rows}
+
+                changes = find_changes(previous or {}, current)
+                if previous is None or len(changes) > 0:
+                    for message in describe_changes(previous or {}, current, changes):
+                        live.console.print(message)
+                    changed_from = previous or {}
+                    highlighted = changes
+                    last_change = time.strftime("%H:%M:%S")
+                    interval = config.interval
+                else:
+                    interval = min(interval * WATCH_BACKOFF, config.max_interval)
+                table = create_table(columns, changed_from, current, highlighted, last_change)
+                live.update(table, refresh=True)
+
+                previous = current
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+
+def find_changes(previous: dict[str, dict], current: dict[str, dict]) -> dict[str, str]:
+    """Map job IDs to the kind of change since the previous poll: new, state, updated or gone.
+
+    Only the stable columns are compared, such that a running job does not count as updated on every poll."""
+    changes = {}
+    for job_id, row in current.items():
+        if job_id not in previous:
+            changes[job_id] = "new"
+        elif row.get("STAT") != previous[job_id].get("STAT"):
+            changes[job_id] = "state"
+        elif any(row.get(column) != previous[job_id].get(column) for column in STABLE_COLUMNS):
+            changes[job_id] = "updated"
+    for job_id in previous.keys() - current.keys():
+        changes[job_id] = "gone"
+    return changes
+
+
+def describe_changes(previous: dict[str, dict], current: dict[str, dict], changes: dict[str, str]) -> list[str]:
+    timestamp = time.strftime("%H:%M:%S")
+    messages = []
+    for job_id, change in changes.items():
+        match change:
+            case "state":
+                old_state = previous[job_id].get("STAT")
+                new_state = current[job_id].get("STAT")
+                messages.append(f"[dim]{timestamp}[/dim] Job {job_id}: {old_state} → [bold]{new_state}[/bold]")
+            case "gone":
+                old_state = previous[job_id].get("STAT")
+                messages.append(f"[dim]{timestamp}[/dim] Job {job_id}: {old_state} → [bold]left the queue[/bold]")
+    return messages
+
+
+def create_table(
+    columns: list[str],
+    previous: dict[str, dict],
+    current: dict[str, dict],
+    changes: dict[str, str],
+    last_change: str,
+):
+    table = Table(caption=f"Last change at {last_change}. Press Ctrl+C to stop.")
+    for column in columns:
+        table.add_column(column)
+
+    for job_id, row in current.items():
+        change = changes.get(job_id)
+        values = [row.get(column, "") for column in columns]
+        if change == "state" and "STAT" in columns:
+            index = columns.index("STAT")
+            values[index] = f"{previous[job_id].get('STAT')}→{values[index]}"
+        style = {"new": "green", "state": "bold yellow", "updated": None}.get(change)
+        table.add_row(*values, style=style)
+
+    for job_id, change in changes.items():
+        if change == "gone":
+            values = [previous[job_id].get(column, "") for column in columns]
+            table.add_row(*values, style="dim strike")
+
+    return table
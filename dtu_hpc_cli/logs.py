@@ -0,0 +1,116 @@
+import dataclasses
+import os
+import sys
+import time
+
+import typer
+
+from dtu_hpc_cli.client import Client
+from dtu_hpc_cli.client import get_client
+from dtu_hpc_cli.config import SubmitConfig
+from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.error import error_and_exit
+from dtu_hpc_cli.history import find_entry
+
+# Read at most this many bytes at a time, such that large logs are shown while they are read.
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclasses.dataclass
+class LogsConfig:
+    job_id: str
+    error: bool
+    follow: bool
+    index: int | None
+    interval: float
+
+
+def execute_logs(config: LogsConfig):
+    paths = get_log_paths(config)
+    with get_client() as client:
+        try:
+            show_logs(client, paths, config)
+        except KeyboardInterrupt:
+            pass
+
+
+def get_log_paths(config: LogsConfig) -> list[str]:
+    """Return the paths of the log files of the job in the order that they are written.
+
+    A job that was split into a chain of jobs has a log file per job in the chain."""
+    entry = find_entry(config.job_id)
+    if entry is None:
+        error_and_exit(f"Job '{config.job_id}' not found in history.")
+    submit_config = SubmitConfig.from_dict(entry["config"])
+
+    directory = submit_config.error if config.error else submit_config.output
+    if directory is None:
+        option = "error" if config.error else "output"
+        error_and_exit(f"Job '{config.job_id}' was submitted without the --{option} option, so there is no log file.")
+
+    if submit_config.sweep is not None:
+        if config.index is None:
+            error_and_exit(f"Job '{config.job_id}' is a sweep. Use --index to choose a job in the sweep.")
+        if not 1 <= config.index <= len(submit_config.sweep):
+            error_and_exit(f"Invalid index {config.index}. The sweep has {len(submit_config.sweep)} jobs.")
+
+    return create_log_paths(submit_config, entry["job_ids"], config.error, config.index)
+
+
+def create_log_paths(submit_config: SubmitConfig, job_ids: list[str], error: bool, index: int | None) -> list[str]:
+    """Return the paths of the log files of each job in a history entry. Sweeps need the index of a job in the sweep.
+
+    See split_job and create_job_script for how the names of the log files are created."""
+    directory = submit_config.error if error else submit_config.output
+    if directory is None:
+        return []
+
+    # Relative paths are relative to the directory that the job was submitted from.
+    if not os.path.isabs(directory) and not directory.startswith("~"):
+        directory = os.path.join(cli_config.remote_path, directory)
+
+    suffix = "err" if error else "out"
+    paths = []
+    for counter, job_id in enumerate(job_ids, start=1):
+        name = submit_config.name if len(job_ids) == 1 else f"{submit_config.name}-{counter}"
+        job = job_id if submit_config.sweep is None else f"{job_id}_{index}"
+        paths.append(os.path.join(directory, f"{name}_{job}.{suffix}"))
+    return paths
+
+
+def show_logs(client: Client, paths: list[str], config: LogsConfig):
+    """Print the log files in order. When following, new output is printed as it is appended to the files.
+
+    Only the appended bytes are read from each file. While following, we move on to the next job in a chain once its
+    log file exists, since it is only started after the previous job has ended."""
+    offsets = [None] * len(paths)
+    current = 0
+    while True:
+        for index in range(current, len(paths)):
+            try:
+                if offsets[index] is None:
+                    # Raises FileNotFoundError if the job has not started yet.
+                    client.read(paths[index], 0, 0)
+                    if len(paths) > 1:
+                        typer.echo(f"==> {paths[index]} <==")
+                    offsets[index] = 0
+                offsets[index] = print_new_output(client, paths[index], offsets[index])
+            except FileNotFoundError:
+                if not config.follow:
+                    typer.echo(f"Log file '{paths[index]}' does not exist (yet).", err=True)
+                break
+            current = index
+
+        if not config.follow:
+            return
+        time.sleep(config.interval)
+
+
+def print_new_output(client: Client, path: str, offset: int) -> int:
+    while True:
+        data = client.read(path, offset, CHUNK_SIZE)
+        sys.stdout.buffer.write(data)
+        sys.stdout.flush()
+        offset += len(data)
+        if len(data) < CHUNK_SIZE:
+            return offset
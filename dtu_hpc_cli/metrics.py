@@ -0,0 +1,133 @@
+"""Local store of latency metrics, which `dtu perf` summarizes.
+
+Each measurement is appended as a line to a JSON Lines file in the cache directory. When the file grows beyond
+MAX_METRICS_SIZE it is rotated, such that the store keeps between one and two files worth of recent measurements.
+Recording is best effort and never fails a command.
+"""
+
+import contextlib
+import json
+import threading
+import time
+from enum import StrEnum
+from pathlib import Path
+
+import click
+
+try:
+    import fcntl
+except ImportError:
+    # Windows. Concurrent rotations are then not coordinated between processes.
+    fcntl = None
+
+from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.config import get_cache_directory
+
+METRICS_FILENAME = "metrics.jsonl"
+
+# Rotate the store when it is larger than this many bytes (roughly 8000 measurements).
+MAX_METRICS_SIZE = 1024 * 1024
+
+
+class Metric(StrEnum):
+    ssh_connect = "ssh_connect"
+    round_trip = "round_trip"
+    sync_duration = "sync_duration"
+    sync_bytes = "sync_bytes"
+    submit_latency = "submit_latency"
+
+
+def get_invoked_command() -> str | None:
+    """Return the name of the dtu command that is running, or None outside of a command."""
+    context = click.get_current_context(silent=True)
+    return None if context is None else context.find_root().invoked_subcommand
+
+
+# Name of the dtu command that is running, such that e.g. round trips of `dtu run` can be told apart. This module is
+# only imported by the commands that record metrics (in the main thread, before they start any background threads), so
+# the command is known by then and other commands (or --help) do not pay for it.
+_command = get_invoked_command()
+_lock = threading.Lock()
+
+
+def set_command(command: str | None):
+    global _command
+    _command = command
+
+
+def record(metric: Metric, value: float, host: str):
+    entry = {"timestamp": time.time(), "metric": metric.value, "value": value, "host": host, "command": _command}
+    with _lock:
+        try:
+            path = get_metrics_path()
+            # Other processes may record at the same time. Without the lock, two processes could both rotate, such that
+            # the second moves a nearly empty file onto the rotated file.
+            with get_lock_path(path).open("a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                if path.exists() and path.stat().st_size > MAX_METRICS_SIZE:
+                    path.replace(get_rotated_path(path))
+                with path.open("a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+
+
+@contextlib.contextmanager
+def timed(metric: Metric, host: str):
+    """Record the duration of the block in seconds. Nothing is recorded if the block fails."""
+    start = time.perf_counter()
+    yield
+    record(metric, time.perf_counter() - start, host)
+
+
+def get_host() -> str:
+    """Return the configured login host, or "local" without a SSH config (e.g. on the HPC)."""
+    return cli_config.ssh.hostname if cli_config.ssh is not None else "local"
+
+
+def load_metrics(since: float | None = None) -> list[dict]:
+    """Return the measurements from oldest to newest, optionally only those recorded after a timestamp."""
+    path = get_metrics_path()
+    entries = []
+    for part in (get_rotated_path(path), path):
+        if not part.exists():
+            continue
+        for line in part.read_text().splitlines():
+            entry = parse_entry(line)
+            if entry is not None and (since is None or entry["timestamp"] >= since):
+                entries.append(entry)
+    return entries
+
+
+def parse_entry(line: str) -> dict | None:
+    """Return the measurement of a line or None if it cannot be interpreted.
+
+    A line may be incomplete if a command was killed while writing it, or it may have been written by a newer version
+    with metrics that this version does not know."""
+    try:
+        entry = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if (
+        not isinstance(entry, dict)
+        or entry.get("metric") not in Metric.__members__
+        or not isinstance(entry.get("timestamp"), int | float)
+        or not isinstance(entry.get("value"), int | float)
+        or not isinstance(entry.get("host"), str)
+        or not isinstance(entry.get("command"), str | None)
+    ):
+        return None
+    return entry
+
+
+def get_metrics_path() -> Path:
+    return get_cache_directory() / METRICS_FILENAME
+
+
+def get_rotated_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.1")
+
+
+def get_lock_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.lock")
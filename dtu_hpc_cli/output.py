@@ -0,0 +1,44 @@
+import csv
+import json
+import sys
+from collections.abc import Callable
+
+import typer
+
+from dtu_hpc_cli.client import Client
+from dtu_hpc_cli.error import error_and_exit
+from dtu_hpc_cli.parsing import Record
+from dtu_hpc_cli.types import OutputFormat
+
+
+def run_and_print(client: Client, command: str, parse: Callable[[str], list[Record]], output_format: OutputFormat):
+    """Run the command and either show its output as is or parse it and print the records in the given format."""
+    if output_format == OutputFormat.text:
+        client.run(command)
+        return
+
+    returncode, output = client.run(command, hide=True)
+    if returncode != 0:
+        error_and_exit(f"Command '{command}' failed with return code {returncode}:\n{output}")
+    print_records(parse(output), output_format)
+
+
+def print_records(records: list[Record], output_format: OutputFormat):
+    print_rows([record.to_dict() for record in records], output_format)
+
+
+def print_rows(rows: list[dict], output_format: OutputFormat):
+    match output_format:
+        case OutputFormat.json:
+            typer.echo(json.dumps(rows, indent=2))
+        case OutputFormat.jsonl:
+            for row in rows:
+                typer.echo(json.dumps(row))
+        case OutputFormat.csv:
+            # Rows may have different extra columns, so we use the union of all columns in order of appearance.
+            fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+            writer = csv.DictWriter(sys.stdout, fieldnames=fieldnames, lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
+        case _:
+            error_and_exit(f"Records cannot be printed in the '{output_format}' format.")
@@ -0,0 +1,180 @@
+"""Parsers that turn the output of the HPC tools into records."""
+
+import dataclasses
+
+
+@dataclasses.dataclass
+class Record:
+    # Columns that do not correspond to a field of the record.
+    other: dict[str, str]
+
+    # Maps upper-cased column names to field names. Values of fields in integer_fields are converted to integers.
+    column_fields = {}
+    integer_fields = set()
+
+    @classmethod
+    def from_row(cls, row: dict[str, str]):
+        values = {field.name: None for field in dataclasses.fields(cls) if field.name != "other"}
+        other = {}
+        for column, value in row.items():
+            field = cls.column_fields.get(column.upper())
+            if field is None:
+                other[column.lower()] = value
+            elif field in cls.integer_fields:
+                values[field] = parse_integer(value)
+            else:
+                values[field] = value
+        return cls(other=other, **values)
+
+    def to_dict(self) -> dict:
+        values = {field.name: getattr(self, field.name) for field in dataclasses.fields(self) if field.name != "other"}
+        return {**values, **self.other}
+
+
+@dataclasses.dataclass
+class Job(Record):
+    job_id: str | None
+    user: str | None
+    queue: str | None
+    name: str | None
+    slots: int | None
+    state: str | None
+    start_time: str | None
+    elapsed: str | None
+
+    column_fields = {
+        "JOBID": "job_id",
+        "USER": "user",
+        "QUEUE": "queue",
+        "JOB_NAME": "name",
+        "NALLOC": "slots",
+        "STAT": "state",
+        "START_TIME": "start_time",
+        "ELAPSED": "elapsed",
+    }
+    integer_fields = {"slots"}
+
+
+@dataclasses.dataclass
+class Node(Record):
+    name: str | None
+    state: str | None
+
+    column_fields = {
+        "HOST": "name",
+        "HOSTNAME": "name",
+        "HOST_NAME": "name",
+        "NAME": "name",
+        "NODE": "name",
+        "STATE": "state",
+        "STATUS": "state",
+    }
+
+
+@dataclasses.dataclass
+class Queue(Record):
+    name: str | None
+    priority: int | None
+    status: str | None
+    max_slots: int | None
+    jobs: int | None
+    pending: int | None
+    running: int | None
+    suspended: int | None
+
+    column_fields = {
+        "QUEUE_NAME": "name",
+        "PRIO": "priority",
+        "STATUS": "status",
+        "MAX": "max_slots",
+        "NJOBS": "jobs",
+        "PEND": "pending",
+        "RUN": "running",
+        "SUSP": "suspended",
+    }
+    integer_fields = {"priority", "max_slots", "jobs", "pending", "running", "suspended"}
+
+
+@dataclasses.dataclass
+class StartEstimate(Record):
+    job_id: str | None
+    user: str | None
+    queue: str | None
+    start_time: str | None
+
+    column_fields = {
+        "JOBID": "job_id",
+        "USER": "user",
+        "QUEUE": "queue",
+        "START_TIME": "start_time",
+        "START": "start_time",
+        "ESTIMATED_START": "start_time",
+    }
+
+
+def parse_jobs(output: str) -> list[Job]:
+    _, rows = parse_table(output, first_column="JOBID", merge_column="START_TIME")
+    return [Job.from_row(row) for row in rows]
+
+
+def parse_nodes(output: str) -> list[Node]:
+    _, rows = parse_table(output)
+    return [Node.from_row(row) for row in rows]
+
+
+def parse_queues(output: str) -> list[Queue]:
+    columns, rows = parse_table(output, first_column="QUEUE_NAME")
+    if len(columns) == 0:
+        # The statistics for a single queue (classstat) use other columns.
+        _, rows = parse_table(output)
+    return [Queue.from_row(row) for row in rows]
+
+
+def parse_start_estimates(output: str) -> list[StartEstimate]:
+    columns, rows = parse_table(output, first_column="JOBID")
+    merge_column = next((column for column in columns if column.upper().startswith("START")), None)
+    if merge_column is not None:
+        _, rows = parse_table(output, first_column="JOBID", merge_column=merge_column)
+    return [StartEstimate.from_row(row) for row in rows]
+
+
+def parse_integer(value: str) -> int | None:
+    try:
+        return int(value)
+    except ValueError:
+        # E.g. "-" is used for unlimited.
+        return None
+
+
+def parse_table(
+    output: str,
+    first_column: str | None = None,
+    merge_column: str | None = None,
+) -> tuple[list[str], list[dict[str, str]]]:
+    """Parse a whitespace-separated table with a header line (like the output of bstat) into rows.
+
+    The header is the first line unless first_column is given, in which case it is the first line that starts with
+    that column (case insensitive). Lines before the header are ignored.
+
+    Values may only contain spaces in merge_column (e.g. a start time like "Oct 18 12:34"). Lines with more values
+    than there are columns have the extra values merged into that column."""
+    lines = [line for line in output.splitlines() if len(line.strip()) > 0]
+    if first_column is None:
+        header_index = 0 if len(lines) > 0 else None
+    else:
+        header_index = next((i for i, line in enumerate(lines) if line.split()[0].upper() == first_column), None)
+    if header_index is None:
+        return [], []
+
+    columns = lines[header_index].split()
+    rows = []
+    for line in lines[header_index + 1 :]:
+        values = line.split()
+        extra = len(values) - len(columns)
+        if extra > 0 and merge_column in columns:
+            index = columns.index(merge_column)
+            values = [*values[:index], " ".join(values[index : index + extra + 1]), *values[index + extra + 1 :]]
+        elif extra < 0:
+            values.extend([""] * -extra)
+        rows.append(dict(zip(columns, values, strict=False)))
+    return columns, rows
@@ -0,0 +1,94 @@
+import dataclasses
+import datetime
+import math
+import time
+from collections import defaultdict
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from dtu_hpc_cli.metrics import Metric
+from dtu_hpc_cli.metrics import get_metrics_path
+from dtu_hpc_cli.metrics import load_metrics
+from dtu_hpc_cli.output import print_rows
+from dtu_hpc_cli.sync_stats import format_bytes
+from dtu_hpc_cli.types import OutputFormat
+
+PERCENTILES = [50, 90, 99]
+
+
+@dataclasses.dataclass
+class PerfConfig:
+    days: float
+    host: str | None
+    daily: bool
+    output_format: OutputFormat
+
+
+def execute_perf(config: PerfConfig):
+    entries = load_metrics(since=time.time() - config.days * 24 * 60 * 60)
+    if config.host is not None:
+        entries = [entry for entry in entries if entry["host"] == config.host]
+    if len(entries) == 0:
+        typer.echo(f"No metrics recorded in the last {config.days:g} day(s) (see '{get_metrics_path()}').")
+        return
+
+    rows = summarize(entries, config.daily)
+    if config.output_format != OutputFormat.text:
+        print_rows(rows, config.output_format)
+        return
+
+    table = Table(title=f"Latency over the last {config.days:g} day(s)")
+    if config.daily:
+        table.add_column("day")
+    for column in ["host", "metric", "command", "count"]:
+        table.add_column(column)
+    for percentile in PERCENTILES:
+        table.add_column(f"p{percentile}", justify="right")
+    table.add_column("max", justify="right")
+
+    for row in rows:
+        metric = Metric(row["metric"])
+        cells = [row["day"]] if config.daily else []
+        cells.extend([row["host"], row["metric"], row["command"] or "-", str(row["count"])])
+        cells.extend(format_value(metric, row[f"p{percentile}"]) for percentile in PERCENTILES)
+        cells.append(format_value(metric, row["max"]))
+        table.add_row(*cells)
+
+    Console().print(table)
+
+
+def summarize(entries: list[dict], daily: bool) -> list[dict]:
+    """Return the percentiles of each metric per host (and day).
+
+    Round trips are also grouped by command, since e.g. `dtu run` includes the runtime of the command itself."""
+    groups = defaultdict(list)
+    for entry in entries:
+        command = entry["command"] if entry["metric"] == Metric.round_trip else None
+        day = datetime.date.fromtimestamp(entry["timestamp"]).isoformat() if daily else None
+        groups[(day, entry["host"], entry["metric"], command)].append(entry["value"])
+
+    rows = []
+    for (day, host, metric, command), values in sorted(groups.items(), key=lambda item: tuple(map(str, item[0]))):
+        values.sort()
+        row = {"day": day} if daily else {}
+        row.update(host=host, metric=metric, command=command, count=len(values))
+        row.update({f"p{percentile}": get_percentile(values, percentile) for percentile in PERCENTILES})
+        row["max"] = values[-1]
+        rows.append(row)
+    return rows
+
+
+def get_percentile(values: list[float], percentile: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    index = max(math.ceil(percentile / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def format_value(metric: Metric, value: float) -> str:
+    if metric == Metric.sync_bytes:
+        return format_bytes(value)
+    if value < 1:
+        return f"{value * 1000:.0f}ms"
+    return f"{value:.2f}s"
@@ -0,0 +1,123 @@
+"""Timing of the phases of a command for the global --profile option.
+
+A phase that starts while another phase is running becomes its child, and phases with the same name and parent are
+combined. Threads and asyncio tasks track their phases in their own context, so concurrent phases can add up to more
+than their parent. Work submitted to a thread pool should run in `contextvars.copy_context()`, since its phases are
+shown at the top level otherwise.
+
+This module is imported by most commands, so it must stay cheap to import and `phase` must be cheap when profiling is
+disabled.
+"""
+
+import atexit
+import contextlib
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from pathlib import Path
+
+import typer
+
+
+class Phase:
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.count = 0
+        self.children: dict[str, Phase] = {}
+
+    def child(self, name: str) -> "Phase":
+        with _lock:
+            if name not in self.children:
+                self.children[name] = Phase(name)
+            return self.children[name]
+
+
+_lock = threading.Lock()
+_root: Phase | None = None
+_current: contextvars.ContextVar[Phase | None] = contextvars.ContextVar("phase", default=None)
+
+
+def start_profiling(stats_path: Path | None = None):
+    """Start timing phases and print the timings when the command exits.
+
+    With a stats path, the main thread is also profiled with cProfile and the stats are saved for use with pstats."""
+    global _root
+    _root = Phase("total")
+    start = time.perf_counter()
+
+    profiler = None
+    if stats_path is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def stop():
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(stats_path)
+        _root.seconds = time.perf_counter() - start
+        _root.count = 1
+        typer.echo("\nProfile:", err=True)
+        print_phase(_root, _root.seconds, 0)
+        if stats_path is not None:
+            typer.echo(f"Saved cProfile stats to '{stats_path}'. Inspect them with 'python -m pstats'.", err=True)
+
+    # Commands end by returning or by exiting (e.g. error_and_exit), so the timings are printed at exit.
+    atexit.register(stop)
+
+
+def print_phase(phase: Phase, total: float, depth: int):
+    percent = 100 * phase.seconds / total if total > 0 else 0
+    count = f" ({phase.count} calls)" if phase.count > 1 else ""
+    typer.echo(f"{phase.seconds:9.3f}s {percent:6.1f}%  {'  ' * depth}{phase.name}{count}", err=True)
+    for child in list(phase.children.values()):
+        print_phase(child, total, depth + 1)
+
+
+def phase(name: str) -> contextlib.AbstractContextManager:
+    if _root is None:
+        return contextlib.nullcontext()
+    return measure(name)
+
+
+@contextlib.contextmanager
+def measure(name: str):
+    parent = _current.get() or _root
+    node = parent.child(name)
+    token = _current.set(node)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _current.reset(token)
+        with _lock:
+            node.seconds += seconds
+            node.count += 1
+
+
+def profiled(name: str):
+    """Decorator that times every call of a function (or coroutine function) as a phase."""
+
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with phase(name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
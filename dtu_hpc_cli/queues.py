@@ -1,11 +1,14 @@
 from dtu_hpc_cli.client import get_client
+from dtu_hpc_cli.output import run_and_print
+from dtu_hpc_cli.parsing import parse_queues
+from dtu_hpc_cli.types import OutputFormat
 
 
-def execute_queues(queue: str | None):
+def execute_queues(queue: str | None, output_format: OutputFormat = OutputFormat.text):
     if queue is None:
         command = "bqueues"
     else:
         command = f"classstat {queue}"
 
     with get_client() as client:
-        client.run(command)
+        run_and_print(client, command, parse_queues, output_format)
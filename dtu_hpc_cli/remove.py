@@ -1,9 +1,16 @@
+import asyncio
 import dataclasses
+import re
 
 import typer
 
-from dtu_hpc_cli.client import get_client
-from dtu_hpc_cli.history import load_history
+from dtu_hpc_cli.client import get_async_client
+from dtu_hpc_cli.history import find_entry
+
+# Maximum number of job IDs per bkill call. Keeps the command well below the argument limit on the HPC.
+BKILL_CHUNK_SIZE = 500
+
+BKILL_RESULT_PATTERN = re.compile(r"^Job <([^>]+)>:? (.*)$", re.MULTILINE)
 
 
 @dataclasses.dataclass
@@ -14,23 +21,55 @@ class RemoveConfig:
 
 def execute_remove(config: RemoveConfig):
     job_ids = expand_job_ids(config)
-    with get_client() as client:
-        for job_id in job_ids:
-            client.run(f"bkill {job_id}")
+    output = asyncio.run(remove_jobs(job_ids))
+    show_summary(job_ids, output)
+
+
+async def remove_jobs(job_ids: list[str]) -> str:
+    commands = []
+    for start in range(0, len(job_ids), BKILL_CHUNK_SIZE):
+        chunk = job_ids[start : start + BKILL_CHUNK_SIZE]
+        commands.append(f"bkill {' '.join(chunk)}")
+    async with get_async_client() as client:
+        # bkill exits with a non-zero code if any of the jobs could not be removed, so we parse the output instead.
+        results = await client.run_many(commands)
+    return "".join(output for _, output in results)
+
+
+def show_summary(job_ids: list[str], output: str):
+    removed = []
+    finished = []
+    failed = []
+    results = dict(BKILL_RESULT_PATTERN.findall(output))
+    for job_id in job_ids:
+        message = results.get(job_id)
+        if message is None:
+            failed.append((job_id, "No response from bkill"))
+        elif message.startswith("is being"):
+            removed.append(job_id)
+        elif "already finished" in message:
+            finished.append(job_id)
+        else:
+            failed.append((job_id, message))
+
+    typer.echo(f"\nRemoved {len(removed)} out of {len(job_ids)} job(s).")
+    if len(finished) > 0:
+        typer.echo(f"Already finished: {', '.join(finished)}")
+    for job_id, message in failed:
+        typer.echo(f"Failed to remove {job_id}: {message}")
 
 
 def expand_job_ids(config: RemoveConfig) -> list[str]:
     if not config.from_history:
-        return config.job_ids
+        return list(dict.fromkeys(config.job_ids))
 
-    history = load_history()
     requested_ids = set(config.job_ids)
 
     job_ids = requested_ids.copy()
-    for entry in history:
-        entry_job_ids = set(entry["job_ids"])
-        if not entry_job_ids.isdisjoint(requested_ids):
-            job_ids.update(entry_job_ids)
+    for job_id in requested_ids:
+        entry = find_entry(job_id)
+        if entry is not None:
+            job_ids.update(entry["job_ids"])
 
     new_job_ids = job_ids - requested_ids
     job_ids = sorted(job_ids)
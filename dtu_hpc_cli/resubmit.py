@@ -26,6 +26,7 @@ class ResubmitConfig:
     preamble: list[str]
     split_every: Time | None
     start_after: str | None
+    sweep: list[dict[str, str]] | None
     sync: bool | None
     walltime: Time | None
 
@@ -50,6 +51,7 @@ def execute_resubmit(config: ResubmitConfig):
         "preamble": config.preamble,
         "split_every": config.split_every,
         "start_after": config.start_after,
+        "sweep": config.sweep,
         "sync": config.sync,
         "walltime": config.walltime,
     }
@@ -1,14 +1,20 @@
+from pathlib import Path
+
 import rich
 
 from dtu_hpc_cli.client import get_client
 from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.install import get_environment_path
 
 
-def execute_run(arguments: list[str]):
+def execute_run(arguments: list[str], quiet: bool = False, tee: Path | None = None):
     if len(arguments) == 0:
         rich.print("[bold red]No command provided.")
         return
 
     command = " ".join(arguments)
+    environment_path = get_environment_path(None)
+    if environment_path is not None:
+        command = f"export DTU_HPC_ENVIRONMENT={environment_path} && {command}"
     with get_client() as client:
-        client.run(command, cwd=cli_config.remote_path)
+        client.run(command, cwd=cli_config.remote_path, hide=quiet, tee=tee, interactive=True)
@@ -0,0 +1,128 @@
+"""Job scripts stored on the HPC by the hash of their contents.
+
+Submitting the same script again does not upload it again, and the scripts are kept for inspection after the jobs have
+run. Scripts that have not been used for a while, or that do not fit in the size limit, are removed (see find_expired).
+"""
+
+import dataclasses
+import hashlib
+import re
+import shlex
+from collections.abc import Iterable
+
+from dtu_hpc_cli.client import Client
+from dtu_hpc_cli.config import ScriptsConfig
+from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.constants import SCRIPT_DIRECTORY
+from dtu_hpc_cli.error import error_and_exit
+
+# Output of find in stage_script: modification time, size and name. Other files in the store are ignored.
+SCRIPT_PATTERN = re.compile(r"^(\d+(?:\.\d+)?) (\d+) ([0-9a-f]{64}\.sh)$")
+
+# Output of date +%s in stage_script.
+TIME_PATTERN = re.compile(r"^\d+$")
+
+# Scripts used within this many minutes are never removed, since a concurrent submit may have just staged them.
+GRACE_PERIOD_MINUTES = 60
+
+
+@dataclasses.dataclass
+class StoredScript:
+    name: str
+    size: int
+    mtime: float
+
+
+@dataclasses.dataclass
+class StagedScript:
+    script_hash: str
+    path: str
+    # Paths of other scripts in the store that should be removed.
+    expired: list[str]
+
+
+def stage_script(client: Client, script: str) -> StagedScript:
+    """Make sure that the script is in the store and find the scripts that have expired.
+
+    A single command creates the store, marks the script as used and lists the stored scripts. The script is only
+    uploaded if it is missing (or incomplete).
+
+    The store is created together with the remote path, since submit stages the script while the first sync (which
+    would otherwise create the remote path) may still be running."""
+    script_hash = get_script_hash(script)
+    name = f"{script_hash}.sh"
+    store = f"{cli_config.remote_path}/{SCRIPT_DIRECTORY}"
+    command = (
+        f"mkdir -p {store} && cd {store} && touch -c {name} && pwd && date +%s "
+        + "&& find . -maxdepth 1 -name '*.sh' -type f -printf '%T@ %s %f\\n'"
+    )
+    returncode, output = client.run(command, hide=True)
+    directory, now, scripts = parse_listing(output)
+    if returncode != 0 or directory is None or now is None:
+        error_and_exit(f"Failed to access the job scripts in '{SCRIPT_DIRECTORY}':\n{output}")
+
+    size = len(script.encode())
+    stored = scripts.pop(name, None)
+    if stored is None or stored.size != size:
+        client.save(f"{directory}/{name}", script)
+
+    expired = find_expired(scripts.values(), cli_config.scripts, now, size)
+    return StagedScript(
+        script_hash=script_hash,
+        path=f"{directory}/{name}",
+        expired=[f"{directory}/{script.name}" for script in expired],
+    )
+
+
+def parse_listing(output: str) -> tuple[str | None, float | None, dict[str, StoredScript]]:
+    directory = None
+    now = None
+    scripts = {}
+    # The profile may print messages before the output of the commands.
+    for line in output.splitlines():
+        match = SCRIPT_PATTERN.match(line)
+        if match is not None:
+            mtime, size, name = match.groups()
+            scripts[name] = StoredScript(name=name, size=int(size), mtime=float(mtime))
+        elif TIME_PATTERN.match(line) is not None:
+            now = float(line)
+        elif line.startswith("/"):
+            directory = line
+    return directory, now, scripts
+
+
+def find_expired(scripts: Iterable[StoredScript], config: ScriptsConfig, now: float, size: int) -> list[StoredScript]:
+    """Scripts expire when they have not been used for max_age_days, or when the store would exceed max_size_mb, in
+    which case the least recently used scripts are removed first. A limit of zero disables it.
+
+    The size is that of the script being submitted, which is always kept, as are scripts used within the grace period.
+    """
+    min_mtime = now - config.max_age_days * 24 * 60 * 60
+    grace_mtime = now - GRACE_PERIOD_MINUTES * 60
+    budget = config.max_size_mb * 1024 * 1024 - size
+    expired = []
+    for script in sorted(scripts, key=lambda script: script.mtime, reverse=True):
+        if script.mtime >= grace_mtime:
+            budget -= script.size
+        elif config.max_age_days > 0 and script.mtime < min_mtime:
+            expired.append(script)
+        elif config.max_size_mb > 0 and script.size > budget:
+            expired.append(script)
+        else:
+            budget -= script.size
+    return expired
+
+
+def get_script_hash(script: str) -> str:
+    return hashlib.sha256(script.encode()).hexdigest()
+
+
+def with_cleanup(command: str, staged: StagedScript) -> str:
+    """Remove the expired scripts in the same call as the command, which saves a round trip.
+
+    The grace period is checked again when removing, so a script that a concurrent submit used after it was listed
+    is kept."""
+    if len(staged.expired) == 0:
+        return command
+    paths = " ".join(shlex.quote(path) for path in staged.expired)
+    return f"find {paths} -maxdepth 0 -type f -mmin +{GRACE_PERIOD_MINUTES} -delete 2>/dev/null; {command}"
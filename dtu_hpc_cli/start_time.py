@@ -1,6 +1,9 @@
 import dataclasses
 
 from dtu_hpc_cli.client import get_client
+from dtu_hpc_cli.output import run_and_print
+from dtu_hpc_cli.parsing import parse_start_estimates
+from dtu_hpc_cli.types import OutputFormat
 
 
 @dataclasses.dataclass
@@ -8,6 +11,7 @@ class StartTimeConfig:
     job_ids: list[str] | None
     queue: str | None
     user: str | None
+    output_format: OutputFormat = OutputFormat.text
 
 
 def execute_start_time(config: StartTimeConfig):
@@ -27,4 +31,4 @@ def execute_start_time(config: StartTimeConfig):
     command = " ".join(command)
 
     with get_client() as client:
-        client.run(command)
+        run_and_print(client, command, parse_start_estimates, config.output_format)
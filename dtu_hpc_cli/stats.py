@@ -1,6 +1,9 @@
 import dataclasses
 
 from dtu_hpc_cli.client import get_client
+from dtu_hpc_cli.output import run_and_print
+from dtu_hpc_cli.parsing import parse_nodes
+from dtu_hpc_cli.types import OutputFormat
 
 
 @dataclasses.dataclass
@@ -12,6 +15,7 @@ class StatsConfig:
     node: str | None
     reserved: bool
     queue: str | None
+    output_format: OutputFormat = OutputFormat.text
 
 
 def execute_stats(config: StatsConfig):
@@ -42,4 +46,4 @@ def execute_stats(config: StatsConfig):
     command = " ".join(command)
 
     with get_client() as client:
-        client.run(command)
+        run_and_print(client, command, parse_nodes, config.output_format)
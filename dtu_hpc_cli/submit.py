@@ -1,76 +1,159 @@
+import contextvars
 import dataclasses
+import hashlib
 import os
 import re
-from uuid import uuid4
+import shlex
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 
 import typer
+from rich.progress import Progress
+from rich.progress import SpinnerColumn
+from rich.progress import TextColumn
 
 from dtu_hpc_cli.client import Client
 from dtu_hpc_cli.client import get_client
 from dtu_hpc_cli.config import SubmitConfig
 from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.error import DeferredError
+from dtu_hpc_cli.error import defer_errors
 from dtu_hpc_cli.error import error_and_exit
 from dtu_hpc_cli.history import add_to_history
+from dtu_hpc_cli.install import get_environment_path
+from dtu_hpc_cli.metrics import Metric
+from dtu_hpc_cli.metrics import get_host
+from dtu_hpc_cli.metrics import record
+from dtu_hpc_cli.profiling import phase
+from dtu_hpc_cli.profiling import profiled
+from dtu_hpc_cli.script_store import StagedScript
+from dtu_hpc_cli.script_store import stage_script
+from dtu_hpc_cli.script_store import with_cleanup
+from dtu_hpc_cli.sweep import create_dispatch
+from dtu_hpc_cli.sync import cancel_sync
+from dtu_hpc_cli.sync import confirm_sync
 from dtu_hpc_cli.sync import execute_sync
 
 JOB_ID_PATTERN = re.compile(r"Job <([\d]+)> is submitted to queue")
 
 
+@profiled("submit")
 def execute_submit(submit_config: SubmitConfig):
-    if submit_config.sync:
-        execute_sync()
+    """Submit a job.
 
-    if submit_config.walltime > submit_config.split_every:
+    Syncing, connecting to the HPC and uploading the job script happen in the background while the user reads the
+    job script and confirms. The job is only submitted when all of them have succeeded."""
+    is_split = submit_config.walltime > submit_config.split_every
+    if is_split:
         typer.echo(
             f"NB. This will result in multiple jobs as the split time is '{submit_config.split_every}' "
             + f"and the walltime '{submit_config.walltime}' exceeds that limit."
         )
 
-    script = create_job_script(submit_config)
-    typer.echo("Job script:")
-    typer.echo(f"\n{script}\n")
-    typer.confirm("Submit job (enter to submit)?", default=True, abort=True)
+    if submit_config.sweep is not None:
+        typer.echo(f"NB. This will submit a job array with {len(submit_config.sweep)} jobs.")
+
+    if submit_config.sync:
+        # Asking about uncommitted changes must happen before the background work starts.
+        confirm_sync()
+
+    environment_path = get_environment_path(submit_config.branch)
+    script = create_job_script(submit_config, environment_path)
+    if is_split:
+        job_configs = split_job(submit_config)
+        # The whole chain is submitted by a single script, which saves a round trip per job.
+        job_scripts = [create_job_script(job_config, environment_path) for job_config in job_configs]
+        staged_script = create_chain_script(job_scripts)
+    else:
+        job_configs = [submit_config]
+        staged_script = script
+
+    # The workers run in a copy of the current context, such that their phases are nested under the current phase.
+    executor = ThreadPoolExecutor(max_workers=2)
+    sync_future = None
+    if submit_config.sync:
+        sync_future = executor.submit(
+            contextvars.copy_context().run, in_background, execute_sync, confirm=False, quiet=True
+        )
+    stage_future = executor.submit(contextvars.copy_context().run, in_background, connect_and_stage, staged_script)
+
+    try:
+        typer.echo("Job script:")
+        typer.echo(f"\n{script}\n")
+        with phase("confirmation"):
+            typer.confirm("Submit job (enter to submit)?", default=True, abort=True)
+        # The latency is the time that the user waits after confirming.
+        confirmed = time.perf_counter()
+
+        if sync_future is not None:
+            with phase("wait for sync"):
+                wait_for(sync_future, "Waiting for sync to finish...")
+
+        with phase("wait for connection"):
+            client, staged = wait_for(stage_future, "Connecting...")
+    except BaseException:
+        # Do not wait for a sync that is no longer needed.
+        cancel_sync()
+        stage_future.add_done_callback(close_staged)
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
 
     typer.echo("Submitting job...")
+    with client, phase("submission"):
+        if is_split:
+            submit_chain(client, staged, submit_config, len(job_configs))
+        else:
+            submit_staged(client, staged, submit_config)
+    record(Metric.submit_latency, time.perf_counter() - confirmed, get_host())
+
+
+def connect_and_stage(script: str) -> tuple[Client, StagedScript]:
+    client = get_client()
+    try:
+        with phase("stage script"):
+            staged = stage_script(client, script)
+    except BaseException:
+        client.close()
+        raise
+    return client, staged
+
+
+def in_background(function: Callable, *args, **kwargs):
+    """Run the function in a background thread, where errors must not be printed while the user reads a prompt.
+
+    The errors are reported by wait_for instead."""
+    with defer_errors():
+        return function(*args, **kwargs)
+
+
+def close_staged(stage_future: Future):
+    """Close the connection when the submission is aborted (or the sync failed).
+
+    The staged script is kept in the script store, such that it is not uploaded again if the job is submitted later."""
+    if stage_future.cancelled() or stage_future.exception() is not None:
+        return
+    client, _ = stage_future.result()
+    client.close()
 
-    if submit_config.walltime > submit_config.split_every:
-        submit_multiple(submit_config)
-    else:
-        submit_once(submit_config)
-
-
-def submit_once(submit_config: SubmitConfig):
-    with get_client() as client:
-        job_id = submit(client, submit_config)
-    add_to_history(submit_config, [job_id])
-
-
-def submit_multiple(submit_config: SubmitConfig):
-    job_ids = []
-    with get_client() as client:
-        start_after = submit_config.start_after
-        job_counter = 1
-        time_left = submit_config.walltime
-        while not time_left.is_zero():
-            job_name = f"{submit_config.name}-{job_counter}"
-            job_walltime = time_left if time_left < submit_config.split_every else submit_config.split_every
-            job_config = dataclasses.replace(
-                submit_config, name=job_name, start_after=start_after, walltime=job_walltime
-            )
-            job_id = submit(client, job_config)
-            job_ids.append(job_id)
-            start_after = job_id
-            job_counter += 1
-            time_left -= job_walltime
-    add_to_history(submit_config, job_ids)
-
-
-def submit(client: Client, submit_config: SubmitConfig) -> str:
-    job_script = create_job_script(submit_config)
-    path = f"/tmp/{uuid4()}.sh"
-    client.save(path, job_script)
-    returncode, stdout = client.run(f"bsub < {path}", cwd=cli_config.remote_path)
-    client.remove(path)
+
+def wait_for(future: Future, description: str):
+    if not future.done():
+        with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}")) as progress:
+            progress.add_task(description=description, total=None)
+            wait([future])
+    try:
+        return future.result()
+    except DeferredError as e:
+        error_and_exit(e.message, e.code)
+
+
+def submit_staged(client: Client, staged: StagedScript, submit_config: SubmitConfig):
+    command = with_cleanup(f"bsub < {shlex.quote(staged.path)}", staged)
+    returncode, stdout = client.run(command, cwd=cli_config.remote_path)
 
     if returncode != 0:
         error_and_exit(f"Submission command failed with return code {returncode}.")
@@ -78,11 +161,84 @@ def submit(client: Client, submit_config: SubmitConfig) -> str:
     job_ids = JOB_ID_PATTERN.findall(stdout)
     if len(job_ids) != 1:
         error_and_exit(stdout)
-    job_id = job_ids[0]
-    return job_id
+
+    add_to_history(submit_config, job_ids, staged.script_hash)
 
 
-def create_job_script(config: SubmitConfig) -> str:
+def submit_chain(client: Client, staged: StagedScript, submit_config: SubmitConfig, num_jobs: int):
+    command = with_cleanup(f"sh {shlex.quote(staged.path)}", staged)
+    returncode, stdout = client.run(command, cwd=cli_config.remote_path)
+
+    job_ids = JOB_ID_PATTERN.findall(stdout)
+    if returncode != 0 or len(job_ids) != num_jobs:
+        if len(job_ids) > 0:
+            # Keep track of the submitted jobs, such that they can be removed using --from-history.
+            add_to_history(submit_config, job_ids, staged.script_hash)
+        error_and_exit(f"Submission of job {len(job_ids) + 1} out of {num_jobs} failed with return code {returncode}.")
+
+    add_to_history(submit_config, job_ids, staged.script_hash)
+
+
+def split_job(submit_config: SubmitConfig) -> list[SubmitConfig]:
+    """Split a job into jobs of at most split_every duration.
+
+    Only the first job uses the start_after option since each of the following jobs will be started after the
+    previous one (see create_chain_script)."""
+    job_configs = []
+    start_after = submit_config.start_after
+    job_counter = 1
+    time_left = submit_config.walltime
+    while not time_left.is_zero():
+        job_name = f"{submit_config.name}-{job_counter}"
+        job_walltime = time_left if time_left < submit_config.split_every else submit_config.split_every
+        job_config = dataclasses.replace(submit_config, name=job_name, start_after=start_after, walltime=job_walltime)
+        job_configs.append(job_config)
+        start_after = None
+        job_counter += 1
+        time_left -= job_walltime
+    return job_configs
+
+
+def create_chain_script(job_scripts: list[str]) -> str:
+    """Create a shell script that submits the jobs such that each job starts after the previous job has ended.
+
+    The delimiter of the job scripts is derived from their contents, such that the same jobs give the same script (see
+    script_store)."""
+    delimiter = f"DTU_HPC_CLI_{hashlib.sha256(''.join(job_scripts).encode()).hexdigest()[:32]}"
+    script = [
+        "#!/bin/sh",
+        "directory=$(mktemp -d) || exit 1",
+        "trap 'rm -rf \"$directory\"' EXIT",
+        "previous=",
+    ]
+    for index, job_script in enumerate(job_scripts):
+        script.extend(
+            [
+                f"cat > \"$directory/{index}.sh\" <<'{delimiter}'",
+                job_script,
+                delimiter,
+                'if [ -z "$previous" ]; then',
+                f'    output=$(bsub < "$directory/{index}.sh")',
+                "else",
+                f'    output=$(bsub -w "ended($previous)" < "$directory/{index}.sh")',
+                "fi",
+                "status=$?",
+                'echo "$output"',
+                "if [ $status -ne 0 ]; then exit $status; fi",
+                "previous=$(echo \"$output\" | sed -n 's/^Job <\\([0-9]*\\)> is submitted to queue.*/\\1/p')",
+                'if [ -z "$previous" ]; then exit 1; fi',
+            ]
+        )
+    return "\n".join(script) + "\n"
+
+
+def create_job_script(config: SubmitConfig, environment_path: str | None = None) -> str:
+    """Create the job script. With an environment path (see install.get_environment_path), the job gets the same
+    DTU_HPC_ENVIRONMENT as the install commands."""
+    environment = []
+    if environment_path is not None:
+        environment = ["", "# Environment", f"export DTU_HPC_ENVIRONMENT={environment_path}"]
+
     preamble = []
     for command in config.preamble:
         command = prepare_command(config, command)
@@ -96,8 +252,12 @@ def create_job_script(config: SubmitConfig) -> str:
         command = prepare_command(config, command)
         commands.append(command)
 
+    name = config.name if config.sweep is None else f"{config.name}[1-{len(config.sweep)}]"
+    # Each element of a job array needs its own output files.
+    job_id = "%J" if config.sweep is None else "%J_%I"
+
     options = [
-        ("J", config.name),
+        ("J", name),
         ("q", config.queue),
         ("n", config.cores),
         ("R", f"rusage[mem={config.memory}]"),
@@ -112,11 +272,11 @@ def create_job_script(config: SubmitConfig) -> str:
         options.append(("w", f"ended({config.start_after})"))
 
     if config.error is not None:
-        error_path = os.path.join(config.error, f"{config.name}_%J.err")
+        error_path = os.path.join(config.error, f"{config.name}_{job_id}.err")
         options.append(("e", error_path))
 
     if config.output is not None:
-        output_path = os.path.join(config.output, f"{config.name}_%J.out")
+        output_path = os.path.join(config.output, f"{config.name}_{job_id}.out")
         options.append(("o", output_path))
 
     if config.model is not None:
@@ -128,12 +288,18 @@ def create_job_script(config: SubmitConfig) -> str:
 
     options = [f"#BSUB -{flag} {value}" for flag, value in options]
 
+    dispatch = []
+    if config.sweep is not None:
+        dispatch = ["", "# Sweep", *create_dispatch(config.sweep)]
+
     script = [
         "#!/bin/sh",
         "### General options",
         *options,
         "# -- end of LSF options --",
+        *environment,
         *preamble,
+        *dispatch,
         "",
         "# Commands",
         *commands,
@@ -0,0 +1,111 @@
+"""Parameter sweeps submitted as a single LSF job array.
+
+A sweep is a list of argument sets. Each argument set becomes an element of the job array, and the job script exports
+the arguments of the element (selected by `$LSB_JOBINDEX`) as environment variables before running the commands.
+"""
+
+import itertools
+import json
+import re
+import shlex
+from pathlib import Path
+
+from dtu_hpc_cli.error import error_and_exit
+
+NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Variables that the shell, the job or LSF depend on, which must not be overwritten by the arguments of a sweep.
+RESERVED_NAMES = {
+    "CUDA_VISIBLE_DEVICES",
+    "HOME",
+    "HOSTNAME",
+    "IFS",
+    "LANG",
+    "LOGNAME",
+    "PATH",
+    "PS4",
+    "PWD",
+    "PYTHONPATH",
+    "SHELL",
+    "TERM",
+    "TMPDIR",
+    "USER",
+}
+RESERVED_PREFIXES = ("BASH", "LC_", "LD_", "LSB_", "LSF_")
+
+
+def create_sweep(grid: list[str] | None, path: Path | None) -> list[dict[str, str]] | None:
+    """Create a sweep from `--sweep name=value1,value2` options (all combinations) and/or a sweep file.
+
+    When both are given, every argument set from the file is combined with every combination from the options."""
+    if (grid is None or len(grid) == 0) and path is None:
+        return None
+
+    sweep = [{}]
+    if path is not None:
+        sweep = load_sweep_file(path)
+    if grid is not None and len(grid) > 0:
+        combinations = parse_grid(grid)
+        sweep = [{**arguments, **combination} for arguments in sweep for combination in combinations]
+    return sweep
+
+
+def parse_grid(options: list[str]) -> list[dict[str, str]]:
+    names = []
+    values = []
+    for option in options:
+        name, separator, value = option.partition("=")
+        if separator == "" or len(value) == 0:
+            error_and_exit(f"Invalid sweep option: '{option}'. Expected format: name=value1,value2,...")
+        check_name(name)
+        names.append(name)
+        values.append(value.split(","))
+    return [dict(zip(names, combination, strict=True)) for combination in itertools.product(*values)]
+
+
+def load_sweep_file(path: Path) -> list[dict[str, str]]:
+    """Load a JSON file with either a list of argument sets or a grid ({name: [values]})."""
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError) as e:
+        error_and_exit(f"Error while reading sweep file at '{path}':\n{e}")
+
+    if isinstance(data, dict):
+        for name, values in data.items():
+            if not isinstance(values, list) or len(values) == 0:
+                error_and_exit(f"Invalid values for '{name}' in sweep file. Expected a non-empty list.")
+        data = [dict(zip(data.keys(), combination, strict=True)) for combination in itertools.product(*data.values())]
+
+    if not isinstance(data, list) or len(data) == 0:
+        error_and_exit("Invalid sweep file. Expected a non-empty list of argument sets or a dictionary of values.")
+
+    sweep = []
+    for arguments in data:
+        if not isinstance(arguments, dict):
+            error_and_exit(f"Invalid argument set in sweep file: {arguments}. Expected a dictionary.")
+        for name in arguments:
+            check_name(name)
+        sweep.append({name: str(value) for name, value in arguments.items()})
+    return sweep
+
+
+def check_name(name: str):
+    # Arguments are exported as environment variables, so the names must be valid in the shell.
+    if NAME_PATTERN.match(name) is None:
+        error_and_exit(f"Invalid sweep argument name: '{name}'. Use letters, digits and underscores only.")
+    if name in RESERVED_NAMES or name.startswith(RESERVED_PREFIXES):
+        error_and_exit(f"Invalid sweep argument name: '{name}'. It is reserved for the environment of the job.")
+
+
+def create_dispatch(sweep: list[dict[str, str]]) -> list[str]:
+    """Create the lines of the job script that export the arguments of the current array element."""
+    lines = ['case "$LSB_JOBINDEX" in']
+    for index, arguments in enumerate(sweep, start=1):
+        assignments = " ".join(f"{name}={shlex.quote(value)}" for name, value in arguments.items())
+        lines.append(f"    {index}) export {assignments} ;;" if len(arguments) > 0 else f"    {index}) ;;")
+    lines.append("esac")
+    return lines
+
+
+def format_arguments(arguments: dict[str, str]) -> str:
+    return " ".join(f"{name}={value}" for name, value in arguments.items())
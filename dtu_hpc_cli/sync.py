@@ -1,19 +1,244 @@
+import re
 import subprocess
+import tempfile
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
 
 import typer
 from git import Repo
+from rich.progress import BarColumn
 from rich.progress import Progress
 from rich.progress import SpinnerColumn
+from rich.progress import TaskProgressColumn
 from rich.progress import TextColumn
 from rich.prompt import Confirm
 
+from dtu_hpc_cli.config import SyncStrategy
 from dtu_hpc_cli.config import cli_config
+from dtu_hpc_cli.constants import REMOTE_DIRECTORIES
 from dtu_hpc_cli.error import error_and_exit
+from dtu_hpc_cli.metrics import Metric
+from dtu_hpc_cli.metrics import get_host
+from dtu_hpc_cli.metrics import record
+from dtu_hpc_cli.metrics import timed
+from dtu_hpc_cli.profiling import phase
+from dtu_hpc_cli.profiling import profiled
+from dtu_hpc_cli.sync_manifest import find_changes
+from dtu_hpc_cli.sync_manifest import get_manifest_path
+from dtu_hpc_cli.sync_manifest import list_files
+from dtu_hpc_cli.sync_manifest import load_manifest
+from dtu_hpc_cli.sync_manifest import save_manifest
+from dtu_hpc_cli.sync_stats import SyncStats
+from dtu_hpc_cli.sync_stats import format_bytes
+from dtu_hpc_cli.sync_stats import load_stats
+from dtu_hpc_cli.sync_stats import parse_progress
+from dtu_hpc_cli.sync_stats import parse_stats
+from dtu_hpc_cli.sync_stats import record_stats
+from dtu_hpc_cli.sync_stats import supports_progress2
+from dtu_hpc_cli.sync_stats import supports_skip_compress
 
+# Use a full sync when more files than this have changed since the last sync.
+MAX_CHANGED_FILES = 1000
+
+CHUNK_SIZE = 65536
+
+# The rsync processes that are running, such that cancel_sync can stop them.
+running_processes: set[subprocess.Popen] = set()
+sync_cancelled = threading.Event()
+
+# Suffixes of files that are already compressed, so rsync should not try to compress them again.
+INCOMPRESSIBLE_SUFFIXES = {
+    "7z",
+    "avi",
+    "bz2",
+    "ckpt",
+    "flac",
+    "gif",
+    "gz",
+    "jpeg",
+    "jpg",
+    "lz4",
+    "mkv",
+    "mp3",
+    "mp4",
+    "npz",
+    "ogg",
+    "parquet",
+    "png",
+    "pt",
+    "pth",
+    "rar",
+    "safetensors",
+    "tgz",
+    "webm",
+    "webp",
+    "xz",
+    "zip",
+    "zst",
+}
+
+
+@profiled("sync")
+def execute_sync(full: bool = False, confirm: bool = True, quiet: bool = False):
+    """Synchronize the project with the HPC.
+
+    Set confirm to False if confirm_sync has already been called and quiet to True to run without any output, e.g.
+    while the user is answering a prompt."""
+    if cli_config.sync.strategy == SyncStrategy.git:
+        from dtu_hpc_cli.git_sync import execute_git_sync
+
+        with timed(Metric.sync_duration, get_host()):
+            execute_git_sync(quiet=quiet)
+        return
+
+    if confirm:
+        confirm_sync()
+
+    ssh = cli_config.ssh
+    source = Path.cwd()
+    destination = f"{ssh.user}@{ssh.hostname}:{cli_config.remote_path}"
+    # Protect the directories that the CLI creates on the HPC from being deleted by --delete.
+    options = ["--exclude-from=.gitignore", *(f"--filter=P /{directory}/" for directory in REMOTE_DIRECTORIES)]
+
+    manifest_path = get_manifest_path(source, destination)
+    with phase("list files"):
+        current = list_files(source, options)
+    previous = None if full else load_manifest(manifest_path)
+
+    changed = None
+    if previous is not None:
+        changed, deleted = find_changes(source, previous["files"], current)
+        if len(changed) == 0 and len(deleted) == 0:
+            if not quiet:
+                typer.echo("Nothing has changed since the last sync.")
+            save_manifest(manifest_path, source, destination, current, previous["full_sync"])
+            return
+        if len(deleted) > 0 or len(changed) > MAX_CHANGED_FILES:
+            # rsync only deletes remote files when syncing whole directories.
+            changed = None
+
+    compression = get_compression_options(current, current.keys() if changed is None else changed)
+    command = ["rsync", "-a", *compression, "-e", f"ssh -i {ssh.identityfile}", *options, "--stats"]
+    if supports_progress2():
+        # Without incremental recursion, rsync knows the total size up front and reports the overall progress.
+        command.extend(["--info=progress2", "--no-inc-recursive"])
+
+    # A full sync also restores files that were changed on the HPC, which the manifest cannot detect.
+    full_sync = time.time() if changed is None else previous["full_sync"]
+    with tempfile.NamedTemporaryFile("w", suffix=".txt") as files_from:
+        if changed is None:
+            description = "Syncing"
+            command.extend(["--delete", "./", destination])
+        else:
+            description = f"Syncing {len(changed)} changed file(s)"
+            files_from.write("\n".join(changed))
+            files_from.flush()
+            command.extend([f"--files-from={files_from.name}", "./", destination])
+        with phase("rsync"):
+            stats = run_rsync(command, description, quiet)
+
+    stats.destination = destination
+    stats.compressed = len(compression) > 0
+    record(Metric.sync_duration, stats.duration, ssh.hostname)
+    record(Metric.sync_bytes, stats.bytes_sent + stats.bytes_received, ssh.hostname)
+    if not quiet:
+        typer.echo(stats.summary())
+        previous_stats = load_stats(destination)
+        if len(previous_stats) > 0:
+            typer.echo(f"Previous sync: {previous_stats[-1].summary()}")
+    record_stats(stats)
+
+    save_manifest(manifest_path, source, destination, current, full_sync)
+
+
+def get_compression_options(files: dict[str, list], names: Iterable[str]) -> list[str]:
+    """Compress unless most of the data is already compressed (e.g. checkpoints), where it only costs CPU time.
+
+    Otherwise, rsync is told to skip compression of the individual files that are already compressed, if it supports
+    that."""
+    total_size = 0
+    incompressible_size = 0
+    for name in names:
+        size = files[name][0]
+        total_size += size
+        if Path(name).suffix.lower().lstrip(".") in INCOMPRESSIBLE_SUFFIXES:
+            incompressible_size += size
+    if total_size > 0 and incompressible_size / total_size > 0.5:
+        return []
+    if not supports_skip_compress():
+        return ["-z"]
+    return ["-z", f"--skip-compress={'/'.join(sorted(INCOMPRESSIBLE_SUFFIXES))}"]
+
+
+def run_rsync(command: list[str], description: str, quiet: bool) -> SyncStats:
+    """Run rsync while showing its progress and return the statistics of the transfer."""
+    columns = [
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TaskProgressColumn(),
+        TextColumn("{task.fields[details]}"),
+    ]
+    lines = []
+    start = time.time()
+    with Progress(*columns, disable=quiet) as progress, tempfile.TemporaryFile() as stderr:
+        task = progress.add_task(description=description, total=None, details="")
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        running_processes.add(process)
+        if sync_cancelled.is_set():
+            # The sync was cancelled while rsync was starting.
+            process.terminate()
+        try:
+            buffer = b""
+            # Progress updates are separated by carriage returns and the statistics by newlines.
+            while chunk := process.stdout.read1(CHUNK_SIZE):
+                *complete, buffer = re.split(rb"[\r\n]", buffer + chunk)
+                for line in complete:
+                    line = line.decode(errors="replace")
+                    update = parse_progress(line)
+                    if update is None:
+                        lines.append(line)
+                        continue
+                    details = f"{format_bytes(update['bytes'])} {update['speed']}"
+                    if update["transferred"] is not None:
+                        details += f" {update['transferred']} file(s)"
+                    progress.update(task, total=100, completed=update["percent"], details=details)
+            lines.append(buffer.decode(errors="replace"))
+            returncode = process.wait()
+        finally:
+            running_processes.discard(process)
+
+        if returncode != 0:
+            stderr.seek(0)
+            error_and_exit(f"Sync failed:\n{stderr.read().decode(errors='replace')}")
+        progress.update(task, total=100, completed=100)
+
+    stats = parse_stats(lines)
+    stats.timestamp = start
+    stats.duration = time.time() - start
+    return stats
+
+
+def cancel_sync():
+    """Stop the running rsync processes, e.g. when a submission is aborted while syncing in the background."""
+    sync_cancelled.set()
+    for process in list(running_processes):
+        process.terminate()
+
+
+def confirm_sync():
+    """Ask the user whether to continue when the working tree has uncommitted changes.
+
+    Only the rsync strategy needs this, since the git strategy transfers uncommitted changes as a patch."""
+    if cli_config.sync.strategy == SyncStrategy.git:
+        return
 
-def execute_sync():
     with Repo(cli_config.project_root) as repo:
-        if repo.is_dirty() or len(repo.untracked_files) != 0:
+        with phase("git status"):
+            is_dirty = repo.is_dirty() or len(repo.untracked_files) != 0
+        if is_dirty:
             prompt = (
                 "You have uncommitted changes.\n"
                 + "This may cause problems with switching branches.\n"
@@ -22,26 +247,3 @@ def execute_sync():
             confirmed = Confirm.ask(prompt, show_default=True, default=True)
             if not confirmed:
                 raise typer.Exit()
-
-    ssh = cli_config.ssh
-    source = "./"
-    destination = f"{ssh.user}@{ssh.hostname}:{cli_config.remote_path}"
-    command = [
-        "rsync",
-        "-avz",
-        "-e",
-        f"ssh -i {ssh.identityfile}",
-        "--exclude-from=.gitignore",
-        "--delete",
-        source,
-        destination,
-    ]
-
-    with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}")) as progress:
-        task = progress.add_task(description="Syncing", total=None)
-        progress.start()
-        try:
-            subprocess.run(command, check=True, capture_output=True)
-        except subprocess.CalledProcessError as e:
-            error_and_exit(f"Sync failed:\n{e.stderr.decode()}")
-        progress.update(task, completed=True)
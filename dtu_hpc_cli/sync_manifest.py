@@ -0,0 +1,107 @@
+"""Manifest of the files in the last sync to a remote location.
+
+The manifest lets sync skip rsync entirely when nothing has changed locally, or give rsync an explicit list of the
+files that changed. Files that are changed on the HPC (e.g. by jobs or a git checkout) are not detected that way, so
+the manifest expires after MAX_MANIFEST_AGE, after which a full sync restores the remote copy and rebuilds the manifest.
+`dtu sync --full` does the same right away.
+"""
+
+import hashlib
+import json
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from dtu_hpc_cli.config import get_cache_directory
+from dtu_hpc_cli.error import error_and_exit
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Seconds after the last full sync until the next sync is a full sync again.
+MAX_MANIFEST_AGE = 60 * 60
+
+
+def get_manifest_path(source: Path, destination: str) -> Path:
+    directory = get_cache_directory() / "sync"
+    directory.mkdir(exist_ok=True)
+    key = hashlib.sha256(f"{source}\0{destination}".encode()).hexdigest()[:16]
+    return directory / f"{key}.json"
+
+
+def load_manifest(path: Path) -> dict | None:
+    """Return the manifest or None if there is none or the last full sync is too long ago."""
+    if not path.exists():
+        return None
+    try:
+        manifest = json.loads(path.read_text())
+        full_sync = float(manifest["full_sync"])
+        files = manifest["files"]
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return None
+    if time.time() - full_sync > MAX_MANIFEST_AGE:
+        return None
+    return {"full_sync": full_sync, "files": files}
+
+
+def save_manifest(path: Path, source: Path, destination: str, files: dict[str, list], full_sync: float):
+    """Save the files of the last sync and the time of the last full sync."""
+    manifest = {"source": str(source), "destination": destination, "full_sync": full_sync, "files": files}
+    path.write_text(json.dumps(manifest))
+
+
+def list_files(source: Path, rsync_options: list[str]) -> dict[str, list]:
+    """List the files that rsync would transfer as {path: [size, mtime, hash]}.
+
+    We ask rsync for the list (by syncing to an empty directory in dry-run mode), so excludes behave exactly as in
+    the actual sync. Hashes are computed lazily (see find_changes) and are None here."""
+    with tempfile.TemporaryDirectory() as empty_directory:
+        command = ["rsync", "-a", "--dry-run", "--out-format=%l %M %n", *rsync_options, "./", f"{empty_directory}/"]
+        try:
+            result = subprocess.run(command, cwd=source, check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            error_and_exit(f"Failed to list files to sync:\n{e.stderr}")
+
+    files = {}
+    for line in result.stdout.splitlines():
+        size, mtime, name = line.split(" ", 2)
+        if name.endswith("/"):
+            continue
+        files[name] = [int(size), mtime, None]
+    return files
+
+
+def find_changes(source: Path, previous: dict[str, list], current: dict[str, list]) -> tuple[list[str], list[str]]:
+    """Return the changed (or new) and deleted files.
+
+    Files whose size or modification time changed are hashed and only count as changed if their content differs
+    from the last sync. The hashes are stored in current, such that they are saved in the next manifest."""
+    changed = []
+    for name, (size, mtime, _) in current.items():
+        if name not in previous:
+            current[name][2] = hash_file(source / name)
+            changed.append(name)
+            continue
+
+        previous_size, previous_mtime, previous_hash = previous[name]
+        if size == previous_size and mtime == previous_mtime:
+            current[name][2] = previous_hash
+            continue
+
+        current_hash = hash_file(source / name)
+        current[name][2] = current_hash
+        if current_hash != previous_hash:
+            changed.append(name)
+
+    deleted = [name for name in previous if name not in current]
+    return changed, deleted
+
+
+def hash_file(path: Path) -> str | None:
+    if not path.is_file():
+        return None
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,161 @@
+"""Progress and statistics of rsync transfers.
+
+rsync reports the overall progress (`--info=progress2`) and a summary (`--stats`) of each transfer. We parse them to
+show a live display while syncing and a summary afterwards. The summary of every sync is appended to a local log, such
+that syncs can be compared over time. The log is only rewritten when it grows beyond MAX_STATS_LOG_SIZE.
+"""
+
+import dataclasses
+import json
+import re
+import subprocess
+from functools import cache
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows. Concurrent trims are then not coordinated between processes.
+    fcntl = None
+
+from dtu_hpc_cli.config import get_cache_directory
+
+PROGRESS_PATTERN = re.compile(
+    r"^\s*(?P<bytes>[\d,]+)\s+(?P<percent>\d+)%\s+(?P<speed>\S+/s)\s+\S+"
+    + r"(?:\s+\(xfr#(?P<transferred>\d+), (?:to|ir)-chk=(?P<remaining>\d+)/(?P<total>\d+)\))?"
+)
+
+VERSION_PATTERN = re.compile(r"version (\d+)\.(\d+)")
+
+# Maps lines in the output of --stats to fields of SyncStats. Older versions of rsync use slightly different names.
+STATS_FIELDS = {
+    "Number of files": "files",
+    "Number of files transferred": "files_transferred",
+    "Number of regular files transferred": "files_transferred",
+    "Total file size": "total_size",
+    "Total transferred file size": "transferred_size",
+    "Literal data": "literal_data",
+    "Matched data": "matched_data",
+    "Total bytes sent": "bytes_sent",
+    "Total bytes received": "bytes_received",
+}
+
+STATS_LOG_FILENAME = "sync_stats.jsonl"
+
+# Trim the log to this many entries when it is larger than MAX_STATS_LOG_SIZE bytes (roughly 3000 entries).
+MAX_STATS_LOG_ENTRIES = 1000
+MAX_STATS_LOG_SIZE = 1024 * 1024
+
+
+@dataclasses.dataclass
+class SyncStats:
+    destination: str = ""
+    timestamp: float = 0.0
+    duration: float = 0.0
+    compressed: bool = True
+    files: int = 0
+    files_transferred: int = 0
+    total_size: int = 0
+    transferred_size: int = 0
+    literal_data: int = 0
+    matched_data: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+    def summary(self) -> str:
+        throughput = self.bytes_sent / self.duration if self.duration > 0 else 0
+        summary = (
+            f"Transferred {self.files_transferred} of {self.files} file(s) "
+            + f"({format_bytes(self.transferred_size)} of {format_bytes(self.total_size)}) "
+            + f"in {self.duration:.1f}s. Sent {format_bytes(self.bytes_sent)} "
+            + f"({format_bytes(throughput)}/s) and received {format_bytes(self.bytes_received)}."
+        )
+        if self.transferred_size > 0 and self.bytes_sent > 0:
+            summary += f" Speedup {self.transferred_size / self.bytes_sent:.1f}x."
+        return summary
+
+
+def parse_progress(line: str) -> dict | None:
+    """Parse a line of `--info=progress2` output, e.g. `1,238,099  12%  1.20MB/s  0:00:05 (xfr#3, to-chk=20/30)`."""
+    match = PROGRESS_PATTERN.match(line)
+    if match is None:
+        return None
+    progress = match.groupdict()
+    progress["bytes"] = int(progress["bytes"].replace(",", ""))
+    progress["percent"] = int(progress["percent"])
+    for key in ("transferred", "remaining", "total"):
+        progress[key] = None if progress[key] is None else int(progress[key])
+    return progress
+
+
+def parse_stats(lines: list[str]) -> SyncStats:
+    stats = SyncStats()
+    for line in lines:
+        key, separator, value = line.partition(":")
+        if separator == "" or key.strip() not in STATS_FIELDS:
+            continue
+        # Values look like "1,234 bytes" or "1,234 (reg: 1,200, dir: 34)".
+        number = value.split()[0].replace(",", "") if len(value.split()) > 0 else ""
+        if number.isdigit():
+            setattr(stats, STATS_FIELDS[key.strip()], int(number))
+    return stats
+
+
+def supports_progress2() -> bool:
+    """`--info=progress2` requires rsync 3.1 or newer (macOS ships with an older version)."""
+    return get_rsync_version() >= (3, 1)
+
+
+def supports_skip_compress() -> bool:
+    """`--skip-compress` requires rsync 3.0 or newer (macOS ships with 2.6.9)."""
+    return get_rsync_version() >= (3, 0)
+
+
+@cache
+def get_rsync_version() -> tuple[int, int]:
+    """Return the version of the local rsync or (0, 0) if it is unknown."""
+    try:
+        output = subprocess.run(["rsync", "--version"], capture_output=True, text=True).stdout
+    except OSError:
+        return (0, 0)
+    match = VERSION_PATTERN.search(output)
+    if match is None:
+        return (0, 0)
+    return (int(match.group(1)), int(match.group(2)))
+
+
+def record_stats(stats: SyncStats):
+    path = get_stats_log_path()
+    # Without the lock, a concurrent sync could append to the log while it is being trimmed and lose its entry.
+    with path.with_name(f"{path.name}.lock").open("a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        with path.open("a") as f:
+            f.write(json.dumps(dataclasses.asdict(stats)) + "\n")
+        if path.stat().st_size > MAX_STATS_LOG_SIZE:
+            lines = path.read_text().splitlines(keepends=True)
+            temporary_path = path.with_name(f"{path.name}.tmp")
+            temporary_path.write_text("".join(lines[-MAX_STATS_LOG_ENTRIES:]))
+            temporary_path.replace(path)
+
+
+def load_stats(destination: str | None = None) -> list[SyncStats]:
+    path = get_stats_log_path()
+    if not path.exists():
+        return []
+    entries = [SyncStats(**json.loads(line)) for line in path.read_text().splitlines() if len(line.strip()) > 0]
+    if destination is not None:
+        entries = [entry for entry in entries if entry.destination == destination]
+    return entries
+
+
+def get_stats_log_path() -> Path:
+    return get_cache_directory() / STATS_LOG_FILENAME
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
@@ -4,6 +4,18 @@ from enum import StrEnum
 import typer
 
 
+class JobsStats(StrEnum):
+    cpu = "cpu"
+    memory = "memory"
+
+
+class OutputFormat(StrEnum):
+    text = "text"
+    json = "json"
+    jsonl = "jsonl"
+    csv = "csv"
+
+
 class MemoryUnit(StrEnum):
     B = "B"
     KB = "KB"
@@ -144,6 +156,9 @@ class Time:
     def total_hours(self) -> int:
         return self.days * 24 + self.hours
 
+    def total_minutes(self) -> int:
+        return self.total_hours() * 60 + self.minutes
+
     def __repr__(self):
         return f"Time(days={self.days}, hours={self.hours}, minutes={self.minutes})"
 
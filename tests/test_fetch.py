@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+
+from dtu_hpc_cli.config import SubmitConfig
+from dtu_hpc_cli.fetch import FetchCommandConfig
+from dtu_hpc_cli.fetch import create_patterns
+from dtu_hpc_cli.fetch import get_local_path
+from dtu_hpc_cli.fetch import quote_glob
+
+
+def create_patterns_for(name: str, *results: str) -> list[str]:
+    entry = {"config": {**SubmitConfig.defaults(), "branch": "main", "name": name}, "job_ids": ["123"]}
+    config = FetchCommandConfig(
+        job_ids=None,
+        name=None,
+        branch=None,
+        results=list(results),
+        logs=False,
+        destination=Path("."),
+        concurrency=1,
+    )
+    return create_patterns(entry, config)
+
+
+def test_quote_glob_keeps_wildcards_and_home():
+    assert quote_glob("results/*.pt") == "results/*.pt"
+    assert quote_glob("results/run 1/r?_[0-9].pt") == "'results/run 1/r'?_[0-9].pt"
+    assert quote_glob("~/results/a b") == "~/'results/a b'"
+    assert quote_glob("results; rm -rf ~") == "'results; rm -rf ~'"
+
+
+def test_create_patterns_quotes_substituted_values():
+    patterns = create_patterns_for("train; touch x", "results/{name}_{job_id}/*", "-{name}")
+    assert patterns == ["'results/train; touch x_123/'*", "'./-train; touch x'"]
+
+
+@pytest.mark.parametrize("result", ["../secrets/{job_id}", "results/{name}/../..", 'results/"{name}"', "results/$HOME"])
+def test_create_patterns_rejects_unsafe_results(result):
+    with pytest.raises(SystemExit):
+        create_patterns_for("train", result)
+
+
+def test_get_local_path(tmp_path):
+    assert get_local_path("results/a.pt", tmp_path) == tmp_path / "results/a.pt"
+    assert get_local_path("/zhome/user/logs/a.out", tmp_path) == tmp_path / "zhome/user/logs/a.out"
+    with pytest.raises(SystemExit):
+        get_local_path("../outside.pt", tmp_path)
+    (tmp_path / "link").symlink_to(tmp_path.parent)
+    with pytest.raises(SystemExit):
+        get_local_path("link/outside.pt", tmp_path)
@@ -0,0 +1,50 @@
+import dataclasses
+
+from dtu_hpc_cli.config import SubmitConfig
+from dtu_hpc_cli.history import HistoryConfig
+from dtu_hpc_cli.history import compile_filters
+from dtu_hpc_cli.types import Memory
+from dtu_hpc_cli.types import Time
+
+
+def create_history_config(**filters) -> HistoryConfig:
+    values = {field.name: None for field in dataclasses.fields(HistoryConfig)}
+    return HistoryConfig(**{**values, "limit": 10, **filters})
+
+
+def create_entry(**values) -> dict:
+    return {**SubmitConfig.defaults(), "branch": "main", **values}
+
+
+def test_compile_filters_without_filters():
+    matches = compile_filters(create_history_config())
+    assert matches(create_entry())
+
+
+def test_compile_filters_strings():
+    matches = compile_filters(create_history_config(branch_contains="feat", name_is="train"))
+    assert matches(create_entry(branch="feature/data", name="train"))
+    assert not matches(create_entry(branch="main", name="train"))
+    assert not matches(create_entry(branch="feature/data", name="train-1"))
+    assert not matches(create_entry(branch=None, name="train"))
+
+
+def test_compile_filters_lists():
+    matches = compile_filters(create_history_config(command_contains="train.py"))
+    assert matches(create_entry(commands=["python train.py --lr 0.1"]))
+    assert not matches(create_entry(commands=["python evaluate.py"]))
+
+
+def test_compile_filters_normalizes_memory_and_time():
+    config = create_history_config(memory_above=Memory.parse("1GB"), walltime_below=Time.parse("1d"))
+    matches = compile_filters(config)
+    assert matches(create_entry(memory="2048mb", walltime="12h"))
+    assert not matches(create_entry(memory="1024MB", walltime="12h"))
+    assert not matches(create_entry(memory="2GB", walltime="1d"))
+
+
+def test_compile_filters_numbers():
+    matches = compile_filters(create_history_config(cores_above=4, gpus_is=1))
+    assert matches(create_entry(cores=8, gpus=1))
+    assert not matches(create_entry(cores=4, gpus=1))
+    assert not matches(create_entry(cores=8, gpus=None))
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from dtu_hpc_cli.history_store import JSONLinesHistoryStore
+from dtu_hpc_cli.history_store import SQLiteHistoryStore
+from dtu_hpc_cli.history_store import get_index_path
+from dtu_hpc_cli.history_store import open_history_store
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+def create_entry(name: str, job_ids: list[str]) -> dict:
+    return {"config": {"name": name}, "job_ids": job_ids}
+
+
+@pytest.mark.parametrize("filename", ["history.jsonl", "history.sqlite"])
+def test_append_and_find(tmp_path, filename):
+    store = open_history_store(tmp_path / filename)
+    assert store.find("1") is None
+    store.append(create_entry("first", ["1", "2"]))
+    store.extend([create_entry("second", ["3"]), create_entry("again", ["1"])])
+
+    assert store.find("2")["config"]["name"] == "first"
+    assert store.find("3")["config"]["name"] == "second"
+    # The oldest entry of a job ID is found.
+    assert store.find("1")["config"]["name"] == "first"
+    assert store.find("4") is None
+    assert [entry["config"]["name"] for entry in store.load()] == ["first", "second", "again"]
+    assert [entry["config"]["name"] for entry in store.iterate_newest_first()] == ["again", "second", "first"]
+
+
+def test_find_indexes_lines_appended_by_other_processes(tmp_path):
+    path = tmp_path / "history.jsonl"
+    store = JSONLinesHistoryStore(path)
+    store.append(create_entry("first", ["1"]))
+    assert store.find("1")["config"]["name"] == "first"
+    size = path.stat().st_size
+
+    with path.open("a") as f:
+        f.write(json.dumps(create_entry("second", ["2"])) + "\n")
+    assert store.find("2")["config"]["name"] == "second"
+    assert json.loads(get_index_path(path).read_text())["job_ids"] == {"1": 0, "2": size}
+
+
+def test_find_rebuilds_index_of_replaced_history(tmp_path):
+    path = tmp_path / "history.jsonl"
+    store = JSONLinesHistoryStore(path)
+    store.append(create_entry("first", ["1"]))
+    assert store.find("1") is not None
+
+    replacement = tmp_path / "replacement.jsonl"
+    replacement.write_text(json.dumps(create_entry("other", ["2"])) + "\n")
+    replacement.replace(path)
+    assert store.find("1") is None
+    assert store.find("2")["config"]["name"] == "other"
+
+
+def test_migrate_legacy_history_in_place(tmp_path):
+    path = tmp_path / ".dtu_hpc_history.json"
+    entries = [create_entry("first", ["1"]), create_entry("second", ["2"])]
+    path.write_text(json.dumps(entries))
+
+    store = open_history_store(path)
+    assert not store.is_legacy()
+    assert [json.loads(line) for line in path.read_text().splitlines()] == entries
+    assert store.find("2") == entries[1]
+    assert list(tmp_path.glob(f"{path.name}*")) == [path]
+    # Another process that opens the store afterwards does not migrate it again.
+    assert not store.migrate_in_place()
+
+
+def test_migrate_legacy_history_to_new_path(tmp_path):
+    legacy_path = tmp_path / "history.json"
+    entries = [create_entry("first", ["1"])]
+    legacy_path.write_text(json.dumps(entries))
+
+    store = open_history_store(tmp_path / "history.sqlite")
+    assert isinstance(store, SQLiteHistoryStore)
+    assert store.load() == entries
+    # The legacy history is left as is for older versions.
+    assert json.loads(legacy_path.read_text()) == entries
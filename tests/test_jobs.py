@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from dtu_hpc_cli.jobs import JobsConfig
+from dtu_hpc_cli.jobs import find_changes
+from dtu_hpc_cli.jobs import watch_jobs
+
+HEADER = "JOBID      USER    QUEUE      JOB_NAME   NALLOC STAT  START_TIME      ELAPSED\n"
+
+
+def create_output(state: str, elapsed: str) -> str:
+    return HEADER + f"20123456   user    hpc        train      4      {state}   Oct 18 12:34    {elapsed}\n"
+
+
+class FakeClient:
+    def __init__(self, outputs: list[str]):
+        self.outputs = outputs
+
+    def run(self, command: str, hide: bool = False) -> tuple[int, str]:
+        return 0, self.outputs.pop(0)
+
+
+def watch(monkeypatch: pytest.MonkeyPatch, outputs: list[str]) -> list[float]:
+    """Run watch_jobs on the outputs and return the intervals that it slept."""
+    intervals = []
+
+    def sleep(interval: float):
+        intervals.append(interval)
+        if len(outputs) == 0:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(time, "sleep", sleep)
+    config = JobsConfig(node=None, queue=None, stats=None, watch=True, interval=10.0, max_interval=60.0)
+    watch_jobs(FakeClient(outputs), "bstat", config)
+    return intervals
+
+
+def test_watch_jobs_backs_off_when_only_elapsed_changes(monkeypatch):
+    outputs = [create_output("RUN", "0:10:00"), create_output("RUN", "0:10:10"), create_output("RUN", "0:10:25")]
+    assert watch(monkeypatch, outputs) == [10.0, 15.0, 22.5]
+
+
+def test_watch_jobs_resets_interval_on_state_change(monkeypatch):
+    outputs = [create_output("RUN", "0:10:00"), create_output("RUN", "0:10:10"), create_output("DONE", "0:10:25")]
+    assert watch(monkeypatch, outputs) == [10.0, 15.0, 10.0]
+
+
+def test_find_changes():
+    previous = {
+        "1": {"JOBID": "1", "STAT": "RUN", "ELAPSED": "0:01:00"},
+        "2": {"JOBID": "2", "STAT": "PEND", "START_TIME": "-"},
+        "3": {"JOBID": "3", "STAT": "RUN"},
+    }
+    current = {
+        "1": {"JOBID": "1", "STAT": "RUN", "ELAPSED": "0:02:00"},
+        "2": {"JOBID": "2", "STAT": "PEND", "START_TIME": "Oct 19 08:00"},
+        "4": {"JOBID": "4", "STAT": "PEND"},
+    }
+    assert find_changes(previous, current) == {"2": "updated", "4": "new", "3": "gone"}
@@ -0,0 +1,62 @@
+from dtu_hpc_cli.parsing import parse_jobs
+from dtu_hpc_cli.parsing import parse_nodes
+from dtu_hpc_cli.parsing import parse_queues
+from dtu_hpc_cli.parsing import parse_start_estimates
+from dtu_hpc_cli.parsing import parse_table
+
+
+def test_parse_jobs():
+    output = (
+        "Loading profile...\n"
+        + "JOBID      USER    QUEUE      JOB_NAME   NALLOC STAT  START_TIME      ELAPSED\n"
+        + "20123456   user    gpuv100    train      4      RUN   Oct 18 12:34    0:10:00\n"
+        + "20123457   user    hpc        evaluate   -      PEND  -               0:00:00\n"
+    )
+    jobs = parse_jobs(output)
+    assert len(jobs) == 2
+    assert jobs[0].job_id == "20123456"
+    assert jobs[0].queue == "gpuv100"
+    assert jobs[0].slots == 4
+    assert jobs[0].start_time == "Oct 18 12:34"
+    assert jobs[0].elapsed == "0:10:00"
+    assert jobs[1].slots is None
+    assert jobs[1].state == "PEND"
+
+
+def test_parse_jobs_without_header():
+    assert parse_jobs("No unfinished job found\n") == []
+
+
+def test_parse_queues_keeps_unknown_columns():
+    output = (
+        "QUEUE_NAME      PRIO STATUS          MAX JL/U JL/P JL/H NJOBS  PEND   RUN  SUSP\n"
+        + "hpc              30  Open:Active       -    -    -    -   120    20   100     0\n"
+    )
+    (queue,) = parse_queues(output)
+    assert queue.name == "hpc"
+    assert queue.priority == 30
+    assert queue.max_slots is None
+    assert queue.running == 100
+    assert queue.other == {"jl/u": "-", "jl/p": "-", "jl/h": "-"}
+    assert queue.to_dict()["jl/u"] == "-"
+
+
+def test_parse_nodes():
+    output = "HOSTNAME  STATE  CPUS\nn-62-1   idle   24\nn-62-2   busy   24\n"
+    nodes = parse_nodes(output)
+    assert [node.name for node in nodes] == ["n-62-1", "n-62-2"]
+    assert nodes[1].state == "busy"
+    assert nodes[1].other == {"cpus": "24"}
+
+
+def test_parse_start_estimates():
+    output = "JOBID    USER   QUEUE   START_TIME\n20123456 user   hpc     Oct 19 08:00\n"
+    (estimate,) = parse_start_estimates(output)
+    assert estimate.job_id == "20123456"
+    assert estimate.start_time == "Oct 19 08:00"
+
+
+def test_parse_table_pads_missing_values():
+    columns, rows = parse_table("A B C\n1 2\n")
+    assert columns == ["A", "B", "C"]
+    assert rows == [{"A": "1", "B": "2", "C": ""}]
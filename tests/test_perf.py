@@ -0,0 +1,30 @@
+from dtu_hpc_cli.metrics import Metric
+from dtu_hpc_cli.perf import get_percentile
+from dtu_hpc_cli.perf import summarize
+
+
+def test_get_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert get_percentile(values, 50) == 50
+    assert get_percentile(values, 99) == 99
+    assert get_percentile(values, 100) == 100
+    assert get_percentile([3.0], 90) == 3.0
+
+
+def test_summarize_groups_round_trips_by_command():
+    entries = [
+        {"timestamp": 0, "host": "hpc", "metric": Metric.round_trip, "command": "run", "value": 2.0},
+        {"timestamp": 0, "host": "hpc", "metric": Metric.round_trip, "command": "run", "value": 1.0},
+        {"timestamp": 0, "host": "hpc", "metric": Metric.round_trip, "command": "jobs", "value": 0.5},
+        {"timestamp": 0, "host": "hpc", "metric": Metric.ssh_connect, "command": "jobs", "value": 0.3},
+        {"timestamp": 0, "host": "hpc", "metric": Metric.ssh_connect, "command": "run", "value": 0.4},
+    ]
+    rows = summarize(entries, daily=False)
+    assert [(row["metric"], row["command"], row["count"]) for row in rows] == [
+        (Metric.round_trip, "jobs", 1),
+        (Metric.round_trip, "run", 2),
+        (Metric.ssh_connect, None, 2),
+    ]
+    assert rows[1]["p50"] == 1.0
+    assert rows[1]["max"] == 2.0
+    assert rows[2]["p90"] == 0.4
@@ -0,0 +1,72 @@
+from dtu_hpc_cli.config import ScriptsConfig
+from dtu_hpc_cli.constants import SCRIPT_DIRECTORY
+from dtu_hpc_cli.script_store import GRACE_PERIOD_MINUTES
+from dtu_hpc_cli.script_store import StagedScript
+from dtu_hpc_cli.script_store import StoredScript
+from dtu_hpc_cli.script_store import find_expired
+from dtu_hpc_cli.script_store import parse_listing
+from dtu_hpc_cli.script_store import with_cleanup
+
+DAY = 24 * 60 * 60
+MB = 1024 * 1024
+
+
+def test_parse_listing():
+    name = f"{'a' * 64}.sh"
+    output = (
+        "Loading profile...\n"
+        + f"/home/user/project/{SCRIPT_DIRECTORY}\n"
+        + "1700000000\n"
+        + f"1699999000.5 120 {name}\n"
+        + "notes.txt\n"
+    )
+    directory, now, scripts = parse_listing(output)
+    assert directory == f"/home/user/project/{SCRIPT_DIRECTORY}"
+    assert now == 1700000000
+    assert scripts == {name: StoredScript(name=name, size=120, mtime=1699999000.5)}
+
+
+def test_parse_listing_of_failed_command():
+    assert parse_listing("mkdir: cannot create directory\n") == (None, None, {})
+
+
+def test_find_expired_by_age():
+    now = 100 * DAY
+    old = StoredScript(name="old.sh", size=100, mtime=now - 31 * DAY)
+    recent = StoredScript(name="recent.sh", size=100, mtime=now - DAY)
+    expired = find_expired([old, recent], ScriptsConfig(max_age_days=30, max_size_mb=0), now, size=100)
+    assert expired == [old]
+
+
+def test_find_expired_by_size_removes_least_recently_used():
+    now = 100 * DAY
+    scripts = [StoredScript(name=f"{index}.sh", size=MB // 2, mtime=now - DAY - index) for index in range(4)]
+    expired = find_expired(scripts, ScriptsConfig(max_age_days=0, max_size_mb=1), now, size=MB // 4)
+    # The new script and the most recently used script fit in the budget.
+    assert expired == scripts[1:]
+
+
+def test_find_expired_without_limits():
+    scripts = [StoredScript(name="old.sh", size=10 * MB, mtime=0)]
+    assert find_expired(scripts, ScriptsConfig(max_age_days=0, max_size_mb=0), now=100 * DAY, size=MB) == []
+
+
+def test_find_expired_keeps_scripts_used_within_grace_period():
+    now = 100 * DAY
+    grace = GRACE_PERIOD_MINUTES * 60
+    staged = StoredScript(name="staged.sh", size=MB, mtime=now - grace + 1)
+    old = StoredScript(name="old.sh", size=MB // 2, mtime=now - grace - 1)
+    expired = find_expired([staged, old], ScriptsConfig(max_age_days=0, max_size_mb=1), now, size=MB // 4)
+    assert expired == [old]
+
+
+def test_with_cleanup_only_removes_scripts_outside_grace_period():
+    staged = StagedScript(script_hash="a", path="/store/a.sh", expired=["/store/b.sh", "/store/c d.sh"])
+    command = with_cleanup("bsub < /store/a.sh", staged)
+    assert command == (
+        f"find /store/b.sh '/store/c d.sh' -maxdepth 0 -type f -mmin +{GRACE_PERIOD_MINUTES} -delete 2>/dev/null; "
+        + "bsub < /store/a.sh"
+    )
+    assert with_cleanup("bsub < /store/a.sh", StagedScript(script_hash="a", path="/store/a.sh", expired=[])) == (
+        "bsub < /store/a.sh"
+    )
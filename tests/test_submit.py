@@ -0,0 +1,29 @@
+from dtu_hpc_cli.config import SubmitConfig
+from dtu_hpc_cli.submit import create_job_script
+from dtu_hpc_cli.submit import split_job
+from dtu_hpc_cli.types import Time
+
+
+def create_submit_config(**values) -> SubmitConfig:
+    return SubmitConfig.from_dict({**SubmitConfig.defaults(), "branch": "main", "name": "train", **values})
+
+
+def test_split_job():
+    config = create_submit_config(walltime="2d12h", split_every="1d", start_after="123")
+    jobs = split_job(config)
+    assert [job.name for job in jobs] == ["train-1", "train-2", "train-3"]
+    assert [job.walltime for job in jobs] == [Time(1, 0, 0), Time(1, 0, 0), Time(0, 12, 0)]
+    assert [job.start_after for job in jobs] == ["123", None, None]
+
+
+def test_split_job_exact_multiple():
+    jobs = split_job(create_submit_config(walltime="2d", split_every="1d"))
+    assert [job.walltime for job in jobs] == [Time(1, 0, 0), Time(1, 0, 0)]
+
+
+def test_create_job_script_exports_environment_before_preamble():
+    config = create_submit_config(preamble=["module load python3"], commands=["python train.py"])
+    lines = create_job_script(config, "~/project/.dtu_hpc_environments/main").splitlines()
+    export = lines.index("export DTU_HPC_ENVIRONMENT=~/project/.dtu_hpc_environments/main")
+    assert export < lines.index("git switch main && module load python3")
+    assert not any("DTU_HPC_ENVIRONMENT" in line for line in create_job_script(config).splitlines())
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from dtu_hpc_cli.sweep import create_dispatch
+from dtu_hpc_cli.sweep import create_sweep
+
+
+def test_create_sweep_without_options():
+    assert create_sweep(None, None) is None
+    assert create_sweep([], None) is None
+
+
+def test_create_sweep_from_grid():
+    sweep = create_sweep(["lr=0.1,0.01", "seed=1,2"], None)
+    assert sweep == [
+        {"lr": "0.1", "seed": "1"},
+        {"lr": "0.1", "seed": "2"},
+        {"lr": "0.01", "seed": "1"},
+        {"lr": "0.01", "seed": "2"},
+    ]
+
+
+def test_create_sweep_from_file_and_grid(tmp_path):
+    path = tmp_path / "sweep.json"
+    path.write_text(json.dumps([{"model": "small", "layers": 2}, {"model": "large", "layers": 8}]))
+    sweep = create_sweep(["seed=1,2"], path)
+    assert sweep == [
+        {"model": "small", "layers": "2", "seed": "1"},
+        {"model": "small", "layers": "2", "seed": "2"},
+        {"model": "large", "layers": "8", "seed": "1"},
+        {"model": "large", "layers": "8", "seed": "2"},
+    ]
+
+
+def test_create_sweep_from_grid_file(tmp_path):
+    path = tmp_path / "sweep.json"
+    path.write_text(json.dumps({"lr": [0.1, 0.01], "seed": [1]}))
+    assert create_sweep(None, path) == [{"lr": "0.1", "seed": "1"}, {"lr": "0.01", "seed": "1"}]
+
+
+@pytest.mark.parametrize("option", ["lr", "lr=", "1lr=0.1", "learning-rate=0.1", "PATH=/tmp", "LSB_JOBINDEX=1"])
+def test_create_sweep_rejects_invalid_options(option):
+    with pytest.raises(SystemExit):
+        create_sweep([option], None)
+
+
+def test_create_sweep_rejects_reserved_names_in_file(tmp_path):
+    path = tmp_path / "sweep.json"
+    path.write_text(json.dumps([{"HOME": "/tmp"}]))
+    with pytest.raises(SystemExit):
+        create_sweep(None, path)
+
+
+def test_create_dispatch_quotes_values():
+    lines = create_dispatch([{"message": "hello world"}, {}])
+    assert lines == [
+        'case "$LSB_JOBINDEX" in',
+        "    1) export message='hello world' ;;",
+        "    2) ;;",
+        "esac",
+    ]
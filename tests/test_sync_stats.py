@@ -0,0 +1,30 @@
+import pytest
+
+from dtu_hpc_cli.sync_stats import SyncStats
+from dtu_hpc_cli.sync_stats import get_stats_log_path
+from dtu_hpc_cli.sync_stats import load_stats
+from dtu_hpc_cli.sync_stats import record_stats
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+def test_record_stats_appends():
+    record_stats(SyncStats(destination="a", files=1))
+    record_stats(SyncStats(destination="b", files=2))
+    record_stats(SyncStats(destination="a", files=3))
+    assert [stats.files for stats in load_stats()] == [1, 2, 3]
+    assert [stats.files for stats in load_stats("a")] == [1, 3]
+
+
+def test_record_stats_trims_large_log(monkeypatch):
+    monkeypatch.setattr("dtu_hpc_cli.sync_stats.MAX_STATS_LOG_ENTRIES", 2)
+    monkeypatch.setattr("dtu_hpc_cli.sync_stats.MAX_STATS_LOG_SIZE", 1000)
+    for files in range(10):
+        record_stats(SyncStats(destination="a", files=files))
+        assert get_stats_log_path().stat().st_size <= 1000
+    files = [stats.files for stats in load_stats()]
+    assert files[-1] == 9
+    assert 2 <= len(files) < 10